@@ -0,0 +1,158 @@
+import os
+import json
+from typing import TypedDict
+import numpy as np
+from model_registry import get_whisper_model, get_whisperx_model, get_vosk_model
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "vosk-model-small-en-in-0.4")
+vosk_block = 4000       # samples per AcceptWaveform call when transcribing a whole buffer
+
+
+class AsrSegment(TypedDict, total=False):
+    """What every backend returns: times in seconds on the caller's timeline."""
+    start: float
+    end: float
+    text: str
+    avg_logprob: float      # Whisper backends
+    confidence: float       # Vosk: mean word confidence
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+# ---------------- BACKENDS ----------------
+class AsrBackend:
+    """
+    `transcribe(audio, start)` decodes a float32 16 kHz buffer into AsrSegments offset by
+    `start`. Backends that can follow a stream as it arrives also implement `stream()`.
+    Models load on first use, through the model registry.
+    """
+    name = ""
+
+    def transcribe(self, audio: np.ndarray, start: float = 0.0, **options) -> list[AsrSegment]:
+        raise NotImplementedError
+
+    def stream(self) -> "AsrStream":
+        raise NotImplementedError(f"{self.name} has no streaming recognizer")
+
+
+class AsrStream:
+    """Incremental recognizer for one audio stream."""
+
+    def accept(self, audio: np.ndarray) -> str:
+        """Feed more audio; returns the hypothesis for the current utterance so far."""
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        """Text of the current utterance; the next `accept` starts a new one."""
+        raise NotImplementedError
+
+
+class FasterWhisperBackend(AsrBackend):
+    name = "faster-whisper"
+
+    def __init__(self, model: str = "small.en", device: str = "cpu", compute_type: str = "int8", language: str = "en"):
+        self.model = model
+        self.device = device
+        self.compute_type = compute_type
+        self.language = language
+
+    def transcribe(self, audio: np.ndarray, start: float = 0.0, beam_size: int = 5, **options) -> list[AsrSegment]:
+        model = get_whisper_model(self.model, device=self.device, compute_type=self.compute_type)
+        segments, _ = model.transcribe(audio, language=self.language, beam_size=beam_size, **options)
+        return [AsrSegment(start=start + s.start, end=start + s.end, text=s.text, avg_logprob=s.avg_logprob)
+                for s in segments]
+
+
+class WhisperXBackend(AsrBackend):
+    """
+    The whisperx pipeline fixes its decoding options when it loads, so the backend keeps one
+    `beam_size`; a per-call beam (live partials ask for 1) would load a second pipeline.
+    """
+    name = "whisperx"
+
+    def __init__(self, model: str = "large-v2", device: str = "cpu", compute_type: str = "int8", language: str = "en",
+                 beam_size: int = 5):
+        self.model = model
+        self.device = device
+        self.compute_type = compute_type
+        self.language = language
+        self.beam_size = beam_size
+
+    def transcribe(self, audio: np.ndarray, start: float = 0.0, beam_size: int | None = None,
+                   **options) -> list[AsrSegment]:
+        model = get_whisperx_model(self.model, device=self.device, compute_type=self.compute_type,
+                                   language=self.language, beam_size=self.beam_size)
+        result = model.transcribe(audio, **options)
+        return [AsrSegment(start=start + s["start"], end=start + s["end"], text=s["text"])
+                for s in result["segments"]]
+
+
+class VoskStream(AsrStream):
+    """
+    KaldiRecognizer over one stream. Vosk may close an utterance on its own pauses; that
+    text is kept, so the hypothesis always covers the whole utterance of the caller.
+    """
+
+    def __init__(self, model):
+        from vosk import KaldiRecognizer
+        self.recognizer = KaldiRecognizer(model, samplerate)
+        self.committed: list[str] = []
+
+    def accept(self, audio: np.ndarray) -> str:
+        if self.recognizer.AcceptWaveform(to_pcm16(audio)):
+            self.committed.append(json.loads(self.recognizer.Result())["text"])
+            current = ""
+        else:
+            current = json.loads(self.recognizer.PartialResult())["partial"]
+        return " ".join(t for t in self.committed + [current] if t)
+
+    def finish(self) -> str:
+        self.committed.append(json.loads(self.recognizer.FinalResult())["text"])
+        text = " ".join(t for t in self.committed if t)
+        self.committed = []
+        return text
+
+
+class VoskBackend(AsrBackend):
+    name = "vosk"
+
+    def __init__(self, model: str = VOSK_MODEL_PATH, **_):
+        self.model = model
+
+    def stream(self) -> VoskStream:
+        return VoskStream(get_vosk_model(self.model))
+
+    def transcribe(self, audio: np.ndarray, start: float = 0.0, **options) -> list[AsrSegment]:
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(get_vosk_model(self.model), samplerate)
+        recognizer.SetWords(True)
+        results = []
+        for offset in range(0, len(audio), vosk_block):
+            if recognizer.AcceptWaveform(to_pcm16(audio[offset:offset + vosk_block])):
+                results.append(json.loads(recognizer.Result()))
+        results.append(json.loads(recognizer.FinalResult()))
+        segments = []
+        for result in results:
+            words = result.get("result") or []
+            if not words:
+                continue
+            segments.append(AsrSegment(
+                start=start + words[0]["start"],
+                end=start + words[-1]["end"],
+                text=" " + result["text"],
+                confidence=float(np.mean([w["conf"] for w in words])),
+            ))
+        return segments
+
+
+BACKENDS = {backend.name: backend for backend in (FasterWhisperBackend, WhisperXBackend, VoskBackend)}
+
+
+def get_backend(name: str, **options) -> AsrBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend {name!r}; expected one of {list(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import numpy as np
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+PCM_CACHE_DIR = os.getenv("PCM_CACHE_DIR", "pcm_cache")
+PCM_CACHE_MAX_MB = float(os.getenv("PCM_CACHE_MAX_MB", "4096"))
+preemphasis_coef = 0.97
+_block = 1 << 16
+
+
+def decode(file_path: str) -> np.ndarray:
+    """Mono float32 at 16 kHz, decoded and resampled by PyAV (FFmpeg's swresample)."""
+    from faster_whisper import decode_audio
+    return decode_audio(file_path, sampling_rate=samplerate)
+
+
+def decode_channels(file_path: str) -> list[np.ndarray]:
+    """Left and right channel of a stereo file, each float32 at 16 kHz."""
+    from faster_whisper import decode_audio
+    return list(decode_audio(file_path, sampling_rate=samplerate, split_stereo=True))
+
+
+def channel_count(file_path: str) -> int:
+    """Channels from the file header; 1 when the header cannot be read."""
+    try:
+        import soundfile
+        return soundfile.info(file_path).channels
+    except Exception:
+        return 1
+
+
+def duration(file_path: str) -> float:
+    """Length in seconds from the file header; falls back to a full decode."""
+    try:
+        import soundfile
+        return soundfile.info(file_path).duration
+    except Exception:
+        return len(decode(file_path)) / samplerate
+
+
+def preprocess_inplace(audio: np.ndarray, coef: float = preemphasis_coef) -> np.ndarray:
+    """
+    librosa.effects.preemphasis followed by librosa.util.normalize, done in the same
+    float32 buffer. Blocks are filtered back to front so every block still reads
+    unfiltered samples; only block-sized temporaries are allocated.
+    """
+    n = len(audio)
+    if n < 2:
+        return audio
+    # the sample before y[0] is linearly extrapolated as 2 * y[0] - y[1], like librosa
+    first = audio[0] - coef * (2 * audio[0] - audio[1])
+    for end in range(n, 1, -_block):
+        start = max(1, end - _block)
+        audio[start:end] -= coef * audio[start - 1:end - 1]
+    audio[0] = first
+
+    peak = max(audio.max(), -audio.min())  # no full-size abs() temporary
+    if peak > np.finfo(np.float32).tiny:
+        audio /= peak
+    return audio
+
+
+def pcm_cache_path(md5: str, variant: str = "pre") -> str:
+    return os.path.join(PCM_CACHE_DIR, f"{md5}.{variant}.npy")
+
+
+def load_pcm(file_path: str, md5: str, preprocess: bool = True) -> np.ndarray:
+    """
+    Decoded (and optionally preprocessed) PCM for `md5` as a copy-on-write memory map.
+    The first call decodes and persists it; retries, re-diarization with other speaker
+    counts and every pipeline stage then share the same pages instead of decoding again.
+    """
+    path = pcm_cache_path(md5, "pre" if preprocess else "raw")
+    if not os.path.exists(path):
+        audio = decode(file_path)
+        if preprocess:
+            preprocess_inplace(audio)
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=PCM_CACHE_DIR, suffix=".npy.part")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, path)
+        prune_pcm_cache()
+    # mode "c": pages are shared and read lazily; a stage that writes gets private copies
+    return np.load(path, mmap_mode="c")
+
+
+def prune_pcm_cache(max_mb: float = PCM_CACHE_MAX_MB):
+    """Delete least recently used cache files beyond the size budget."""
+    if not os.path.isdir(PCM_CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(PCM_CACHE_DIR):
+        if name.endswith(".npy"):
+            stat = os.stat(os.path.join(PCM_CACHE_DIR, name))
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        try:
+            os.remove(os.path.join(PCM_CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,150 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
+from vad import pack_windows, window_seconds
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "50"))
+
+
+class _Item:
+    __slots__ = ("features", "future", "enqueued")
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class BatchScheduler:
+    """
+    Collects 30 s feature windows from all in-flight requests and runs them through the
+    encoder and decoder as one batch, the way faster-whisper's BatchedInferencePipeline
+    batches the chunks of a single file. A batch starts when `max_batch_size` windows are
+    waiting or `max_wait_ms` after its first window arrived, whichever comes first.
+    """
+
+    def __init__(self, get_model, max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS, beam_size: int = 5, language: str = "en"):
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.beam_size = beam_size
+        self.language = language
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.queue_wait_seconds = 0.0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+                self._thread.start()
+
+    # ---- request side ----
+    def features(self, audio: np.ndarray) -> np.ndarray:
+        from faster_whisper.audio import pad_or_trim
+        model = self.get_model()
+        return pad_or_trim(model.feature_extractor(audio)[..., :-1])
+
+    def submit(self, features: np.ndarray) -> Future:
+        self._ensure_started()
+        item = _Item(features)
+        self._queue.put(item)
+        return item.future
+
+    def transcribe(self, audio: np.ndarray, regions: list[tuple[float, float]] | None = None):
+        """
+        Yield one segment dict per window, in order, as soon as its batch is done. Windows
+        are built from speech regions packed up to 30 s (or fixed 30 s slices without regions).
+        """
+        windows = pack_windows(regions, len(audio) / samplerate) if regions is not None \
+            else [(t, min(t + window_seconds, len(audio) / samplerate))
+                  for t in np.arange(0, len(audio) / samplerate, window_seconds)]
+        futures = []
+        for start, end in windows:
+            chunk = audio[int(start * samplerate):int(end * samplerate)]
+            futures.append((start, end, self.submit(self.features(chunk))))
+        for start, end, future in futures:
+            result = future.result()
+            yield {"start": round(float(start), 3), "end": round(float(end), 3), **result}
+
+    # ---- scheduler side ----
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0].enqueued + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # windows that queued up during the previous batch are taken without waiting
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        batch.append(self._queue.get(timeout=timeout))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self._run(np.stack([item.features for item in batch]))
+            except Exception as e:
+                logging.error(f"Batch of {len(batch)} windows failed: {e}")
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            now = time.monotonic()
+            self.batches += 1
+            self.items += len(batch)
+            for item, result in zip(batch, results):
+                self.queue_wait_seconds += now - item.enqueued
+                item.future.set_result(result)
+
+    def _run(self, features: np.ndarray) -> list[dict]:
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_suppressed_tokens
+
+        model = self.get_model()
+        tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual,
+                              task="transcribe", language=self.language)
+        prompt = model.get_prompt(tokenizer, previous_tokens=[], without_timestamps=True)
+        encoder_output = model.encode(features)
+        results = model.model.generate(
+            encoder_output,
+            [prompt] * len(features),
+            beam_size=self.beam_size,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+        output = []
+        for result in results:
+            tokens = result.sequences_ids[0]
+            seq_len = len(tokens)
+            output.append({
+                "text": tokenizer.decode(tokens),
+                "avg_logprob": result.scores[0] * seq_len / (seq_len + 1),
+                "no_speech_prob": result.no_speech_prob,
+            })
+        return output
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "waiting": self._queue.qsize(),
+            "batches": self.batches,
+            "windows": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / self.items * 1000, 1) if self.items else 0.0,
+        }
+
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batching import BatchScheduler  # noqa: E402
+
+# Throughput vs latency of cross-request micro-batching against per-request model.transcribe.
+# Each configuration serves `concurrency` simultaneous requests for the same audio.
+# e.g. python benchmarks/batching_benchmark.py audio.mp3 --concurrency 1 4 8 --batch-sizes 4 8
+parser = argparse.ArgumentParser()
+parser.add_argument("audio", nargs="?", default="audio.mp3")
+parser.add_argument("--model", default="small.en")
+parser.add_argument("--device", default="cpu")
+parser.add_argument("--compute-type", default="int8")
+parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8])
+parser.add_argument("--max-wait-ms", type=float, nargs="+", default=[20, 100])
+parser.add_argument("--output", help="write the JSON results here as well")
+samplerate = 16000
+
+
+def run_concurrent(fn, concurrency: int) -> tuple[float, list[float]]:
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        started = time.perf_counter()
+        fn()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, latencies
+
+
+def summarize(name, concurrency, audio_seconds, wall, latencies, **extra):
+    return {
+        "mode": name,
+        "concurrency": concurrency,
+        "throughput_audio_s_per_s": round(audio_seconds * concurrency / wall, 2),
+        "p50_latency_s": round(float(np.percentile(latencies, 50)), 3),
+        "p95_latency_s": round(float(np.percentile(latencies, 95)), 3),
+        **extra,
+    }
+
+
+if __name__ == "__main__":
+    from faster_whisper import WhisperModel, decode_audio
+
+    args = parser.parse_args()
+    audio = decode_audio(args.audio, sampling_rate=samplerate)
+    audio_seconds = len(audio) / samplerate
+    model = WhisperModel(args.model, device=args.device, compute_type=args.compute_type)
+
+    def sequential_request():
+        segments, _ = model.transcribe(audio, language="en", beam_size=5)
+        list(segments)
+
+    sequential_request()  # warm-up
+    rows = []
+    for concurrency in args.concurrency:
+        wall, latencies = run_concurrent(sequential_request, concurrency)
+        rows.append(summarize("per-request", concurrency, audio_seconds, wall, latencies))
+        for batch_size in args.batch_sizes:
+            for max_wait in args.max_wait_ms:
+                scheduler = BatchScheduler(lambda: model, max_batch_size=batch_size, max_wait_ms=max_wait)
+                wall, latencies = run_concurrent(lambda: list(scheduler.transcribe(audio)), concurrency)
+                rows.append(summarize("batched", concurrency, audio_seconds, wall, latencies,
+                                      max_batch_size=batch_size, max_wait_ms=max_wait,
+                                      avg_batch_size=scheduler.stats()["avg_batch_size"]))
+
+    for row in rows:
+        print(json.dumps(row))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budget for the API module: wall time of `import routers` in a fresh
+# interpreter, the slowest imports, and a check that no heavy ML package is imported.
+# e.g. python benchmarks/import_time.py --budget 1.5
+parser = argparse.ArgumentParser()
+parser.add_argument("module", nargs="?", default="routers")
+parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5")),
+                    help="fail when the median import time exceeds this many seconds")
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--top", type=int, default=10)
+HEAVY = ["torch", "whisperx", "pyannote", "faster_whisper", "ctranslate2", "librosa", "language_tool_python"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    modules = []
+    for line in out.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and parts[1].strip().isdigit():
+            modules.append((int(parts[1]), parts[2].strip()))
+    result["slowest"] = sorted(modules, reverse=True)
+    return result
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    times = sorted(r["seconds"] for r in runs)
+    median = times[len(times) // 2]
+    last = runs[-1]
+    print(f"import {args.module}: median {median:.3f}s, min {times[0]:.3f}s over {args.repeat} runs "
+          f"(budget {args.budget:.2f}s)")
+    print("slowest imports (cumulative):")
+    for micros, name in last["slowest"][:args.top]:
+        print(f"  {micros / 1e6:8.3f}s  {name}")
+    failures = []
+    if last["heavy"]:
+        failures.append(f"heavy packages imported eagerly: {', '.join(last['heavy'])}")
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds the {args.budget:.2f}s budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,354 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# End-to-end wall time, real-time factor, peak RSS and per-stage breakdown of the
+# /upload-audio path, the diarization pipeline and the live WebSocket loop.
+# Every (path, file) case runs in a fresh process, so peak RSS belongs to that case.
+# e.g. python benchmarks/pipeline_benchmark.py audio.mp3 --stub --output bench.json
+#      python benchmarks/pipeline_benchmark.py audio.mp3 --stub --baseline bench.json
+parser = argparse.ArgumentParser()
+parser.add_argument("audio", nargs="*", default=["audio.mp3"])
+parser.add_argument("--paths", nargs="+", choices=["transcribe", "diarize", "live"],
+                    default=["transcribe", "diarize", "live"])
+parser.add_argument("--repeat", type=int, default=3, help="measured runs per case, after one warmup run")
+parser.add_argument("--stub", action="store_true",
+                    help="replace every model with a stub, for CPU-only boxes without network")
+parser.add_argument("--stub-rtf", type=float, default=0.02, help="seconds a stub model spends per audio second")
+parser.add_argument("--output", help="write the JSON report here")
+parser.add_argument("--baseline", help="earlier JSON report to compare against")
+parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown vs baseline (0.15 = 15%%)")
+samplerate = 16000
+
+
+# ---------------- STUB MODELS ----------------
+class StubWhisper:
+    """faster-whisper WhisperModel stand-in: one segment per clip region, fixed cost per audio second."""
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def transcribe(self, audio, language=None, beam_size=5, clip_timestamps=None, **kwargs):
+        duration = len(audio) / samplerate
+        pairs = list(zip(clip_timestamps[::2], clip_timestamps[1::2])) if clip_timestamps else [(0.0, duration)]
+
+        def segments():
+            for start, end in pairs:
+                time.sleep(self.rtf * (end - start))
+                yield SimpleNamespace(start=start, end=end, text=f" speech from {start:.1f} to {end:.1f}",
+                                      avg_logprob=-0.2)
+
+        return segments(), SimpleNamespace(language="en", language_probability=1.0, duration=duration)
+
+
+class StubWhisperX:
+    """whisperx pipeline stand-in: 5 s segments of five words."""
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / samplerate
+        time.sleep(self.rtf * duration)
+        starts = np.arange(0.0, duration, 5.0)
+        return {"language": "en", "segments": [
+            {"start": float(s), "end": float(min(s + 5.0, duration)), "text": "one two three four five"}
+            for s in starts
+        ]}
+
+
+def stub_align(segments, model, metadata, audio, device, **kwargs):
+    """Evenly spaced word timings inside each segment."""
+    out = []
+    for segment in segments:
+        words = segment["text"].split()
+        bounds = np.linspace(segment["start"], segment["end"], len(words) + 1)
+        out.append({**segment, "words": [
+            {"word": w, "start": float(s), "end": float(e), "score": 1.0}
+            for w, s, e in zip(words, bounds[:-1], bounds[1:])
+        ]})
+    return {"segments": out}
+
+
+class StubDiarizer:
+    """Alternating speakers in 7 s turns."""
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def __call__(self, audio, min_speakers=None, max_speakers=None):
+        duration = len(audio) / samplerate
+        time.sleep(self.rtf * duration)
+        n = max(2, min_speakers or 2)
+        return [(float(s), float(min(s + 7.0, duration)), f"SPEAKER_{i % n:02d}")
+                for i, s in enumerate(np.arange(0.0, duration, 7.0))]
+
+
+class MemoryRepository:
+    """DiarizationRepository stand-in; results are kept per run only, so repeats never hit."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _key(self, key):
+        return tuple(sorted(key.items()))
+
+    def find(self, key):
+        return self.docs.get(self._key(key))
+
+    async def find_async(self, key):
+        return None
+
+    def save(self, key, fields):
+        return self.docs.setdefault(self._key(key), {"_id": "stub", **fields})
+
+
+class MemoryCheckpoints:
+    """CheckpointStore stand-in that never has anything to resume."""
+
+    def start(self, key, plan):
+        return "stub", {}, None
+
+    def save_window(self, rid, index, segments, preview):
+        pass
+
+    def save_turns(self, rid, turns):
+        pass
+
+    def finish(self, rid, result_id):
+        pass
+
+
+def install_stubs(path: str, rtf: float):
+    whisper = StubWhisper(rtf)
+    if path == "transcribe":
+        import transcribe
+        transcribe.get_whisper_model = lambda *a, **k: whisper
+        return
+    if path == "live":
+        import asr_backends
+        asr_backends.get_whisper_model = lambda *a, **k: whisper
+        return
+    import main
+    main.get_whisperx_model = lambda *a, **k: StubWhisperX(rtf)
+    main.get_align_model = lambda *a, **k: (None, None)
+    main.get_diarize_pipeline = lambda *a, **k: StubDiarizer(rtf)
+    main.align = stub_align
+    main.diarization_repository = MemoryRepository()
+    main.checkpoint_store = MemoryCheckpoints()
+
+
+# ---------------- CASES ----------------
+class StageClock:
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def wrap(self, stage: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return timed
+
+
+def run_transcribe(file_path: str, clock: StageClock) -> dict:
+    import transcribe
+    decode, regions = transcribe.decode_audio, transcribe.speech_detector.regions
+    transcribe.decode_audio = clock.wrap("decode", decode)
+    transcribe.speech_detector.regions = clock.wrap("vad", regions)
+    try:
+        started = time.perf_counter()
+        text = asyncio.run(transcribe.transcribe_audio(file_path))
+        total = time.perf_counter() - started
+    finally:
+        transcribe.decode_audio, transcribe.speech_detector.regions = decode, regions
+    clock.add("transcribe", total - sum(clock.stages.values()))
+    return {"characters": len(text)}
+
+
+def run_diarize(file_path: str, clock: StageClock, run: int, real_db: bool, runner: asyncio.Runner) -> dict:
+    import main
+    with open(file_path, "rb") as f:
+        md5 = hashlib.md5(f.read()).hexdigest()
+    # a fresh key per run, so neither the result cache nor the PCM cache turns it into a hit
+    md5 = f"{md5}-bench{run}-{os.getpid()}"
+    original = main.diarize_file
+    main.diarize_file = functools.partial(original, progress=lambda stage, _, seconds: seconds is None or clock.add(stage, seconds))
+    doc = None
+    try:
+        doc = runner.run(main.get_speaker_diarization_json(file_path, md5))
+    finally:
+        main.diarize_file = original
+        from audio_io import pcm_cache_path
+        for variant in ("pre", "raw"):
+            if os.path.exists(pcm_cache_path(md5, variant)):
+                os.remove(pcm_cache_path(md5, variant))
+        if real_db:
+            main.diarization_repository.collection.delete_one(main.result_key(md5))
+            if doc is not None:
+                main.diarization_repository.segments.delete_many({"result_id": doc["_id"]})
+            from checkpoints import run_id
+            main.checkpoint_store.runs.delete_one({"_id": run_id(main.result_key(md5))})
+    return {"segments": len(doc["transcription"]), "speakers": doc["speakers"]}
+
+
+def run_live(file_path: str, clock: StageClock, runner: asyncio.Runner) -> dict:
+    import live
+    from audio_io import decode
+    audio = decode(file_path)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+    packet = int(samplerate * 0.1) * 2     # 100 ms of s16le per message, like ws_client.py
+
+    async def session_run():
+        scheduler = live.LiveScheduler()
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        session = scheduler.open_session(send)
+        feed = clock.wrap("ingest", session.feed_bytes)   # VAD and job creation
+        for offset in range(0, len(pcm), packet):
+            feed(pcm[offset:offset + packet])
+            await asyncio.sleep(0)       # let the workers run, as the socket reader would
+        session.flush()
+        await session.drain()
+        stats = session.stats()
+        scheduler.close_session(session)
+        return messages, stats
+
+    transcribe_job = live.transcribe_job
+    live.transcribe_job = clock.wrap("transcribe", transcribe_job)
+    try:
+        messages, stats = runner.run(session_run())
+    finally:
+        live.transcribe_job = transcribe_job
+    return {
+        "partials": sum(m["type"] == "partial" for m in messages),
+        "finals": sum(m["type"] == "final" for m in messages),
+        "partial_latency": stats["partial"],
+        "final_latency": stats["final"],
+    }
+
+
+def run_case(path: str, file_path: str, repeat: int, stub: bool, stub_rtf: float) -> dict:
+    """Runs in its own process: warmup (model loads), then `repeat` measured runs."""
+    os.chdir(ROOT)
+    if stub:
+        install_stubs(path, stub_rtf)
+    from audio_io import decode
+    audio_seconds = len(decode(file_path)) / samplerate
+
+    runs = []
+    # one event loop for every run: the async Mongo client and the pool's semaphore are
+    # bound to the loop they were first used on
+    with asyncio.Runner() as runner:
+        for run in range(repeat + 1):
+            clock = StageClock()
+            started = time.perf_counter()
+            if path == "transcribe":
+                info = run_transcribe(file_path, clock)
+            elif path == "diarize":
+                info = run_diarize(file_path, clock, run, real_db=not stub, runner=runner)
+            else:
+                info = run_live(file_path, clock, runner)
+            wall = time.perf_counter() - started
+            if run > 0:
+                runs.append((wall, clock.stages, info))
+
+    walls = [wall for wall, _, _ in runs]
+    median = int(np.argsort(walls)[len(walls) // 2])
+    wall, stages, info = runs[median]
+    return {
+        "path": path,
+        "file": os.path.basename(file_path),
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(wall, 4),
+        "wall_seconds_min": round(min(walls), 4),
+        "rtf": round(wall / audio_seconds, 5) if audio_seconds else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        **info,
+    }
+
+
+# ---------------- REPORT ----------------
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    previous = {(r["path"], r["file"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get((r["path"], r["file"]))
+        if old is None:
+            continue
+        change = r["rtf"] / old["rtf"] - 1 if old["rtf"] else 0.0
+        flag = "REGRESSION" if change > tolerance else ""
+        print(f"  {r['path']:10s} {r['file']:24s} RTF {old['rtf']:.4f} -> {r['rtf']:.4f} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append(f"{r['path']}:{r['file']}")
+        for stage, seconds in r["stages"].items():
+            old_seconds = old.get("stages", {}).get(stage)
+            if old_seconds and seconds / old_seconds - 1 > tolerance:
+                print(f"      stage {stage}: {old_seconds:.4f}s -> {seconds:.4f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    results = []
+    for file_path in args.audio:
+        for path in args.paths:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_case, path, os.path.abspath(file_path), args.repeat,
+                                     args.stub, args.stub_rtf).result()
+            results.append(result)
+            stages = " ".join(f"{k}={v:.3f}" for k, v in result["stages"].items())
+            print(f"{path:10s} {result['file']:24s} {result['audio_seconds']:8.1f}s audio "
+                  f"wall={result['wall_seconds']:.3f}s RTF={result['rtf']:.4f} "
+                  f"RSS={result['peak_rss_mb']:.0f}MB  {stages}")
+
+    report = {
+        "meta": {
+            "stub": args.stub,
+            "stub_rtf": args.stub_rtf if args.stub else None,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
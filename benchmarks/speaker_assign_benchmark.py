@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from speaker_assign import SpeakerIndex, assign_speakers, relabel_in_order  # noqa: E402
+
+# Interval-index speaker assignment against the previous approaches on a synthetic meeting.
+# e.g. python benchmarks/speaker_assign_benchmark.py --hours 3 --words 40000
+parser = argparse.ArgumentParser()
+parser.add_argument("--hours", type=float, default=3.0)
+parser.add_argument("--words", type=int, default=40000)
+parser.add_argument("--speakers", type=int, default=8)
+parser.add_argument("--turn-seconds", type=float, default=6.0, help="mean diarization turn length")
+parser.add_argument("--naive-limit", type=int, default=2000,
+                    help="words timed for the O(words x turns) baselines, extrapolated to --words")
+
+
+def synthetic(hours, n_words, n_speakers, turn_seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    duration = hours * 3600
+    bounds = np.cumsum(rng.exponential(turn_seconds, int(duration / turn_seconds * 1.2)))
+    bounds = bounds[bounds < duration]
+    turns = [(float(s), float(e) + 0.3 * rng.random(), f"SPK_{rng.integers(n_speakers)}")
+             for s, e in zip(np.r_[0, bounds[:-1]], bounds)]   # small overlaps between turns
+    starts = np.sort(rng.uniform(0, duration - 1, n_words))
+    lengths = rng.uniform(0.1, 0.6, n_words)
+    words = [{"word": f"w{i}", "start": float(s), "end": float(s + d)} for i, (s, d) in enumerate(zip(starts, lengths))]
+    segments = [{"start": chunk[0]["start"], "end": chunk[-1]["end"], "text": "", "words": chunk}
+                for chunk in (words[i:i + 12] for i in range(0, n_words, 12))]
+    return turns, segments
+
+
+def naive_overlap(turns, words):
+    """Per word, intersect with every turn (what whisperx.assign_word_speakers does with pandas)."""
+    t_start = np.array([t[0] for t in turns])
+    t_end = np.array([t[1] for t in turns])
+    labels = np.array([t[2] for t in turns])
+    out = []
+    for w in words:
+        inter = np.minimum(t_end, w["end"]) - np.maximum(t_start, w["start"])
+        out.append(labels[inter.argmax()] if inter.max() > 0 else None)
+    return out
+
+
+def start_point_scan(turns, words):
+    """diarization.py's loop: first turn containing the start point, scanned linearly."""
+    out = []
+    for w in words:
+        label = "Unknown"
+        for start, end, speaker in turns:
+            if start <= w["start"] <= end:
+                label = speaker
+                break
+        out.append(label)
+    return out
+
+
+def list_membership_order(segments):
+    """main.py's speaker_order / speakers loops."""
+    order = []
+    for seg in segments:
+        if seg["speaker"] not in order:
+            order.append(seg["speaker"])
+    return order
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    turns, segments = synthetic(args.hours, args.words, args.speakers, args.turn_seconds)
+    words = [w for seg in segments for w in seg["words"]]
+    sample = words[:: max(1, len(words) // args.naive_limit)][:args.naive_limit]
+    scale = len(words) / len(sample)
+    print(f"{args.hours:.1f} h, {len(turns)} turns, {len(words)} words, {len(segments)} segments")
+
+    naive_s, _ = timed(lambda: naive_overlap(turns, sample))
+    scan_s, _ = timed(lambda: start_point_scan(turns, sample))
+    index_build_s, index = timed(lambda: SpeakerIndex.from_diarization(turns))
+    words_s, codes = timed(lambda: index.assign([w["start"] for w in words], [w["end"] for w in words]))
+    full_s, result = timed(lambda: assign_speakers(turns, {"segments": segments}))
+    relabel_s, _ = timed(lambda: relabel_in_order(result["segments"]))
+    order_s, _ = timed(lambda: list_membership_order(result["segments"]))
+
+    # agreement with the brute-force reference on the sample
+    ref = naive_overlap(turns, sample)
+    got = index.assign([w["start"] for w in sample], [w["end"] for w in sample])
+    agree = np.mean([r == (index.label(c) if c >= 0 else None) for r, c in zip(ref, got)])
+
+    print(f"naive overlap scan   : {naive_s * scale:9.3f} s (extrapolated from {len(sample)} words)")
+    print(f"start-point scan     : {scan_s * scale:9.3f} s (extrapolated from {len(sample)} words)")
+    print(f"index build          : {index_build_s:9.3f} s")
+    print(f"index, words only    : {words_s:9.3f} s  ({naive_s * scale / words_s:.0f}x vs naive)")
+    print(f"assign_speakers full : {full_s:9.3f} s  (words + split + segments, {len(result['segments'])} out)")
+    print(f"relabel segs+words  : {relabel_s * 1000:9.3f} ms, old speaker_order (segments only): {order_s * 1000:.3f} ms")
+    print(f"agreement with naive : {agree:.4f}")
@@ -0,0 +1,144 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Stereo call recording (one speaker per channel) through the channel fast path versus
+# the mono downmix through VAD + Whisper + alignment + pyannote. The input is synthetic:
+# speech from --source cut into alternating turns, the second speaker pitch-shifted,
+# each on its own channel with a little bleed into the other, so the true speaker of
+# every second is known and both paths can be scored against it.
+# e.g. python benchmarks/stereo_benchmark.py --minutes 10
+#      python benchmarks/stereo_benchmark.py --stub --minutes 30
+parser = argparse.ArgumentParser()
+parser.add_argument("--source", default="audio.mp3", help="speech the synthetic call is cut from")
+parser.add_argument("--minutes", type=float, default=5.0)
+parser.add_argument("--bleed-db", type=float, default=-30.0, help="level of each speaker on the other channel")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--stub", action="store_true", help="stub models, as in pipeline_benchmark.py")
+parser.add_argument("--stub-rtf", type=float, default=0.02)
+parser.add_argument("--output", help="write the JSON report here")
+samplerate = 16000
+
+
+# ---------------- SYNTHETIC CALL ----------------
+def synthesize(source: str, minutes: float, bleed_db: float, seed: int) -> tuple[np.ndarray, list]:
+    """(samples x 2 float32, [(start, end, channel), ...] true turns)."""
+    from audio_io import decode
+    rng = np.random.default_rng(seed)
+    speech = decode(os.path.join(ROOT, source) if not os.path.isabs(source) else source)
+    voices = [speech, np.interp(np.arange(0, len(speech), 1.2), np.arange(len(speech)), speech).astype(np.float32)]
+    total = int(minutes * 60 * samplerate)
+    stereo = np.zeros((total, 2), dtype=np.float32)
+    bleed = 10 ** (bleed_db / 20)
+    turns, position, channel = [], int(0.5 * samplerate), 0
+    while position < total:
+        length = min(int(rng.uniform(2.0, 8.0) * samplerate), total - position)
+        voice = voices[channel]
+        offset = int(rng.integers(0, max(1, len(voice) - 1)))
+        piece = np.resize(np.roll(voice, -offset), length) * 0.5
+        stereo[position:position + length, channel] += piece
+        stereo[position:position + length, 1 - channel] += piece * bleed
+        turns.append((position / samplerate, (position + length) / samplerate, channel))
+        position += length + int(rng.uniform(0.2, 1.0) * samplerate)
+        channel = 1 - channel
+    stereo += rng.standard_normal(stereo.shape).astype(np.float32) * 1e-4
+    return stereo, turns
+
+
+def speaker_accuracy(segments: list[dict], turns: list) -> float:
+    """Share of transcribed time whose label, mapped to its best-overlapping true speaker, is right."""
+    overlap: dict[str, np.ndarray] = {}
+    for segment in segments:
+        row = overlap.setdefault(segment["speaker"], np.zeros(2))
+        for start, end, channel in turns:
+            row[channel] += max(0.0, min(end, segment["end"]) - max(start, segment["start"]))
+    total = sum(row.sum() for row in overlap.values())
+    return float(sum(row.max() for row in overlap.values()) / total) if total else 0.0
+
+
+# ---------------- CASES ----------------
+def run_case(path: str, file_path: str, turns: list, stub: bool, stub_rtf: float) -> dict:
+    os.chdir(ROOT)
+    import main
+    import channels
+    if stub:
+        from pipeline_benchmark import install_stubs, StubWhisper, MemoryRepository
+        install_stubs("diarize", stub_rtf)
+        channels.get_whisper_model = lambda *a, **k: StubWhisper(stub_rtf)
+        channels.diarization_repository = MemoryRepository()
+    stages = {}
+
+    def progress(stage, _, seconds):
+        if seconds is not None:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    md5 = f"stereo-bench-{uuid.uuid4().hex}"
+    started = time.perf_counter()
+    if path == "channels":
+        doc = channels.diarize_channels(file_path, md5, progress=progress)
+        repository, key = channels.diarization_repository, channels.channel_result_key(md5)
+    else:
+        doc = main.diarize_file(file_path, md5, progress=progress)
+        repository, key = main.diarization_repository, main.result_key(md5)
+    wall = time.perf_counter() - started
+    if not stub:
+        from checkpoints import run_id
+        repository.collection.delete_one(key)
+        repository.segments.delete_many({"result_id": doc["_id"]})
+        main.checkpoint_store.runs.delete_one({"_id": run_id(key)})
+    # the mono path caches decoded PCM under the random md5 in stub runs too
+    from audio_io import pcm_cache_path
+    for variant in ("pre", "raw"):
+        if os.path.exists(pcm_cache_path(md5, variant)):
+            os.remove(pcm_cache_path(md5, variant))
+    duration = doc["duration"]
+    return {
+        "path": path,
+        "audio_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 4),
+        "rtf": round(wall / duration, 5) if duration else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "segments": len(doc["transcription"]),
+        "speakers": doc["speakers"],
+        "speaker_accuracy": round(speaker_accuracy(doc["transcription"], turns), 4),
+    }
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    import soundfile
+    stereo, turns = synthesize(args.source, args.minutes, args.bleed_db, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "call.wav")
+        soundfile.write(file_path, stereo, samplerate)
+        results = []
+        # each path in a fresh process: model loads and peak RSS are its own
+        for path in ("mono", "channels"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_case, path, file_path, turns, args.stub, args.stub_rtf).result()
+            results.append(result)
+            stages = " ".join(f"{k}={v:.3f}" for k, v in result["stages"].items())
+            print(f"{path:9s} wall={result['wall_seconds']:.3f}s RTF={result['rtf']:.4f} "
+                  f"RSS={result['peak_rss_mb']:.0f}MB accuracy={result['speaker_accuracy']:.3f}  {stages}")
+    mono, split = results
+    print(f"channel path speedup: {mono['wall_seconds'] / split['wall_seconds']:.2f}x")
+    report = {"meta": {"minutes": args.minutes, "bleed_db": args.bleed_db, "stub": args.stub,
+                       "cpu_count": os.cpu_count()}, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
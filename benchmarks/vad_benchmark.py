@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import webrtcvad
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vad import VoiceActivityDetector  # noqa: E402
+
+# Frames/sec of the vectorized VAD against the per-frame Python loop the live scripts used.
+# e.g. python benchmarks/vad_benchmark.py audio.mp3 --silence 0.5
+parser = argparse.ArgumentParser()
+parser.add_argument("audio", nargs="?", default="audio.mp3")
+parser.add_argument("--silence", type=float, default=0.5,
+                    help="fraction of digital-silence padding mixed in, like a live mic between utterances")
+parser.add_argument("--repeat", type=int, default=3)
+samplerate = 16000
+frame_size = int(samplerate * 30 / 1000)
+
+
+def legacy_frame_mask(audio: np.ndarray, vad) -> np.ndarray:
+    """The old is_speech loop, run over every frame instead of stopping at the first hit."""
+    audio = np.clip(audio, -1.0, 1.0)
+    int16_audio = (audio * 32767).astype(np.int16)
+    mask = []
+    for i in range(0, len(int16_audio) - frame_size + 1, frame_size):
+        frame = int16_audio[i:i + frame_size]
+        try:
+            mask.append(vad.is_speech(frame.tobytes(), samplerate))
+        except Exception:
+            mask.append(False)
+    return np.array(mask)
+
+
+def load(path: str, silence: float) -> np.ndarray:
+    try:
+        from faster_whisper import decode_audio
+        audio = decode_audio(path, sampling_rate=samplerate)
+    except Exception:
+        rng = np.random.default_rng(0)
+        t = np.arange(samplerate * 60) / samplerate
+        audio = (0.3 * np.sign(np.sin(2 * np.pi * 140 * t)) * (np.sin(2 * np.pi * 0.3 * t) > 0)
+                 + 0.01 * rng.standard_normal(t.size)).astype(np.float32)
+    pad = np.zeros(int(len(audio) * silence / max(1e-9, 1 - silence)), dtype=np.float32)
+    return np.concatenate([audio, pad])
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    audio = load(args.audio, args.silence)
+    n_frames = len(audio) // frame_size
+    detector = VoiceActivityDetector(2)
+    legacy_vad = webrtcvad.Vad(2)
+
+    legacy_s, legacy_mask = timed(lambda: legacy_frame_mask(audio, legacy_vad), args.repeat)
+    new_s, new_mask = timed(lambda: detector.frame_mask(audio), args.repeat)
+    regions_s, regions = timed(lambda: detector.regions(audio), args.repeat)
+
+    n = min(len(legacy_mask), len(new_mask))
+    agreement = float(np.mean(legacy_mask[:n] == new_mask[:n]))
+    speech_s = sum(end - start for start, end in regions)
+    print(f"audio: {len(audio) / samplerate:.1f}s, {n_frames} frames of 30 ms")
+    print(f"legacy loop : {n_frames / legacy_s:12.0f} frames/s")
+    print(f"vectorized  : {n_frames / new_s:12.0f} frames/s  ({legacy_s / new_s:.1f}x)")
+    print(f"regions     : {n_frames / regions_s:12.0f} frames/s, {len(regions)} regions, "
+          f"{speech_s:.1f}s speech kept of {len(audio) / samplerate:.1f}s")
+    print(f"frame agreement with legacy: {agreement:.3f}")
@@ -0,0 +1,162 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from audio_io import decode_channels, channel_count
+from vad import VoiceActivityDetector, clip_timestamps
+from model_registry import get_whisper_model
+from repository import diarization_repository
+from inference_pool import inference_pool
+from singleflight import SingleFlight
+from tiers import get_tier, tier_names
+from metrics import STAGE_SECONDS, AUDIO_SECONDS, CACHE_LOOKUPS
+
+# ---------------- SETTINGS ----------------
+# Channels this similar are one signal copied twice, and go through normal diarization
+CHANNEL_SAME_CORRELATION = float(os.getenv("CHANNEL_SAME_CORRELATION", "0.95"))
+# A segment this much quieter on its own channel than on another is the other speaker bleeding in
+CHANNEL_BLEED_DB = float(os.getenv("CHANNEL_BLEED_DB", "10"))
+CHANNEL_DEVICE = os.getenv("CHANNEL_DEVICE", "cpu")
+samplerate = 16000
+language = "en"
+
+speech_detector = VoiceActivityDetector(2)
+channel_flight = SingleFlight()
+
+
+def speaker_label(channel: int) -> str:
+    return f"SPEAKER_{channel:02d}"
+
+
+def channel_result_key(md5: str, tier: str = "balanced", channels: int = 2) -> dict:
+    # same fields as main.result_key, so the unique index covers it; the model names the path
+    return {"md5": md5, "model": f"channels/{get_tier(tier)['whisper_model']}", "tier": tier,
+            "min_speakers": channels, "max_speakers": channels}
+
+
+def channels_distinct(channels: list[np.ndarray], seconds: float = 60.0) -> bool:
+    """False for "stereo" files whose channels carry the same signal (correlation on the first minute)."""
+    n = min(len(c) for c in channels[:2])
+    head = int(min(n, seconds * samplerate))
+    if head < samplerate:
+        return False
+    left, right = (c[:head].astype(np.float64) for c in channels[:2])
+    denominator = np.sqrt(np.dot(left, left) * np.dot(right, right))
+    if denominator == 0:
+        return False
+    return abs(np.dot(left, right) / denominator) < CHANNEL_SAME_CORRELATION
+
+
+def _level_db(audio: np.ndarray, start: float, end: float) -> float:
+    piece = audio[int(start * samplerate):int(end * samplerate)]
+    if not len(piece):
+        return -120.0
+    return 10 * np.log10(np.mean(np.square(piece, dtype=np.float64)) + 1e-12)
+
+
+def transcribe_channel(model, audio: np.ndarray, beam_size: int) -> list[dict]:
+    """One channel through its own VAD and Whisper, on the file timeline."""
+    regions = speech_detector.regions(audio)
+    if not regions:
+        return []
+    segments, _ = model.transcribe(audio, language=language, beam_size=beam_size,
+                                   clip_timestamps=clip_timestamps(regions))
+    return [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+
+
+def diarize_channels(audio_file: str, md5: str, tier: str = "balanced", progress=None,
+                     force: bool = False) -> dict | None:
+    """
+    Stereo call recording with one speaker per channel: each channel is transcribed on its
+    own, concurrently, and the segments are merged in time order with the channel as the
+    speaker. Returns None for mono files and, unless `force`, when the channels carry the
+    same signal, so the caller can run the normal diarization pipeline instead.
+    """
+    settings = get_tier(tier)
+    stage_started = time.perf_counter()
+
+    def stage_done(stage: str, fraction: float):
+        nonlocal stage_started
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - stage_started, pipeline="channels", stage=stage)
+        if progress is not None:
+            progress(stage, fraction, now - stage_started)
+        stage_started = now
+
+    # decode_channels upmixes mono to two identical arrays, so the header decides
+    if channel_count(audio_file) < 2:
+        return None
+    channels = decode_channels(audio_file)
+    if not force and not channels_distinct(channels):
+        return None
+    duration = max(len(c) for c in channels) / samplerate
+    AUDIO_SECONDS.inc(duration, pipeline="channels")
+    stage_done("decode", 0.1)
+
+    # num_workers lets CTranslate2 run one transcription per channel at the same time
+    model = get_whisper_model(settings["whisper_model"], device=CHANNEL_DEVICE,
+                              compute_type=settings["compute_type"], num_workers=len(channels))
+    with ThreadPoolExecutor(max_workers=len(channels), thread_name_prefix="channel") as executor:
+        per_channel = list(executor.map(lambda audio: transcribe_channel(model, audio, settings["beam_size"]),
+                                        channels))
+    stage_done("transcribe", 0.9)
+
+    output = []
+    for channel, segments in enumerate(per_channel):
+        for segment in segments:
+            own = _level_db(channels[channel], segment["start"], segment["end"])
+            loudest_other = max(_level_db(other, segment["start"], segment["end"])
+                                for i, other in enumerate(channels) if i != channel)
+            if loudest_other - own > CHANNEL_BLEED_DB:
+                continue
+            output.append({"start": float(segment["start"]), "end": float(segment["end"]),
+                           "speaker": speaker_label(channel), "text": segment["text"]})
+    output.sort(key=lambda s: (s["start"], s["speaker"]))
+    stage_done("merge", 0.95)
+
+    doc = diarization_repository.save(channel_result_key(md5, tier, len(channels)), {
+        "file": audio_file,
+        "duration": duration,
+        "speakers": len({s["speaker"] for s in output}),
+        "transcription": output,
+    })
+    stage_done("persist", 1.0)
+    return doc
+
+
+async def find_cached_channels(md5: str, tier: str = "balanced") -> dict | None:
+    doc = None
+    for name in tier_names(tier):
+        doc = await diarization_repository.find_async(channel_result_key(md5, name))
+        if doc:
+            break
+    CACHE_LOOKUPS.inc(cache="channels", result="hit" if doc else "miss")
+    return doc
+
+
+def diarize_channels_or_mix(audio_file: str, md5: str, tier: str = "balanced", min_speakers: int = 2,
+                            max_speakers: int = 6, force: bool = False) -> dict:
+    """The channel path, or main.diarize_file on the downmix when it returns None."""
+    doc = diarize_channels(audio_file, md5, tier, force=force)
+    if doc is None:
+        from main import diarize_file
+        doc = diarize_file(audio_file, md5, min_speakers=min_speakers, max_speakers=max_speakers, tier=tier)
+    return doc
+
+
+async def get_channel_diarization_json(audio_file: str, md5: str, tier: str = "balanced",
+                                       min_speakers: int = 2, max_speakers: int = 6, force: bool = False) -> dict:
+    """`force` splits the channels even when they look alike (split_channels=always)."""
+    existing_doc = await find_cached_channels(md5, tier)
+    if existing_doc:
+        return existing_doc
+    if tier == "auto":
+        # no pyannote on this path: it costs about what plain transcription of both channels does
+        from tiers import transcribe_selector
+        from audio_io import duration
+        queue_depth = inference_pool.running + inference_pool.queued
+        tier = transcribe_selector.choose(2 * duration(audio_file), queue_depth, inference_pool.max_workers)["name"]
+    key = tuple(channel_result_key(md5, tier).values()) + (force,)
+    return await channel_flight.do(
+        key, inference_pool.run, diarize_channels_or_mix, audio_file, md5, tier, min_speakers, max_speakers, force
+    )
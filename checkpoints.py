@@ -0,0 +1,158 @@
+import os
+import numpy as np
+from datetime import datetime, timezone
+from pymongo import ASCENDING
+
+# ---------------- SETTINGS ----------------
+# Seconds of speech per window: the work lost to a crash, and the heartbeat interval of a job
+CHECKPOINT_WINDOW_SECONDS = float(os.getenv("CHECKPOINT_WINDOW_SECONDS", "120"))
+samplerate = 16000
+
+RUNNING, DONE = "running", "done"
+
+
+def run_id(key: dict) -> str:
+    """Same audio and parameters, same run: a retried job or request finds the checkpoints."""
+    return ":".join(str(key[field]) for field in ("md5", "model", "tier", "min_speakers", "max_speakers"))
+
+
+def plan_windows(regions: list[tuple[float, float]], window_seconds: float = CHECKPOINT_WINDOW_SECONDS,
+                 sample_rate: int = samplerate) -> list[list[int]]:
+    """
+    [start, end) sample ranges of the concatenated speech (as built by collect_speech), each
+    about `window_seconds` long and cut only where two speech regions meet, so no word is
+    split. Integer samples keep the plan identical across restarts.
+    """
+    limit = int(window_seconds * sample_rate)
+    windows, start, position = [], 0, 0
+    for region_start, region_end in regions:
+        position += int(region_end * sample_rate) - int(region_start * sample_rate)
+        if position - start >= limit:
+            windows.append([start, position])
+            start = position
+    if position > start or not windows:
+        windows.append([start, position])
+    return windows
+
+
+def plain(value):
+    """Model output as BSON-safe builtins, in the same shape a round trip through Mongo gives."""
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def shift_segments(segments: list[dict], offset: float) -> list[dict]:
+    """Window-relative aligned segments (and their words) moved onto the speech timeline."""
+    shifted = []
+    for segment in segments:
+        segment = dict(segment)
+        for field in ("start", "end"):
+            if segment.get(field) is not None:
+                segment[field] += offset
+        if "words" in segment:
+            segment["words"] = [
+                {**word, **{f: word[f] + offset for f in ("start", "end") if word.get(f) is not None}}
+                for word in segment["words"]
+            ]
+        segment.pop("chars", None)
+        shifted.append(segment)
+    return shifted
+
+
+class CheckpointStore:
+    """
+    Progress of long diarization runs. Every finished window's aligned segments are stored
+    in their own document (no 16 MB limit on the whole file), the diarization turns once
+    they exist, and a run document tracks the plan and progress. A rerun with the same key
+    skips whatever is stored; a changed window plan starts over.
+    """
+
+    def __init__(self, runs=None, windows=None, get_db=None):
+        if runs is None or windows is None:
+            from database import runs_collection, windows_collection
+            runs, windows = runs_collection, windows_collection
+        self.runs = runs
+        self.windows = windows
+        self.get_db = get_db
+
+    def _async(self, collection):
+        if self.get_db is None:
+            from database import get_async_db
+            self.get_db = get_async_db
+        return self.get_db()[collection.name]
+
+    def ensure_indexes(self):
+        self.windows.create_index([("run_id", ASCENDING), ("index", ASCENDING)], unique=True)
+
+    async def ensure_indexes_async(self):
+        await self._async(self.windows).create_index([("run_id", ASCENDING), ("index", ASCENDING)], unique=True)
+
+    def start(self, key: dict, plan: list[list[int]]) -> tuple[str, dict[int, list[dict]], list | None]:
+        """(run id, {window index: segments} already done, turns or None) for `key`."""
+        rid = run_id(key)
+        run = self.runs.find_one({"_id": rid})
+        now = datetime.now(timezone.utc)
+        if run is not None and run.get("plan") == plan and run.get("status") != DONE:
+            self.runs.update_one({"_id": rid}, {"$set": {"updated_at": now}, "$inc": {"resumes": 1}})
+            done = {doc["index"]: doc["segments"]
+                    for doc in self.windows.find({"run_id": rid}, {"index": 1, "segments": 1})}
+            return rid, done, run.get("turns")
+        self.windows.delete_many({"run_id": rid})
+        self.runs.replace_one({"_id": rid}, {
+            **key,
+            "status": RUNNING,
+            "plan": plan,
+            "windows_done": 0,
+            "windows_total": len(plan),
+            "resumes": 0,
+            "created_at": now,
+            "updated_at": now,
+        }, upsert=True)
+        return rid, {}, None
+
+    def save_window(self, rid: str, index: int, segments: list[dict], preview: list[dict]):
+        """`segments` (speech timeline, with words) resume the run; `preview` (file timeline) is for readers."""
+        self.windows.replace_one(
+            {"_id": f"{rid}:{index:06d}"},
+            {"run_id": rid, "index": index, "segments": segments, "preview": preview},
+            upsert=True,
+        )
+        done = self.windows.count_documents({"run_id": rid})
+        self.runs.update_one({"_id": rid}, {"$set": {"windows_done": done, "updated_at": datetime.now(timezone.utc)}})
+
+    def save_turns(self, rid: str, turns: list):
+        self.runs.update_one({"_id": rid}, {"$set": {"turns": turns, "updated_at": datetime.now(timezone.utc)}})
+
+    def finish(self, rid: str, result_id: str):
+        """The result document has everything now; only the run summary is kept."""
+        self.runs.update_one({"_id": rid}, {
+            "$set": {"status": DONE, "result_id": result_id, "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"turns": ""},
+        })
+        self.windows.delete_many({"run_id": rid})
+
+    def partial(self, rid: str) -> list[dict]:
+        """Transcript of the finished windows in file time, speakers still unknown."""
+        segments = []
+        for doc in self.windows.find({"run_id": rid}, {"preview": 1}).sort("index", ASCENDING):
+            segments.extend(doc["preview"])
+        return segments
+
+    async def get_run_async(self, rid: str) -> dict | None:
+        """The run document, without the turns (request handlers)."""
+        return await self._async(self.runs).find_one({"_id": rid}, {"turns": 0})
+
+    async def partial_async(self, rid: str) -> list[dict]:
+        segments = []
+        cursor = self._async(self.windows).find({"run_id": rid}, {"preview": 1}).sort("index", ASCENDING)
+        async for doc in cursor:
+            segments.extend(doc["preview"])
+        return segments
+
+
+checkpoint_store = CheckpointStore()
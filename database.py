@@ -1,5 +1,7 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, IndexModel
 import uuid
+import asyncio
+import logging
 from dotenv import load_dotenv
 
 import os
@@ -7,8 +9,17 @@ load_dotenv(dotenv_path=".envv")
 db_url = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
 db_name = os.getenv("DATABASE_NAME", 'speaker_identification')
 
-# Connect to MongoDB
-client = MongoClient(db_url)
+# Connection pool, shared by the sync and the async client
+pool_options = {
+    "maxPoolSize": int(os.getenv("DATABASE_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("DATABASE_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("DATABASE_MAX_IDLE_MS", "60000")),
+    "serverSelectionTimeoutMS": int(os.getenv("DATABASE_TIMEOUT_MS", "5000")),
+}
+
+# Connect to MongoDB (sync client for worker threads and job processes); the connection
+# is opened by the first operation, not at import
+client = MongoClient(db_url, connect=False, **pool_options)
 
 # Create or access database
 db = client[db_name]
@@ -16,8 +27,91 @@ db = client[db_name]
 # Create or access collection
 user_collection = db["users"]
 diarization_collection = db["diarizations"]
+segments_collection = db["diarization_segments"]
+jobs_collection = db["diarization_jobs"]
+# Checkpoints of long diarization runs: one progress document per run, one per finished window
+runs_collection = db["diarization_runs"]
+windows_collection = db["diarization_windows"]
 
 def insert_with_uuid(collection, document):
     """Always insert documents with UUID as _id"""
     document["_id"] = str(uuid.uuid4())
-    return collection.insert_one(document)
\ No newline at end of file
+    return collection.insert_one(document)
+
+# Async client for request handlers; created on first use, inside the running event loop
+_async_client = None
+
+def get_async_db():
+    global _async_client
+    if _async_client is None:
+        from pymongo import AsyncMongoClient
+        _async_client = AsyncMongoClient(db_url, **pool_options)
+    return _async_client[db_name]
+
+# One result document per (audio content, pipeline parameters); md5 is the index prefix,
+# so lookups by md5 alone use it too
+DIARIZATION_INDEXES = [
+    IndexModel(
+        [("md5", ASCENDING), ("model", ASCENDING), ("tier", ASCENDING),
+         ("min_speakers", ASCENDING), ("max_speakers", ASCENDING)],
+        unique=True,
+        name="md5_pipeline_tier_unique",
+    ),
+]
+# Replaced by the index above; it would reject a second tier's result for the same model
+DROPPED_DIARIZATION_INDEXES = ["md5_pipeline_unique"]
+
+# Segments of a result in time buckets; range queries walk this index in bucket order
+SEGMENT_INDEXES = [
+    IndexModel([("result_id", ASCENDING), ("bucket", ASCENDING)], unique=True, name="result_bucket_unique"),
+]
+
+# Key fields of results stored before they existed: those all ran large-v2 with the
+# default speaker range, i.e. what is now the balanced tier
+LEGACY_KEY_DEFAULTS = {"model": "large-v2", "tier": "balanced", "min_speakers": 2, "max_speakers": 6}
+RESULT_KEY_FIELDS = ("md5", "model", "tier", "min_speakers", "max_speakers")
+
+def migrate_diarizations(collection=diarization_collection, segments=segments_collection) -> int:
+    """
+    Backfill the key fields missing on older results, so their lookups still hit, then
+    remove duplicates per key (keeping the first stored, which lookups by md5 returned),
+    so the unique index can be built. Returns the number of results removed.
+    """
+    for field, value in LEGACY_KEY_DEFAULTS.items():
+        collection.update_many({field: {"$exists": False}}, {"$set": {field: value}})
+    removed = 0
+    duplicates = collection.aggregate([
+        {"$group": {"_id": {field: f"${field}" for field in RESULT_KEY_FIELDS},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for group in duplicates:
+        extra = group["ids"][1:]
+        collection.delete_many({"_id": {"$in": extra}})
+        segments.delete_many({"result_id": {"$in": extra}})
+        removed += len(extra)
+    if removed:
+        logging.warning(f"Removed {removed} duplicate diarization results")
+    return removed
+
+def ensure_diarization_indexes():
+    existing = diarization_collection.index_information()
+    if DIARIZATION_INDEXES[0].document["name"] not in existing:
+        migrate_diarizations()
+    for name in DROPPED_DIARIZATION_INDEXES:
+        if name in existing:
+            diarization_collection.drop_index(name)
+    diarization_collection.create_indexes(DIARIZATION_INDEXES)
+    segments_collection.create_indexes(SEGMENT_INDEXES)
+
+async def ensure_diarization_indexes_async():
+    diarizations = get_async_db()[diarization_collection.name]
+    existing = await diarizations.index_information()
+    if DIARIZATION_INDEXES[0].document["name"] not in existing:
+        # once, before the unique index exists; a startup step, so the sync client is fine
+        await asyncio.to_thread(migrate_diarizations)
+    for name in DROPPED_DIARIZATION_INDEXES:
+        if name in existing:
+            await diarizations.drop_index(name)
+    await diarizations.create_indexes(DIARIZATION_INDEXES)
+    await get_async_db()[segments_collection.name].create_indexes(SEGMENT_INDEXES)
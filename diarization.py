@@ -1,68 +1,34 @@
 import sounddevice as sd
-import numpy as np
 import queue
 import threading
 from faster_whisper import WhisperModel
-import webrtcvad
-from pyannote.audio import Pipeline
-import re
-import language_tool_python
+from vad import VoiceActivityDetector
+import itertools
+from ring_buffer import RingBuffer
+from text_filters import TextFilter, GrammarRefiner
+from online_diarization import OnlineDiarizer
 
 # ---------------- SETTINGS ----------------
 samplerate = 16000
 block_duration = 1.0    # block size for audio capture
 chunk_duration = 0.6    # chunk size for transcription
+chunk_overlap = 0.2     # context shared by consecutive chunks
+buffer_duration = 30.0  # ring buffer capacity
 channels = 1            # mono audio
 frame_per_block = int(samplerate * block_duration)
 frame_per_chunk = int(samplerate * chunk_duration)
+frame_per_stride = frame_per_chunk - int(samplerate * chunk_overlap)
 
 audio_queue = queue.Queue()
-audio_buffer = []
+audio_buffer = RingBuffer(int(samplerate * buffer_duration))
 
 # ---------------- MODELS ----------------
 model = WhisperModel("medium.en", device="cuda", compute_type="float16")
-vad = webrtcvad.Vad(2)  # aggressiveness 0-3
-tool = language_tool_python.LanguageTool('en')
-
-# ---------------- BANNED / IGNORE ----------------
-banned_words = {"ass", "fuck", "shit"}
-IGNORE_PHRASES = [
-    "thank you", "thanks for watching", "thank you very much",
-    "i'm so sorry", "oh", "alright", "i love you",
-    "happy birthday", "so let's see", "okay", "i'm going to",
-    "next video", "see you"
-]
-
-
-def should_ignore(text: str) -> bool:
-    text_lc = text.lower().strip()
-    for phrase in IGNORE_PHRASES:
-        if phrase in text_lc:
-            return True
-    return False
-
-# ---------------- VAD ----------------
-def is_speech(audio_chunk: np.ndarray) -> bool:
-    if audio_chunk.size == 0:
-        return False
-    
-    if audio_chunk.dtype != np.int16:
-        audio_chunk = np.clip(audio_chunk, -1.0, 1.0)
-        int16_audio = (audio_chunk * 32767).astype(np.int16)
-    else:
-        int16_audio = audio_chunk
-
-    frame_duration_ms = 30
-    frame_size = int(samplerate * frame_duration_ms / 1000)
-
-    for i in range(0, len(int16_audio) - frame_size + 1, frame_size):
-        frame = int16_audio[i:i + frame_size]
-        try:
-            if vad.is_speech(frame.tobytes(), samplerate):
-                return True
-        except Exception:
-            continue
-    return False
+vad = VoiceActivityDetector(2, samplerate)  # aggressiveness 0-3
+
+# ---------------- FILTERS ----------------
+# banned words and ignore phrases come from BANNED_WORDS_FILE / IGNORE_PHRASES_FILE if set
+text_filter = TextFilter()
 
 # ---------------- AUDIO CALLBACK ----------------
 def audio_callback(indata, frames, time, status):
@@ -78,74 +44,73 @@ def recorder():
             sd.sleep(100)
 
 # ---------------- TEXT REFINEMENT ----------------
-def refine_text_local(text: str) -> str:
-    matches = tool.check(text)
-    return language_tool_python.utils.correct(text, matches)
+# LanguageTool runs on its own thread; the raw line is printed at once and the
+# corrected one follows as an update when it differs
+refiner = GrammarRefiner()
+line_ids = itertools.count(1)
 
-# ---------------- SPEAKER DIARIZATION ----------------
-# Fixing the revision issue by explicitly providing revision
-diarization_pipeline = Pipeline.from_pretrained(
-    "pyannote/speaker-diarization-3.1", # speaker-diarization@2.1
-    revision="main"  # ensure the revision is passed
-    )
+def show_refined(line_id: int, prefix: str = ""):
+    def on_refined(raw_text: str, refined_text: str):
+        if refined_text != raw_text:
+            print(f"  (update {line_id}) {prefix}{refined_text}")
+    return on_refined
 
-# optional: ensure internal models also have revision
-# diarization_pipeline.segmentation.model.revision = "main"
-# diarization_pipeline.embedding.model.revision = "main"
-# diarization_pipeline.clustering.model.revision = "main"
+# ---------------- SPEAKER DIARIZATION ----------------
+# Online diarization: blocks are pushed as they arrive, only new speech is embedded and
+# speakers keep their IDs for the whole session
+diarizer = OnlineDiarizer()
 
 # ---------------- TRANSCRIBER ----------------
+def owns_segment(window_start: int, segment, offset: float = 0.0) -> bool:
+    """With overlapping chunks, keep a segment only in the chunk whose own span holds its midpoint."""
+    half_overlap = chunk_overlap / 2
+    lo = half_overlap if window_start > 0 else 0.0
+    hi = chunk_duration - half_overlap
+    return lo <= offset + (segment.start + segment.end) / 2 < hi
+
 def transcriber():
-    global audio_buffer
     while True:
         block = audio_queue.get()
-        audio_buffer.append(block)
-        total_frames = sum(len(b) for b in audio_buffer)
+        audio_buffer.write(block)
+        diarizer.push(block)
 
-        if total_frames >= frame_per_chunk:
-            audio_data = np.concatenate(audio_buffer)[:frame_per_chunk].flatten().astype(np.float32)
-            audio_buffer = []
-
-            if not is_speech(audio_data):
+        for window_start, audio_data in audio_buffer.windows(frame_per_chunk, frame_per_stride):
+            # Only process if VAD detects speech, trimmed to the speech it found
+            regions = vad.regions(audio_data, min_speech=0.1, min_silence=0.2, pad=0.1)
+            if not regions:
                 continue
+            offset = regions[0][0]
+            speech = audio_data[int(offset * samplerate):int(regions[-1][1] * samplerate)]
 
             # Whisper transcription
             segments, _ = model.transcribe(
-                audio_data,
+                speech,
                 language="en",
                 beam_size=1,
                 condition_on_previous_text=False,
                 suppress_blank=True
             )
 
-            # Convert audio_data to temp WAV for pyannote
-            import soundfile as sf
-            sf.write("audio.mp3", audio_data, samplerate)
-
-            # Speaker diarization
-            diarization = diarization_pipeline({"uri": "chunk", "audio": "audio.mp3"})
+            chunk_start = window_start / samplerate + offset
 
             for segment in segments:
                 raw_text = segment.text.strip()
                 if not raw_text:
                     continue
-                if any(re.search(rf"\b{bw}\b", raw_text.lower()) for bw in banned_words):
+                if not owns_segment(window_start, segment, offset):
                     continue
-                if should_ignore(raw_text):
+                if text_filter.reject_reason(raw_text):
                     continue
                 if hasattr(segment, "avg_log_prob") and segment.avg_log_prob < -0.2:
                     continue
 
-                refined_text = refine_text_local(raw_text)
-
-                # Match diarization segment to ASR segment
-                speaker_label = "Unknown"
-                for turn, _, speaker in diarization.itertracks(yield_label=True):
-                    if turn.start <= segment.start <= turn.end:
-                        speaker_label = speaker
-                        break
+                # Session speaker with maximum overlap with the ASR segment
+                speaker_label = diarizer.speaker_at(chunk_start + segment.start,
+                                                    chunk_start + segment.end) or "Unknown"
 
-                print(f"[{speaker_label}] {refined_text}")
+                line_id = next(line_ids)
+                print(f"({line_id}) [{speaker_label}] {raw_text}")
+                refiner.submit(raw_text, show_refined(line_id, f"[{speaker_label}] "))
 
 # ---------------- START THREADS ----------------
 threading.Thread(target=recorder, daemon=True).start()
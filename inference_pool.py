@@ -0,0 +1,183 @@
+import os
+import asyncio
+import contextvars
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# ---------------- SETTINGS ----------------
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")     # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))  # waiting jobs beyond the running ones
+QUEUE_FULL_STATUS = int(os.getenv("INFERENCE_QUEUE_FULL_STATUS", "503"))
+
+
+class PoolFull(Exception):
+    """Raised when the admission queue is full; `retry_after` is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """
+    Runs blocking model inference on a thread or process pool so the event loop stays free.
+    At most `max_workers` jobs run and `max_queue` wait; anything beyond that is rejected
+    with PoolFull instead of piling up.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 2, max_queue: int = 8):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._stream_executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        self.completed = 0
+        self._avg_seconds = 10.0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="inference"
+                )
+        return self._executor
+
+    def retry_after(self) -> int:
+        waiting = self.queued + self.running
+        return max(1, int(self._avg_seconds * waiting / self.max_workers))
+
+    def _admit(self):
+        with self._lock:
+            if self.running + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolFull(self.retry_after())
+            self.queued += 1
+
+    async def run(self, fn, *args, **kwargs):
+        self._admit()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        started = False
+        try:
+            async with self._slots:
+                with self._lock:
+                    self.queued -= 1
+                    self.running += 1
+                started = True
+                loop = asyncio.get_running_loop()
+                call = (_timed_call,) if self.kind == "process" else (contextvars.copy_context().run, _timed_call)
+                result, seconds = await loop.run_in_executor(self.executor, *call, fn, args, kwargs)
+        finally:
+            with self._lock:
+                if started:
+                    self.running -= 1
+                else:
+                    self.queued -= 1
+        with self._lock:
+            self.completed += 1
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+        return result
+
+    def stream(self, gen_fn, *args, **kwargs):
+        """
+        Admit a generator-producing job now (raising PoolFull immediately, before any response
+        is started) and return an async iterator over its items. Generators cannot cross
+        process boundaries, so streaming always iterates on threads.
+        """
+        self._admit()
+        return self._stream(gen_fn, args, kwargs)
+
+    async def _stream(self, gen_fn, args, kwargs):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        started = False
+        try:
+            async with self._slots:
+                with self._lock:
+                    self.queued -= 1
+                    self.running += 1
+                started = True
+                loop = asyncio.get_running_loop()
+                executor = self.executor if self.kind == "thread" else self.stream_executor
+                context = contextvars.copy_context()    # the request's trace id, in the worker thread
+                gen = pending = None
+                try:
+                    t0 = time.perf_counter()
+                    gen = await loop.run_in_executor(executor, context.run, lambda: gen_fn(*args, **kwargs))
+                    while True:
+                        # shielded: a client disconnect must not abandon next() while it runs
+                        pending = loop.run_in_executor(executor, context.run, next, gen, _DONE)
+                        item = await asyncio.shield(pending)
+                        pending = None
+                        if item is _DONE:
+                            break
+                        yield item
+                    seconds = time.perf_counter() - t0
+                finally:
+                    # close the generator only once it is idle, on a worker thread like its other steps;
+                    # the slot stays taken until then
+                    if pending is not None:
+                        await asyncio.wait([pending])
+                    if gen is not None:
+                        await loop.run_in_executor(executor, context.run, gen.close)
+        finally:
+            with self._lock:
+                if started:
+                    self.running -= 1
+                else:
+                    self.queued -= 1
+        with self._lock:
+            self.completed += 1
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * seconds
+
+    @property
+    def stream_executor(self):
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="inference-stream"
+            )
+        return self._stream_executor
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "avg_seconds": round(self._avg_seconds, 3),
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_DONE = object()
+
+
+def _timed_call(fn, args, kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+inference_pool = InferencePool(INFERENCE_EXECUTOR, INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE)
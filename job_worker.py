@@ -0,0 +1,34 @@
+import argparse
+import multiprocessing
+
+# ---------------- SETTINGS ----------------
+parser = argparse.ArgumentParser(description="Drain the diarization job queue")
+parser.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+parser.add_argument("--poll-interval", type=float, default=None, help="seconds between empty polls")
+
+
+def worker_main(poll_interval):
+    # Imported in the child so every process opens its own MongoDB connection
+    from database import jobs_collection, ensure_diarization_indexes
+    from jobs import JobQueue, run_worker, POLL_INTERVAL
+
+    from metrics import configure_logging
+    configure_logging()
+    ensure_diarization_indexes()
+    from checkpoints import checkpoint_store
+    checkpoint_store.ensure_indexes()
+    from model_registry import registry
+    registry.start_sweeper()
+    queue = JobQueue(jobs_collection)
+    run_worker(queue, poll_interval=poll_interval or POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=worker_main, args=(args.poll_interval,), name=f"job-worker-{i}")
+               for i in range(args.processes)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
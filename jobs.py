@@ -0,0 +1,314 @@
+import os
+import uuid
+import time
+import socket
+import logging
+import threading
+import contextvars
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument, ASCENDING
+from metrics import trace_id_var
+
+# ---------------- SETTINGS ----------------
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Diarization jobs stored in a MongoDB collection. Workers claim a job by atomically
+    taking a time-limited lease and renew it with heartbeats; a job whose lease expired
+    (its worker crashed) is claimable again, up to MAX_ATTEMPTS times; after that it is
+    failed by `requeue_expired`, which idle workers call.
+
+    Workers open the job's `audio_file` themselves, so workers on other hosts need the
+    upload directory on shared storage, mounted at the same path as on the API host.
+    The API handlers use the `*_async` methods; workers use the blocking ones.
+    """
+
+    def __init__(self, collection, lease_seconds: float = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS,
+                 get_db=None):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.get_db = get_db
+
+    @property
+    def async_collection(self):
+        if self.get_db is None:
+            from database import get_async_db
+            self.get_db = get_async_db
+        return self.get_db()[self.collection.name]
+
+    INDEXES = [[("status", ASCENDING), ("created_at", ASCENDING)],
+               [("status", ASCENDING), ("lease_expires_at", ASCENDING)]]
+
+    def ensure_indexes(self):
+        for keys in self.INDEXES:
+            self.collection.create_index(keys)
+
+    async def ensure_indexes_async(self):
+        for keys in self.INDEXES:
+            await self.async_collection.create_index(keys)
+
+    def new_job(self, audio_file: str, md5: str, params: dict | None = None, result_id: str | None = None) -> dict:
+        now = utcnow()
+        return {
+            "_id": str(uuid.uuid4()),
+            "status": DONE if result_id else QUEUED,
+            "audio_file": audio_file,
+            "md5": md5,
+            "params": params or {},
+            "progress": 1.0 if result_id else 0.0,
+            "stage": None,
+            "timings": {},
+            "attempts": 0,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": now if result_id else None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "cancel_requested": False,
+            "result_id": result_id,
+            "error": None,
+            "trace_id": trace_id_var.get(),   # the submitting request's, so worker logs line up with it
+        }
+
+    def submit(self, audio_file: str, md5: str, params: dict | None = None, result_id: str | None = None) -> dict:
+        job = self.new_job(audio_file, md5, params, result_id)
+        self.collection.insert_one(job)
+        return job
+
+    async def submit_async(self, audio_file: str, md5: str, params: dict | None = None,
+                           result_id: str | None = None) -> dict:
+        job = self.new_job(audio_file, md5, params, result_id)
+        await self.async_collection.insert_one(job)
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self.collection.find_one({"_id": job_id})
+
+    async def get_async(self, job_id: str) -> dict | None:
+        return await self.async_collection.find_one({"_id": job_id})
+
+    def claim(self, worker_id: str) -> dict | None:
+        now = utcnow()
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+                ],
+                "cancel_requested": False,
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: float | None = None,
+                  stage: str | None = None, timings: dict | None = None):
+        """Renew the lease and record progress. Raises if the job was cancelled or the lease lost."""
+        update = {"lease_expires_at": utcnow() + timedelta(seconds=self.lease_seconds)}
+        if progress is not None:
+            update["progress"] = progress
+        if stage is not None:
+            update["stage"] = stage
+        if timings is not None:
+            update["timings"] = timings
+        job = self.collection.find_one_and_update(
+            {"_id": job_id, "status": RUNNING, "lease_owner": worker_id},
+            {"$set": update},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            raise LeaseLost(job_id)
+        if job.get("cancel_requested"):
+            raise JobCancelled(job_id)
+
+    def record_run(self, job_id: str, worker_id: str, tier: str, run_id: str):
+        """The concrete tier and the checkpoint run of a started job, for partial results."""
+        self.collection.update_one(
+            {"_id": job_id, "status": RUNNING, "lease_owner": worker_id},
+            {"$set": {"tier": tier, "run_id": run_id}},
+        )
+
+    def complete(self, job_id: str, worker_id: str, result_id: str):
+        return self._finish(job_id, worker_id, {"status": DONE, "progress": 1.0, "result_id": result_id})
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        job = self.get(job_id)
+        if job and job.get("cancel_requested"):
+            return self._finish(job_id, worker_id, {"status": CANCELLED, "error": error})
+        # Retry on another claim while attempts remain
+        status = QUEUED if job and job["attempts"] < self.max_attempts else FAILED
+        return self._finish(job_id, worker_id, {"status": status, "error": error})
+
+    def mark_cancelled(self, job_id: str, worker_id: str):
+        return self._finish(job_id, worker_id, {"status": CANCELLED})
+
+    def _finish(self, job_id, worker_id, update):
+        update.update({"lease_owner": None, "lease_expires_at": None})
+        if update["status"] != QUEUED:
+            update["finished_at"] = utcnow()
+        result = self.collection.update_one(
+            {"_id": job_id, "status": RUNNING, "lease_owner": worker_id}, {"$set": update}
+        )
+        return result.modified_count == 1
+
+    def _cancel_updates(self, job_id: str) -> list[tuple[dict, dict]]:
+        return [
+            ({"_id": job_id, "status": QUEUED},
+             {"$set": {"status": CANCELLED, "cancel_requested": True, "finished_at": utcnow()}}),
+            ({"_id": job_id, "status": RUNNING}, {"$set": {"cancel_requested": True}}),
+        ]
+
+    def cancel(self, job_id: str) -> dict | None:
+        """Queued jobs are cancelled right away; running jobs stop at their next heartbeat."""
+        for query, update in self._cancel_updates(job_id):
+            self.collection.update_one(query, update)
+        return self.get(job_id)
+
+    async def cancel_async(self, job_id: str) -> dict | None:
+        for query, update in self._cancel_updates(job_id):
+            await self.async_collection.update_one(query, update)
+        return await self.get_async(job_id)
+
+    def requeue_expired(self) -> int:
+        """
+        Put jobs of crashed workers back in the queue (claim() also picks them up directly).
+        Those cancelled meanwhile become CANCELLED and those with no attempts left FAILED,
+        as claim() would skip either forever.
+        """
+        now = utcnow()
+        expired = {"status": RUNNING, "lease_expires_at": {"$lt": now}}
+        released = {"lease_owner": None, "lease_expires_at": None}
+        self.collection.update_many(
+            {"$or": [expired, {"status": QUEUED}], "cancel_requested": True},
+            {"$set": {"status": CANCELLED, "finished_at": now, **released}},
+        )
+        self.collection.update_many(
+            {"$or": [expired, {"status": QUEUED}], "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": FAILED, "error": f"worker lost on all {self.max_attempts} attempts",
+                      "finished_at": now, **released}},
+        )
+        result = self.collection.update_many(
+            {**expired, "attempts": {"$lt": self.max_attempts}},
+            {"$set": {"status": QUEUED, **released}},
+        )
+        return result.modified_count
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def resolve_tier(job: dict) -> dict:
+    """
+    Params with an "auto" tier replaced by a concrete one, chosen when the job starts: the
+    time it already spent queued is taken off the latency target.
+    """
+    params = dict(job["params"])
+    if params.get("tier") == "auto":
+        from tiers import diarize_selector
+        from audio_io import duration
+        created = job["created_at"]
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        remaining = diarize_selector.latency_target - (utcnow() - created).total_seconds()
+        params["tier"] = diarize_selector.choose(duration(job["audio_file"]), latency_target=max(0.0, remaining))["name"]
+    return params
+
+
+def process_job(queue: JobQueue, job: dict, worker_id: str):
+    from main import diarize_file, result_key
+    from checkpoints import run_id
+
+    job_id = job["_id"]
+    trace_id_var.set(job.get("trace_id") or job_id)
+    timings = {}
+    # A single stage (one alignment window, the pyannote pass) can outlast the lease, so it
+    # is renewed in the background too; what that finds is raised at the next progress call.
+    stopped = threading.Event()
+    lease_errors = []
+
+    def keep_lease():
+        while not stopped.wait(queue.lease_seconds / 3):
+            try:
+                queue.heartbeat(job_id, worker_id)
+            except (JobCancelled, LeaseLost) as e:
+                lease_errors.append(e)
+                return
+            except Exception:
+                logging.warning(f"Job {job_id}: heartbeat failed", exc_info=True)
+
+    def on_progress(stage: str, progress: float, seconds: float | None = None):
+        if lease_errors:
+            raise lease_errors[0]
+        if seconds is not None:
+            timings[stage] = round(seconds, 3)
+        queue.heartbeat(job_id, worker_id, progress=progress, stage=stage, timings=timings)
+
+    keeper = threading.Thread(target=contextvars.copy_context().run, args=(keep_lease,),
+                              name=f"lease-{job_id[:8]}", daemon=True)
+    keeper.start()
+    try:
+        params = resolve_tier(job)
+        if "tier" in params:
+            queue.record_run(job_id, worker_id, params["tier"], run_id(result_key(job["md5"], **params)))
+        doc = diarize_file(job["audio_file"], job["md5"], progress=on_progress, **params)
+    except JobCancelled:
+        queue.mark_cancelled(job_id, worker_id)
+        logging.info(f"Job {job_id} cancelled")
+        return
+    except LeaseLost:
+        logging.warning(f"Job {job_id}: lease lost, abandoning")
+        return
+    except Exception as e:
+        logging.exception(f"Job {job_id} failed")
+        queue.fail(job_id, worker_id, str(e))
+        return
+    finally:
+        stopped.set()
+        keeper.join()
+    queue.complete(job_id, worker_id, doc["_id"])
+
+
+def run_worker(queue: JobQueue, worker_id: str | None = None, poll_interval: float = POLL_INTERVAL,
+               max_jobs: int | None = None):
+    worker_id = worker_id or default_worker_id()
+    logging.info(f"Job worker {worker_id} started")
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            queue.requeue_expired()
+            time.sleep(poll_interval)
+            continue
+        logging.info(f"Worker {worker_id} claimed job {job['_id']} (attempt {job['attempts']})")
+        process_job(queue, job, worker_id)
+        processed += 1
@@ -0,0 +1,375 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from asr_backends import get_backend
+from vad import VoiceActivityDetector
+from metrics import AUDIO_SECONDS, LIVE_LATENCY
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+LIVE_BACKEND = os.getenv("LIVE_BACKEND", "faster-whisper")           # finals (and partials in "whisper" mode)
+LIVE_MODEL = os.getenv("LIVE_MODEL", "small.en")
+LIVE_DEVICE = os.getenv("LIVE_DEVICE", "cpu")
+LIVE_COMPUTE_TYPE = os.getenv("LIVE_COMPUTE_TYPE", "int8")
+LIVE_WORKERS = int(os.getenv("LIVE_WORKERS", "2"))
+# "two-pass": partials from a streaming recognizer, finals from LIVE_BACKEND
+LIVE_MODE = os.getenv("LIVE_MODE", "whisper")                        # whisper | two-pass
+LIVE_PARTIAL_BACKEND = os.getenv("LIVE_PARTIAL_BACKEND", "vosk")
+LIVE_PARTIAL_WORKERS = int(os.getenv("LIVE_PARTIAL_WORKERS", "2"))
+LIVE_MODES = ("whisper", "two-pass")
+
+vad_block_duration = 0.3      # audio gathered before each VAD decision
+partial_every = 1.0           # seconds of new speech between partial hypotheses
+end_silence = 0.6             # trailing silence that closes an utterance
+max_utterance = 15.0          # force a final on long monologues
+
+vad = VoiceActivityDetector(2, samplerate, hop_ms=15)  # 0-3, higher = more aggressive
+
+
+def pcm_to_float32(data: bytes, sample_format: str = "s16le") -> np.ndarray:
+    if sample_format == "f32le":
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def latency_summary(values) -> dict:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values)
+    return {
+        "count": int(arr.size),
+        "p50_ms": round(float(np.percentile(arr, 50)) * 1000, 1),
+        "p95_ms": round(float(np.percentile(arr, 95)) * 1000, 1),
+        "max_ms": round(float(arr.max()) * 1000, 1),
+    }
+
+
+# ---------------- SESSION ----------------
+class LiveSession:
+    """
+    Per-connection state: VAD-gated utterance buffer plus the jobs waiting for the shared
+    model. Finals are always kept; a newer partial replaces one that has not started yet.
+
+    In "two-pass" mode partials do not use the shared model: every speech block goes to
+    the session's own streaming recognizer (Vosk), in order, and its hypothesis is sent as
+    soon as it changes. The Whisper final for the same utterance replaces it later;
+    partials of an utterance whose final is already out are dropped.
+    """
+
+    def __init__(self, scheduler: "LiveScheduler", send, sample_format: str = "s16le", mode: str = "whisper"):
+        self.id = uuid.uuid4().hex[:12]
+        self.scheduler = scheduler
+        self.send = send
+        self.sample_format = sample_format
+        self.mode = mode
+        self.created = time.monotonic()
+
+        self._vad_pending: list[np.ndarray] = []
+        self._vad_pending_samples = 0
+        self.samples_received = 0
+        self.utterance: list[np.ndarray] = []
+        self.utterance_samples = 0
+        self.utterance_start = 0.0
+        self.utterance_onset_at = 0.0
+        self.utterance_seq = 0
+        self.in_speech = False
+        self.silence_samples = 0
+        self.samples_since_partial = 0
+
+        self.finals: deque = deque()
+        self.partial = None
+        self.queued = False
+        self.busy = False
+        self.closed = False
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.latencies = {"partial": [], "final": [], "first_partial": []}
+        self.finalized_seq = -1
+        self.partial_seen_seq = -1
+
+        self.two_pass = mode == "two-pass"
+        self.recognizer = None          # created by _stream_loop, off the event loop
+        self.stream_pending = 0
+        if self.two_pass:
+            self._stream_queue: asyncio.Queue = asyncio.Queue()
+            self._stream_task = asyncio.ensure_future(self._stream_loop())
+
+    # ---- audio ingestion ----
+    def feed_bytes(self, data: bytes):
+        self.feed(pcm_to_float32(data, self.sample_format))
+
+    def feed(self, pcm: np.ndarray):
+        self._vad_pending.append(pcm)
+        self._vad_pending_samples += len(pcm)
+        if self._vad_pending_samples >= int(samplerate * vad_block_duration):
+            block = np.concatenate(self._vad_pending)
+            self._vad_pending, self._vad_pending_samples = [], 0
+            self._process_block(block)
+
+    def _process_block(self, block: np.ndarray):
+        block_start = self.samples_received / samplerate
+        self.samples_received += len(block)
+        AUDIO_SECONDS.inc(len(block) / samplerate, pipeline="live")
+
+        if vad.is_speech(block):
+            if not self.in_speech:
+                self.in_speech = True
+                self.utterance_start = block_start
+                self.utterance_onset_at = time.monotonic()
+            self.silence_samples = 0
+        elif self.in_speech:
+            self.silence_samples += len(block)
+        else:
+            return  # silence outside an utterance is never sent to the model
+
+        self.utterance.append(block)
+        self.utterance_samples += len(block)
+        self.samples_since_partial += len(block)
+        if self.two_pass:
+            self._stream("audio", block)
+
+        if self.silence_samples >= end_silence * samplerate or \
+                self.utterance_samples >= max_utterance * samplerate:
+            self._finish_utterance()
+        elif not self.two_pass and self.samples_since_partial >= partial_every * samplerate:
+            self.samples_since_partial = 0
+            self.partial = self._job("partial")
+            self.scheduler.schedule(self)
+
+    def flush(self):
+        """Close the current utterance now, e.g. when the client stops sending."""
+        if self._vad_pending:
+            block = np.concatenate(self._vad_pending)
+            self._vad_pending, self._vad_pending_samples = [], 0
+            self._process_block(block)
+        if self.in_speech:
+            self._finish_utterance()
+
+    def _finish_utterance(self):
+        if self.two_pass:
+            self._stream("end", None)
+        self.finals.append(self._job("final"))
+        self.partial = None
+        self.utterance, self.utterance_samples = [], 0
+        self.utterance_seq += 1
+        self.in_speech = False
+        self.silence_samples = 0
+        self.samples_since_partial = 0
+        self.scheduler.schedule(self)
+
+    def _job(self, kind: str) -> dict:
+        return {
+            "kind": kind,
+            "audio": np.concatenate(self.utterance),
+            "start": self.utterance_start,
+            "seq": self.utterance_seq,
+            "onset_at": self.utterance_onset_at,
+            "received_at": time.monotonic(),
+        }
+
+    # ---- streaming partials (two-pass) ----
+    def _stream(self, kind: str, block: np.ndarray | None):
+        self.stream_pending += 1
+        self._stream_queue.put_nowait({
+            "kind": kind,
+            "audio": block,
+            "seq": self.utterance_seq,
+            "start": self.utterance_start,
+            "end": self.samples_received / samplerate,
+            "onset_at": self.utterance_onset_at,
+            "received_at": time.monotonic(),
+        })
+
+    async def _stream_loop(self):
+        loop = asyncio.get_running_loop()
+        executor = self.scheduler.partial_executor
+        try:
+            # the first session also loads the model here
+            self.recognizer = await loop.run_in_executor(executor, self.scheduler.partial_backend.stream)
+        except Exception as e:
+            logging.error(f"Live session {self.id}: streaming recognizer failed to start: {e}")
+        last_text = ""
+        while True:
+            item = await self._stream_queue.get()
+            if item is None:
+                return
+            try:
+                if self.recognizer is None:
+                    continue
+                if item["kind"] == "audio":
+                    text = await loop.run_in_executor(executor, self.recognizer.accept, item["audio"])
+                else:
+                    text = await loop.run_in_executor(executor, self.recognizer.finish)
+                if text and text != last_text and item["seq"] > self.finalized_seq:
+                    await self.emit({**item, "kind": "partial", "source": self.scheduler.partial_backend.name},
+                                    [{"start": round(item["start"], 3), "end": round(item["end"], 3),
+                                      "text": " " + text}])
+                last_text = "" if item["kind"] == "end" else text
+            except Exception as e:
+                logging.error(f"Live session {self.id}: streaming partial failed: {e}")
+            finally:
+                self.stream_pending -= 1
+                self.idle.set()
+
+    # ---- scheduling ----
+    def has_jobs(self) -> bool:
+        return bool(self.finals) or self.partial is not None
+
+    def take_job(self) -> dict | None:
+        if self.finals:
+            return self.finals.popleft()
+        job, self.partial = self.partial, None
+        return job
+
+    async def emit(self, job: dict, segments: list[dict]):
+        now = time.monotonic()
+        latency = now - job["received_at"]
+        source = job.get("source", self.scheduler.backend.name)
+        self.latencies[job["kind"]].append(latency)
+        LIVE_LATENCY.observe(latency, kind=job["kind"], source=source)
+        if job["kind"] == "partial" and job["seq"] > self.partial_seen_seq:
+            # first speech block received to first text sent, the delay a user notices
+            self.partial_seen_seq = job["seq"]
+            first = now - job["onset_at"]
+            self.latencies["first_partial"].append(first)
+            LIVE_LATENCY.observe(first, kind="first_partial", source=source)
+        if job["kind"] == "final":
+            self.finalized_seq = max(self.finalized_seq, job["seq"])
+        if self.closed:
+            return
+        end = job["end"] if "end" in job else job["start"] + len(job["audio"]) / samplerate
+        await self.send({
+            "type": job["kind"],
+            "utterance": job["seq"],
+            "source": source,
+            "start": round(job["start"], 3),
+            "end": round(end, 3),
+            "text": "".join(s["text"] for s in segments).strip(),
+            "segments": segments,
+            "latency_ms": round(latency * 1000, 1),
+        })
+
+    def close(self):
+        self.closed = True
+        if self.two_pass:
+            self._stream_queue.put_nowait(None)
+
+    async def drain(self):
+        while self.has_jobs() or self.busy or self.stream_pending:
+            self.idle.clear()
+            await self.idle.wait()
+
+    def stats(self) -> dict:
+        return {
+            "session": self.id,
+            "audio_seconds": round(self.samples_received / samplerate, 3),
+            "uptime_seconds": round(time.monotonic() - self.created, 3),
+            "mode": self.mode,
+            "partial": latency_summary(self.latencies["partial"]),
+            "first_partial": latency_summary(self.latencies["first_partial"]),
+            "final": latency_summary(self.latencies["final"]),
+        }
+
+
+# ---------------- SCHEDULER ----------------
+class LiveScheduler:
+    """
+    Serves all sessions from one shared model. Sessions with pending work wait in a FIFO
+    and each turn runs a single job, so one busy stream cannot starve the others.
+    A session runs at most one job at a time, which keeps its results in order.
+    """
+
+    def __init__(self, workers: int = LIVE_WORKERS, backend=None):
+        self.workers = workers
+        self.backend = backend or live_backend
+        self.sessions: dict[str, LiveSession] = {}
+        self._ready: asyncio.Queue | None = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="live")
+        self._tasks: list[asyncio.Task] = []
+        self._partial_backend = None
+        self._partial_executor = None
+
+    @property
+    def partial_backend(self):
+        if self._partial_backend is None:
+            self._partial_backend = get_backend(LIVE_PARTIAL_BACKEND)
+        return self._partial_backend
+
+    @property
+    def partial_executor(self) -> ThreadPoolExecutor:
+        # apart from the Whisper workers, so partials never wait behind a final
+        if self._partial_executor is None:
+            self._partial_executor = ThreadPoolExecutor(max_workers=LIVE_PARTIAL_WORKERS,
+                                                        thread_name_prefix="live-partial")
+        return self._partial_executor
+
+    def _start(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    def open_session(self, send, sample_format: str = "s16le", mode: str = LIVE_MODE) -> LiveSession:
+        self._start()
+        session = LiveSession(self, send, sample_format, mode)
+        self.sessions[session.id] = session
+        return session
+
+    def close_session(self, session: LiveSession):
+        session.close()
+        self.sessions.pop(session.id, None)
+
+    def schedule(self, session: LiveSession):
+        if not session.queued and not session.busy and session.has_jobs():
+            session.queued = True
+            self._ready.put_nowait(session)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session = await self._ready.get()
+            session.queued = False
+            job = session.take_job()
+            if job is None or session.closed:
+                continue
+            session.busy = True
+            try:
+                segments = await loop.run_in_executor(self._executor, transcribe_job, job, self.backend)
+                await session.emit(job, segments)
+            except Exception as e:
+                logging.error(f"Live session {session.id}: {job['kind']} failed: {e}")
+            finally:
+                session.busy = False
+                session.idle.set()
+                if not session.closed:
+                    self.schedule(session)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "waiting": self._ready.qsize() if self._ready else 0,
+            "sessions": [s.stats() for s in self.sessions.values()],
+        }
+
+
+live_backend = get_backend(LIVE_BACKEND, model=LIVE_MODEL, device=LIVE_DEVICE, compute_type=LIVE_COMPUTE_TYPE)
+
+
+def transcribe_job(job: dict, backend=None) -> list[dict]:
+    backend = backend or live_backend
+    options = {"condition_on_previous_text": False, "suppress_blank": True} \
+        if backend.name == "faster-whisper" else {}
+    segments = backend.transcribe(
+        job["audio"],
+        start=job["start"],
+        beam_size=1 if job["kind"] == "partial" else 5,
+        **options,
+    )
+    return [{**s, "start": round(s["start"], 3), "end": round(s["end"], 3)} for s in segments]
+
+
+live_scheduler = LiveScheduler()
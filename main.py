@@ -1,97 +1,208 @@
-import whisperx
-from whisperx.diarize import DiarizationPipeline
-import librosa
-import soundfile as sf
 import numpy as np
+import logging
 import warnings
-from database import insert_with_uuid, diarization_collection
+import time
+from repository import diarization_repository
+from singleflight import SingleFlight
+from vad import VoiceActivityDetector, collect_speech
+from audio_io import load_pcm, duration as audio_duration
+from speaker_assign import assign_speakers, relabel_in_order, turn_rows
+from checkpoints import checkpoint_store, plan_windows, shift_segments, plain
+from model_registry import get_whisperx_model, get_align_model, get_diarize_pipeline
+from inference_pool import inference_pool
+from metrics import STAGE_SECONDS, AUDIO_SECONDS, CACHE_LOOKUPS
+from tiers import get_tier, tier_names, diarize_selector
 import os
 hf_token = os.getenv("HF_TOKEN")
+speech_detector = VoiceActivityDetector(2)
+DEFAULT_DIARIZATION_TIER = "balanced"
+DIARIZATION_MODEL = get_tier(DEFAULT_DIARIZATION_TIER)["whisperx_model"]
+
+# Concurrent requests for the same audio and parameters share one pipeline run
+diarization_flight = SingleFlight()
+
+def result_key(md5: str, min_speakers: int = 2, max_speakers: int = 6, tier: str = DEFAULT_DIARIZATION_TIER) -> dict:
+    # the tier is part of the stored key, so each tier keeps its own result even where two
+    # share a model (and differ in beam size or compute type); the model is kept for readers
+    model = get_tier(tier)["whisperx_model"]
+    return {"md5": md5, "model": model, "tier": tier, "min_speakers": min_speakers, "max_speakers": max_speakers}
+
+def align(segments, model_a, metadata, audio, device):
+    # whisperx (torch, pyannote) is imported on first use, not when the API starts
+    import whisperx
+    return whisperx.align(segments, model_a, metadata, audio, device)
+
+async def find_cached_diarization(md5: str, min_speakers: int = 2, max_speakers: int = 6,
+                                  tier: str = DEFAULT_DIARIZATION_TIER) -> dict | None:
+    """Stored result for `tier`; "auto" takes whichever tier is stored, most accurate first."""
+    doc = None
+    for name in tier_names(tier):
+        doc = await diarization_repository.find_async(result_key(md5, min_speakers, max_speakers, name))
+        if doc:
+            break
+    CACHE_LOOKUPS.inc(cache="diarization", result="hit" if doc else "miss")
+    return doc
+
 async def get_speaker_diarization_json(
     audio_file: str,
     md5: str,
     device: str = "cpu",
-    compute_type: str = "int8",
+    compute_type: str | None = None,
     min_speakers: int = 2,
     max_speakers: int = 6,
+    tier: str = DEFAULT_DIARIZATION_TIER,
     # clustering_threshold: float = 0.65,
 ) -> list[dict]:
     """
     Perform speaker diarization and return segments with speaker, timing, and text in JSON format.
+    `tier` is fast, balanced, accurate or auto (chosen from duration and inference queue depth).
     """
     
-    warnings.filterwarnings("ignore", category=UserWarning)
-    
     # 1. Check if already processed
-    existing_doc = diarization_collection.find_one({"md5": md5})
+    existing_doc = await find_cached_diarization(md5, min_speakers, max_speakers, tier)
     if existing_doc:
         return existing_doc
-    
-    # 2. Load and preprocess audio
-    audio, sr = librosa.load(audio_file, sr=16000, mono=True)
-    audio = librosa.util.normalize(librosa.effects.preemphasis(audio))
-    audio = audio.astype("float32")
-    duration = librosa.get_duration(y=audio, sr=sr)
-
-    # 3. Transcribe
-    model = whisperx.load_model("large-v2", device=device, compute_type=compute_type, language="en")
-    result = model.transcribe(audio)
-    
-    # 4. Align transcript
-    model_a, metadata = whisperx.load_align_model(language_code="en", device=device)
-    t_result = whisperx.align(result["segments"], model_a, metadata, audio, device)
-
-    # 5. Diarization
-    diarize_model = DiarizationPipeline(
-        use_auth_token=hf_token,
-        device=device
-    )
-    diarize_segments = diarize_model(
-        audio,
-        min_speakers=min_speakers,
-        max_speakers=max_speakers
+
+    if tier == "auto":
+        queue_depth = inference_pool.running + inference_pool.queued
+        tier = diarize_selector.choose(audio_duration(audio_file), queue_depth, inference_pool.max_workers)["name"]
+
+    # Model work runs on the bounded inference pool, off the event loop
+    key = tuple(result_key(md5, min_speakers, max_speakers, tier).values())
+    return await diarization_flight.do(
+        key, inference_pool.run,
+        diarize_file, audio_file, md5, device, compute_type, min_speakers, max_speakers, tier=tier
     )
 
-    # 6. Assign speaker labels
-    finalResult = whisperx.assign_word_speakers(diarize_segments, t_result)
 
-    speaker_order = []
-    for seg in finalResult["segments"]:
-        if seg["speaker"] not in speaker_order:
-            speaker_order.append(seg["speaker"])
+def diarize_file(
+    audio_file: str,
+    md5: str,
+    device: str = "cpu",
+    compute_type: str | None = None,
+    min_speakers: int = 2,
+    max_speakers: int = 6,
+    progress=None,
+    tier: str = DEFAULT_DIARIZATION_TIER,
+) -> dict:
+    """
+    Blocking pipeline behind get_speaker_diarization_json. `progress(stage, fraction, seconds)`
+    is called after each stage and each transcribed window (seconds None); it may raise to
+    abort the run (e.g. job cancellation). Transcription and alignment run in windows that
+    are checkpointed to MongoDB, so a rerun after a crash continues after the last one.
+    `compute_type` defaults to the tier's.
+    """
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    settings = get_tier(tier)
+    compute_type = compute_type or settings["compute_type"]
+    run_started = stage_started = time.perf_counter()
+
+    def stage_done(stage: str, fraction: float, seconds: float | None = None):
+        nonlocal stage_started
+        now = time.perf_counter()
+        seconds = now - stage_started if seconds is None else seconds
+        STAGE_SECONDS.observe(seconds, pipeline="diarize", stage=stage)
+        if progress is not None:
+            progress(stage, fraction, seconds)
+        stage_started = now
 
-    # 2. Create a mapping from original speaker IDs to standardized IDs
-    speaker_map = {orig: f"SPEAKER_{i:02d}" for i, orig in enumerate(speaker_order)}
+    # 2. Load and preprocess audio (decoded once per md5, then memory-mapped)
+    audio = load_pcm(audio_file, md5)
+    sr = 16000
+    duration = len(audio) / sr
 
-    # 3. Apply mapping to all segments
-    for seg in finalResult["segments"]:
-        seg["speaker"] = speaker_map[seg["speaker"]]
+    # Whisper, alignment and pyannote only see speech; times are mapped back in step 7
+    regions = speech_detector.regions(audio) or [(0.0, duration)]
+    speech, time_map = collect_speech(audio, regions, sr)
+    AUDIO_SECONDS.inc(duration, pipeline="diarize")
+    stage_done("decode", 0.1)
 
+    # 3-4. Transcribe and align window by window (windows end between speech regions);
+    # windows finished by an earlier, interrupted run come from the checkpoint
+    key = result_key(md5, min_speakers, max_speakers, tier)
+    plan = plan_windows(regions, sample_rate=sr)
+    run_id, done, turns = checkpoint_store.start(key, plan)
+    resumed = bool(done) or turns is not None
+    if resumed:
+        logging.info(f"Resuming {run_id}: {len(done)}/{len(plan)} windows done")
+
+    def preview(window_segments):
+        starts = time_map.to_original(np.array([seg["start"] for seg in window_segments]))
+        ends = time_map.to_original(np.array([seg["end"] for seg in window_segments]))
+        return [{"start": float(start), "end": float(end), "text": seg["text"]}
+                for seg, start, end in zip(window_segments, starts, ends)]
+
+    model = None
+    aligned_segments, spent = [], {"transcribe": 0.0, "align": 0.0}
+    for index, (first, last) in enumerate(plan):
+        if index in done:
+            aligned_segments.extend(done[index])
+            continue
+        if model is None:
+            model = get_whisperx_model(settings["whisperx_model"], device=device, compute_type=compute_type,
+                                       language="en", beam_size=settings["beam_size"])
+            model_a, metadata = get_align_model(language="en", device=device)
+        window = speech[first:last]
+        started = time.perf_counter()
+        result = model.transcribe(window)
+        transcribed = time.perf_counter()
+        t_result = align(result["segments"], model_a, metadata, window, device)
+        spent["transcribe"] += transcribed - started
+        spent["align"] += time.perf_counter() - transcribed
+        # stored and used in the same (round-tripped) form, so a resumed run matches a fresh one
+        window_segments = plain(shift_segments(t_result["segments"], first / sr))
+        checkpoint_store.save_window(run_id, index, window_segments, preview(window_segments))
+        aligned_segments.extend(window_segments)
+        if progress is not None:
+            progress("transcribe", 0.1 + 0.55 * (index + 1) / len(plan), None)
+    stage_done("transcribe", 0.6, spent["transcribe"])
+    stage_done("align", 0.65, spent["align"])
+
+    # 5. Diarization, over the whole file so speaker identities hold across windows
+    if turns is None:
+        diarize_model = get_diarize_pipeline(device=device, hf_token=hf_token)
+        diarize_segments = diarize_model(
+            speech,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers
+        )
+        turns = plain(turn_rows(diarize_segments))
+        checkpoint_store.save_turns(run_id, turns)
+    stage_done("diarize", 0.9)
+
+    # 6. Assign speaker labels (max overlap per word, segments split at speaker changes)
+    finalResult = assign_speakers(turns, {"segments": aligned_segments})
+
+    # Standardize speaker IDs to SPEAKER_00, SPEAKER_01, ... in order of appearance
+    relabel_in_order(finalResult["segments"])
 
     # 7. Prepare JSON output
-    output = []
-    speakers = []
-    for segment in finalResult["segments"]:
-        output.append({
-            "start": segment["start"],
-            "end": segment["end"],
-            "speaker": segment['speaker'],
-            "text": segment["text"]
-        })
-        if segment['speaker'] not in speakers:
-            speakers.append(segment['speaker'])
-    
-    # 8. Store in MongoDB
-    savedDoc = insert_with_uuid(diarization_collection, {
+    segments = finalResult["segments"]
+    starts = time_map.to_original(np.array([seg["start"] for seg in segments]))
+    ends = time_map.to_original(np.array([seg["end"] for seg in segments]))
+    output = [
+        {
+            "start": float(start),
+            "end": float(end),
+            "speaker": segment["speaker"],
+            "text": segment["text"],
+        }
+        for segment, start, end in zip(segments, starts, ends)
+    ]
+    speakers = {segment["speaker"] for segment in output}
+    stage_done("assign", 0.95)
+
+    # 8. Store in MongoDB (upsert: the first writer for this key wins, later ones read it back)
+    if not resumed:
+        diarize_selector.observe(tier, duration, time.perf_counter() - run_started)
+    foundDoc = diarization_repository.save(key, {
         "file": audio_file,
         "duration": duration,
         "speakers": len(speakers),
         "transcription": output,
-        "md5": md5
     })
-    foundDoc = diarization_collection.find_one({"_id": savedDoc.inserted_id })
-    if 'speakerMapping' in foundDoc:
-        for segment in foundDoc["transcription"]:
-            segment["speaker"] = foundDoc["speakerMapping"].get(segment["speaker"], segment["speaker"])
+    checkpoint_store.finish(run_id, foundDoc["_id"])
+    stage_done("persist", 1.0)
 
     return foundDoc
\ No newline at end of file
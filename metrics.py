@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ---------------- SETTINGS ----------------
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "speaker_api")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")      # text | json
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Trace id of the request (or job) being handled; copied into inference threads
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+# ---------------- PRIMITIVES ----------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Per-bucket counts are kept non-cumulative (one increment per observation) and summed on render."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, key, value) -> list[str]:
+        counts, total, count = value[0][:], value[1], value[2]
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            bucket_labels = _labels(self.labelnames, key, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics updated where the work happens, plus collectors that read existing stats()
+    at scrape time (queue depths, cache counters), rendered in Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """`collect()` yields (name, type, help, [(labels dict, value), ...])."""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                logging.warning(f"Metrics collector {collect.__name__} failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                full = f"{METRICS_PREFIX}_{name}"
+                lines += [f"# HELP {full} {help}", f"# TYPE {full} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{full}{_labels(labels.keys(), labels.values())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("stage_seconds", "Time per pipeline stage", ("pipeline", "stage"))
+MODEL_LOAD_SECONDS = metrics.histogram("model_load_seconds", "Model load time", ("kind", "name"),
+                                       buckets=(0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320))
+AUDIO_SECONDS = metrics.counter("audio_seconds_processed_total", "Seconds of audio processed", ("pipeline",))
+CACHE_LOOKUPS = metrics.counter("cache_lookups_total", "Result cache lookups", ("cache", "result"))
+LIVE_LATENCY = metrics.histogram("live_result_latency_seconds", "Live partial/final latency",
+                                 ("kind", "source"),
+                                 buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP requests being served")
+HTTP_SECONDS = metrics.histogram("http_request_seconds", "HTTP request duration", ("method", "route", "status"))
+
+
+# ---------------- STRUCTURED LOGS ----------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+_configured = False
+
+
+def configure_logging(fmt: str = LOG_FORMAT, level: str = LOG_LEVEL):
+    """Every record gets the current trace id; `fmt` "json" writes one JSON object per line."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = trace_id_var.get()
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(processName)s [%(trace_id)s] %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from metrics import MODEL_LOAD_SECONDS
+
+# ---------------- SETTINGS ----------------
+# 0 disables the corresponding limit
+MAX_MODELS = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "0"))
+IDLE_TTL_SECONDS = float(os.getenv("MODEL_REGISTRY_IDLE_TTL", "0"))
+MEMORY_BUDGET_MB = float(os.getenv("MODEL_REGISTRY_MEMORY_MB", "0"))
+
+# Approximate float16 footprint of the CTranslate2 / torch weights, in MB.
+_WHISPER_SIZES_MB = {
+    "tiny": 75, "base": 145, "small": 485, "medium": 1530,
+    "large": 3090, "turbo": 1620, "distil-small": 335,
+    "distil-medium": 790, "distil-large": 1510,
+}
+_COMPUTE_TYPE_SCALE = {"float32": 2.0, "float16": 1.0, "int8_float16": 0.55, "int8": 0.5}
+_FIXED_SIZES_MB = {"whisperx-align": 380, "pyannote-diarize": 60, "pyannote-embedding": 30, "vosk": 100}
+
+
+def estimate_size_mb(kind: str, name: str, compute_type: str = "float16") -> float:
+    if kind in _FIXED_SIZES_MB:
+        return _FIXED_SIZES_MB[kind]
+    base = name.split("/")[-1].replace(".en", "")
+    size = next((mb for prefix, mb in sorted(_WHISPER_SIZES_MB.items(), key=lambda kv: -len(kv[0]))
+                 if base.startswith(prefix)), 1000)
+    return size * _COMPUTE_TYPE_SCALE.get(compute_type, 1.0)
+
+
+class _Entry:
+    __slots__ = ("model", "size_mb", "loaded_at", "last_used", "load_seconds", "hits")
+
+    def __init__(self, model, size_mb, load_seconds):
+        now = time.monotonic()
+        self.model = model
+        self.size_mb = size_mb
+        self.loaded_at = now
+        self.last_used = now
+        self.load_seconds = load_seconds
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models keyed by (kind, name, device, compute_type, language).
+    Each model is loaded once and shared; entries are evicted by LRU order when the
+    count or memory budget is exceeded, and after IDLE_TTL_SECONDS without use (checked
+    on every get() and, once `start_sweeper()` ran, periodically in the background).
+    """
+
+    def __init__(self, max_models: int = 0, idle_ttl: float = 0, memory_budget_mb: float = 0):
+        self.max_models = max_models
+        self.idle_ttl = idle_ttl
+        self.memory_budget_mb = memory_budget_mb
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self._sweeper = None
+        self._sweeper_stop = threading.Event()
+
+    def get(self, key: tuple, loader, size_mb: float = 0):
+        """Return the model for `key`, calling `loader()` only if it is not loaded yet."""
+        with self._lock:
+            self._evict_idle_locked()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit_locked(key, entry)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available meanwhile;
+        # the per-key lock makes concurrent requests for the same model wait for one load.
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._hit_locked(key, entry)
+
+            started = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - started
+            logging.info(f"Loaded model {key} in {load_seconds:.2f}s")
+            MODEL_LOAD_SECONDS.observe(load_seconds, kind=key[0], name=key[1])
+
+            with self._lock:
+                self._entries[key] = _Entry(model, size_mb, load_seconds)
+                self.loads += 1
+                self._enforce_limits_locked(keep=key)
+                self._key_locks.pop(key, None)
+            return model
+
+    def _hit_locked(self, key, entry):
+        entry.last_used = time.monotonic()
+        entry.hits += 1
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def _evict_locked(self, key):
+        self._entries.pop(key)
+        self.evictions += 1
+        logging.info(f"Evicted model {key}")
+
+    def _evict_idle_locked(self):
+        if not self.idle_ttl:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        for key in [k for k, e in self._entries.items() if e.last_used < cutoff]:
+            self._evict_locked(key)
+
+    def _enforce_limits_locked(self, keep):
+        def over_limit():
+            if self.max_models and len(self._entries) > self.max_models:
+                return True
+            if self.memory_budget_mb:
+                return sum(e.size_mb for e in self._entries.values()) > self.memory_budget_mb
+            return False
+
+        for key in list(self._entries):
+            if not over_limit():
+                break
+            if key != keep:
+                self._evict_locked(key)
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_idle_locked()
+
+    def start_sweeper(self):
+        """Evict idle models from a background thread too, so they go when no request comes."""
+        if not self.idle_ttl or self._sweeper is not None:
+            return
+        interval = max(1.0, min(self.idle_ttl / 2, 60.0))
+
+        def sweep():
+            while not self._sweeper_stop.wait(interval):
+                self.evict_idle()
+
+        self._sweeper = threading.Thread(target=sweep, name="model-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._sweeper_stop.set()
+            self._sweeper.join()
+            self._sweeper = None
+            self._sweeper_stop.clear()
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "memory_mb": sum(e.size_mb for e in self._entries.values()),
+                "models": [
+                    {
+                        "key": list(key),
+                        "size_mb": e.size_mb,
+                        "hits": e.hits,
+                        "load_seconds": round(e.load_seconds, 3),
+                        "idle_seconds": round(time.monotonic() - e.last_used, 3),
+                    }
+                    for key, e in self._entries.items()
+                ],
+            }
+
+
+registry = ModelRegistry(MAX_MODELS, IDLE_TTL_SECONDS, MEMORY_BUDGET_MB)
+
+
+# ---------------- LOADERS ----------------
+def get_whisper_model(name: str, device: str = "cpu", compute_type: str = "int8", **kwargs):
+    """faster-whisper WhisperModel (used by transcribe.py and the live scripts)."""
+    def load():
+        from faster_whisper import WhisperModel
+        return WhisperModel(name, device=device, compute_type=compute_type, **kwargs)
+
+    key = ("faster-whisper", name, device, compute_type, None) + tuple(sorted(kwargs.items()))
+    return registry.get(key, load, estimate_size_mb("faster-whisper", name, compute_type))
+
+
+def get_whisperx_model(name: str, device: str = "cpu", compute_type: str = "int8", language: str = "en",
+                       **asr_options):
+    """whisperx ASR pipeline; `asr_options` (e.g. beam_size) are fixed at load time."""
+    def load():
+        import whisperx
+        return whisperx.load_model(name, device=device, compute_type=compute_type, language=language,
+                                   **({"asr_options": asr_options} if asr_options else {}))
+
+    key = ("whisperx", name, device, compute_type, language) + tuple(sorted(asr_options.items()))
+    return registry.get(key, load, estimate_size_mb("whisperx", name, compute_type))
+
+
+def get_align_model(language: str = "en", device: str = "cpu"):
+    """Returns the (model, metadata) pair from whisperx.load_align_model."""
+    def load():
+        import whisperx
+        return whisperx.load_align_model(language_code=language, device=device)
+
+    key = ("whisperx-align", "default", device, None, language)
+    return registry.get(key, load, estimate_size_mb("whisperx-align", "default"))
+
+
+def get_diarize_pipeline(device: str = "cpu", hf_token: str | None = None,
+                         name: str = "pyannote/speaker-diarization-3.1"):
+    def load():
+        from whisperx.diarize import DiarizationPipeline
+        return DiarizationPipeline(model_name=name, use_auth_token=hf_token, device=device)
+
+    key = ("pyannote-diarize", name, device, None, None)
+    return registry.get(key, load, estimate_size_mb("pyannote-diarize", name))
+
+
+def get_speaker_embedding(device: str = "cpu", hf_token: str | None = None,
+                          name: str = "pyannote/wespeaker-voxceleb-resnet34-LM"):
+    """pyannote embedding inference over whole excerpts; the model speaker-diarization-3.1 uses."""
+    def load():
+        import torch
+        from pyannote.audio import Inference, Model
+        model = Model.from_pretrained(name, use_auth_token=hf_token)
+        return Inference(model, window="whole", device=torch.device(device))
+
+    key = ("pyannote-embedding", name, device, None, None)
+    return registry.get(key, load, estimate_size_mb("pyannote-embedding", name))
+
+
+def get_vosk_model(path: str):
+    """vosk Model loaded from an unpacked model directory (one per process, shared by recognizers)."""
+    def load():
+        from vosk import Model
+        return Model(path)
+
+    key = ("vosk", path, None, None, None)
+    return registry.get(key, load, estimate_size_mb("vosk", path))
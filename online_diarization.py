@@ -0,0 +1,247 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+from vad import VoiceActivityDetector
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+ONLINE_DIARIZATION_EMBEDDING = os.getenv("ONLINE_DIARIZATION_EMBEDDING", "pyannote")   # pyannote | spectral
+ONLINE_DIARIZATION_DEVICE = os.getenv("ONLINE_DIARIZATION_DEVICE", "cpu")
+ONLINE_DIARIZATION_THRESHOLD = float(os.getenv("ONLINE_DIARIZATION_THRESHOLD", "0.35"))  # cosine similarity
+ONLINE_DIARIZATION_MAX_SPEAKERS = int(os.getenv("ONLINE_DIARIZATION_MAX_SPEAKERS", "8"))
+embed_window = 1.5        # speech is embedded in pieces of this length
+min_embed = 0.5           # shorter speech is not embedded; it goes to the previous speaker
+min_new_speaker = 1.0     # only pieces this long may open a new speaker
+max_latency = 2.0         # an ongoing region is embedded after at most this much speech
+merge_threshold = 0.75    # centroids that drift this close are merged into the older one
+history_seconds = 600.0   # turns kept for lookups
+
+
+# ---------------- EMBEDDINGS ----------------
+def pyannote_embedder(device: str = ONLINE_DIARIZATION_DEVICE, hf_token: str | None = None):
+    """Speaker embedding of an in-memory float32 excerpt, no files involved."""
+    import torch
+    from model_registry import get_speaker_embedding
+    inference = get_speaker_embedding(device, hf_token or os.getenv("HF_TOKEN"))
+
+    def embed(audio: np.ndarray) -> np.ndarray:
+        waveform = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))[None]
+        return np.asarray(inference({"waveform": waveform, "sample_rate": samplerate})).reshape(-1)
+
+    return embed
+
+
+def spectral_embedder(n_bands: int = 40, frame: int = 400, hop: int = 160):
+    """
+    Mean and spread of log band energies. Far weaker than a trained speaker model, but
+    needs no download, so the streaming logic can be exercised offline on CPU.
+    """
+    window = np.hanning(frame).astype(np.float32)
+    edges = np.unique(np.geomspace(2, frame // 2 + 1, n_bands + 1).astype(int))
+
+    def embed(audio: np.ndarray) -> np.ndarray:
+        frames = np.lib.stride_tricks.sliding_window_view(np.asarray(audio, dtype=np.float32), frame)[::hop]
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        bands = np.log(np.add.reduceat(power, edges[:-1], axis=1) + 1e-8)
+        bands -= bands.mean(axis=1, keepdims=True)       # gain invariant
+        return np.concatenate([bands.mean(axis=0), bands.std(axis=0)])
+
+    return embed
+
+
+def get_embedder(kind: str = ONLINE_DIARIZATION_EMBEDDING):
+    return spectral_embedder() if kind == "spectral" else pyannote_embedder()
+
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+
+# ---------------- ONLINE DIARIZER ----------------
+class OnlineDiarizer:
+    """
+    Incremental diarization of one audio stream. Audio is pushed as it arrives; only speech
+    not seen before is embedded, each embedding joins the closest running speaker centroid
+    (or opens a new speaker below `threshold`), so speaker IDs stay the same for the whole
+    session. Work per push is bounded by the pushed audio plus `max_latency`.
+    """
+
+    def __init__(self, embed=None, threshold: float = ONLINE_DIARIZATION_THRESHOLD,
+                 max_speakers: int = ONLINE_DIARIZATION_MAX_SPEAKERS, sample_rate: int = samplerate):
+        self.embed = embed or get_embedder()
+        self.threshold = threshold
+        self.max_speakers = max_speakers
+        self.sample_rate = sample_rate
+        self.vad = VoiceActivityDetector(2, sample_rate)
+        self.pending = np.zeros(0, dtype=np.float32)   # audio from `cursor` on, not yet diarized
+        self.cursor = 0.0                              # session time of pending[0]
+        self.centroids: list[np.ndarray] = []          # sum of unit embeddings per speaker
+        self.counts: list[float] = []
+        self.aliases: dict[int, int] = {}              # merged speaker -> surviving speaker
+        self.turns: list[list] = []                    # [start, end, speaker], chronological
+        self.embeddings = 0
+        self.push_seconds: list[float] = []
+
+    # ---- clustering ----
+    def _resolve(self, speaker: int) -> int:
+        while speaker in self.aliases:
+            speaker = self.aliases[speaker]
+        return speaker
+
+    def _active(self) -> list[int]:
+        return [i for i in range(len(self.centroids)) if i not in self.aliases]
+
+    def _assign(self, embedding: np.ndarray, duration: float) -> int:
+        embedding = _unit(embedding)
+        active = self._active()
+        if active:
+            sims = np.array([embedding @ _unit(self.centroids[i]) for i in active])
+            best = int(sims.argmax())
+            if sims[best] >= self.threshold or duration < min_new_speaker or len(active) >= self.max_speakers:
+                speaker = active[best]
+                self.centroids[speaker] += embedding * duration
+                self.counts[speaker] += duration
+                self._merge_close(speaker)
+                return self._resolve(speaker)
+        self.centroids.append(embedding * duration)
+        self.counts.append(duration)
+        return len(self.centroids) - 1
+
+    def _merge_close(self, speaker: int):
+        """A centroid that moved next to another one is the same voice; the older ID survives."""
+        for other in self._active():
+            if other == speaker:
+                continue
+            if _unit(self.centroids[speaker]) @ _unit(self.centroids[other]) >= merge_threshold:
+                keep, drop = min(speaker, other), max(speaker, other)
+                self.centroids[keep] += self.centroids[drop]
+                self.counts[keep] += self.counts[drop]
+                self.aliases[drop] = keep
+                logging.info(f"Online diarization merged SPEAKER_{drop:02d} into SPEAKER_{keep:02d}")
+                return
+
+    def _add_turn(self, start: float, end: float, speaker: int):
+        if self.turns and self.turns[-1][2] == speaker and start - self.turns[-1][1] < 0.5:
+            self.turns[-1][1] = max(self.turns[-1][1], end)
+        else:
+            self.turns.append([start, end, speaker])
+
+    def _label_region(self, audio: np.ndarray, start: float, end: float):
+        duration = end - start
+        if duration < min_embed:
+            if self.turns:
+                self._add_turn(start, end, self._resolve(self.turns[-1][2]))
+            return
+        # embed in pieces; a short remainder joins the previous piece
+        n = max(1, int(duration // embed_window))
+        bounds = np.linspace(start, end, n + 1) if duration - n * embed_window < min_embed \
+            else np.append(np.arange(n + 1) * embed_window + start, end)
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            piece = audio[int((s - self.cursor) * self.sample_rate):int((e - self.cursor) * self.sample_rate)]
+            self.embeddings += 1
+            self._add_turn(float(s), float(e), self._assign(self.embed(piece), float(e - s)))
+
+    # ---- streaming ----
+    def push(self, audio: np.ndarray) -> list[tuple[float, float, str]]:
+        """Append the next block of the stream; returns the turns added or extended by it."""
+        started = time.perf_counter()
+        before = len(self.turns)
+        self.pending = np.concatenate([self.pending, np.asarray(audio, dtype=np.float32).reshape(-1)])
+        pending_end = self.cursor + len(self.pending) / self.sample_rate
+        regions = [(self.cursor + s, self.cursor + e) for s, e in self.vad.regions(self.pending)]
+
+        new_cursor = self.cursor
+        for start, end in regions:
+            open_region = end >= pending_end - 1e-3
+            if open_region:
+                if end - start < max_latency:
+                    new_cursor = start          # wait for the region to finish
+                    break
+                # bounded latency: label what we have, keep a little context to continue from
+                end = start + (end - start) // embed_window * embed_window
+            self._label_region(self.pending, start, end)
+            new_cursor = end
+        else:
+            if not regions or regions[-1][1] < pending_end - 1e-3:
+                # all speech is done; keep a short tail so a word cut at the block edge is not lost
+                new_cursor = max(new_cursor, pending_end - 0.3)
+
+        self.pending = self.pending[int((new_cursor - self.cursor) * self.sample_rate):].copy()
+        self.cursor = new_cursor
+        self._trim_history(pending_end)
+        self.push_seconds.append(time.perf_counter() - started)
+        return [self._public(t) for t in self.turns[max(0, before - 1):]]
+
+    def flush(self) -> list[tuple[float, float, str]]:
+        """Label whatever is still pending, e.g. at the end of the stream."""
+        before = len(self.turns)
+        for start, end in self.vad.regions(self.pending):
+            self._label_region(self.pending, self.cursor + start, self.cursor + end)
+        self.cursor += len(self.pending) / self.sample_rate
+        self.pending = self.pending[:0]
+        return [self._public(t) for t in self.turns[before:]]
+
+    def _trim_history(self, now: float):
+        cut = 0
+        while cut < len(self.turns) and self.turns[cut][1] < now - history_seconds:
+            cut += 1
+        if cut:
+            del self.turns[:cut]
+
+    # ---- lookups ----
+    def _public(self, turn) -> tuple[float, float, str]:
+        return round(turn[0], 3), round(turn[1], 3), f"SPEAKER_{self._resolve(turn[2]):02d}"
+
+    def turns_between(self, start: float, end: float) -> list[tuple[float, float, str]]:
+        """Turns overlapping [start, end) in session time, merged speakers already resolved."""
+        out = []
+        for turn in reversed(self.turns):
+            if turn[1] <= start:
+                break
+            if turn[0] < end:
+                out.append(self._public(turn))
+        return out[::-1]
+
+    def speaker_at(self, start: float, end: float) -> str | None:
+        """Speaker overlapping the span most; the latest speaker while its turn is still open."""
+        from speaker_assign import SpeakerIndex
+        turns = self.turns_between(start, end) or self.turns_between(start - 5.0, end)[-1:]
+        if not turns:
+            return None
+        index = SpeakerIndex.from_diarization(turns)
+        return index.label(index.assign([start], [end], fill_nearest=True)[0])
+
+    def stats(self) -> dict:
+        from live import latency_summary
+        return {
+            "speakers": len(self._active()),
+            "turns": len(self.turns),
+            "embeddings": self.embeddings,
+            "pending_seconds": round(len(self.pending) / self.sample_rate, 3),
+            "push": latency_summary(self.push_seconds),
+        }
+
+
+if __name__ == "__main__":
+    from audio_io import decode
+
+    parser = argparse.ArgumentParser(description="Stream a file through the online diarizer")
+    parser.add_argument("audio", nargs="?", default="audio.mp3")
+    parser.add_argument("--block", type=float, default=1.0, help="seconds per pushed block")
+    parser.add_argument("--embedding", choices=["pyannote", "spectral"], default=ONLINE_DIARIZATION_EMBEDDING)
+    args = parser.parse_args()
+
+    audio = decode(args.audio)
+    diarizer = OnlineDiarizer(embed=get_embedder(args.embedding))
+    step = int(args.block * samplerate)
+    for offset in range(0, len(audio), step):
+        for start, end, speaker in diarizer.push(audio[offset:offset + step]):
+            print(f"{start:8.2f} - {end:8.2f}  {speaker}")
+    for start, end, speaker in diarizer.flush():
+        print(f"{start:8.2f} - {end:8.2f}  {speaker}")
+    stats = diarizer.stats()
+    print(f"{len(audio) / samplerate:.1f}s audio, {stats['speakers']} speakers, "
+          f"{stats['embeddings']} embeddings, per-block latency {stats['push']}")
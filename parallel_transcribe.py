@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+PARALLEL_MODEL = os.getenv("PARALLEL_MODEL", "small.en")
+PARALLEL_COMPUTE_TYPE = os.getenv("PARALLEL_COMPUTE_TYPE", "int8")
+PARALLEL_CPU_THREADS = int(os.getenv("PARALLEL_CPU_THREADS", "2"))     # intra-op threads per worker
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // PARALLEL_CPU_THREADS)
+target_chunk_duration = 60.0     # chunks are cut in the silence closest after this length
+max_chunk_duration = 120.0
+
+_pool = None
+
+
+# ---------------- CHUNK PLANNING ----------------
+def plan_chunks(regions: list[tuple[float, float]], target: float = target_chunk_duration,
+                max_len: float = max_chunk_duration) -> list[list[tuple[float, float]]]:
+    """Group consecutive speech regions into chunks, so every cut falls inside a silence."""
+    chunks, current = [], []
+    for start, end in regions:
+        if current and (end - current[0][0] > max_len or current[-1][1] - current[0][0] >= target):
+            chunks.append(current)
+            current = []
+        current.append((start, end))
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------- WORKER ----------------
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int):
+    # Each process holds its own model; num_workers=1 since the process itself is the unit of parallelism
+    global _model
+    from model_registry import get_whisper_model
+    _model = get_whisper_model(model_size, device="cpu", compute_type=compute_type,
+                               cpu_threads=cpu_threads, num_workers=1)
+
+
+def _transcribe_chunk(audio: np.ndarray, offset: float, regions: list[tuple[float, float]],
+                      beam_size: int) -> list[dict]:
+    from vad import clip_timestamps
+    local = [(start - offset, end - offset) for start, end in regions]
+    segments, _ = _model.transcribe(
+        audio, language="en", beam_size=beam_size, clip_timestamps=clip_timestamps(local)
+    )
+    return [
+        {
+            "start": round(offset + s.start, 3),
+            "end": round(offset + s.end, 3),
+            "text": s.text,
+            "avg_logprob": s.avg_logprob,
+        }
+        for s in segments
+    ]
+
+
+def _noop(_):
+    return None
+
+
+def get_pool(workers: int = PARALLEL_WORKERS) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(PARALLEL_MODEL, PARALLEL_COMPUTE_TYPE, PARALLEL_CPU_THREADS),
+        )
+    return _pool
+
+
+# ---------------- MERGE ----------------
+def _words(text: str) -> list[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+def strip_repeated_prefix(previous: str, text: str, max_words: int = 8) -> str:
+    """Drop leading words of `text` that repeat the tail of `previous` (2+ words)."""
+    prev_words, words = _words(previous), _words(text)
+    for n in range(min(max_words, len(prev_words), len(words)), 1, -1):
+        if prev_words[-n:] == words[:n]:
+            tokens = text.split()
+            return " " + " ".join(tokens[n:]) if len(tokens) > n else ""
+    return text
+
+
+def merge_chunks(chunk_results: list[list[dict]]) -> list[dict]:
+    merged = []
+    for segments in chunk_results:
+        for i, segment in enumerate(segments):
+            if i == 0 and merged:
+                previous = merged[-1]
+                if _words(previous["text"]) == _words(segment["text"]):
+                    continue
+                segment = {**segment, "text": strip_repeated_prefix(previous["text"], segment["text"])}
+                if not segment["text"].strip():
+                    continue
+            merged.append(segment)
+    merged.sort(key=lambda s: s["start"])
+    return merged
+
+
+# ---------------- ENTRY POINT ----------------
+def transcribe_parallel(audio: np.ndarray, beam_size: int = 5, workers: int = PARALLEL_WORKERS) -> dict:
+    """
+    Split at silence boundaries, transcribe chunks concurrently in worker processes and
+    merge them on the file timeline. Returns segments, text and the real-time factor.
+    """
+    from vad import VoiceActivityDetector
+
+    started = time.perf_counter()
+    duration = len(audio) / samplerate
+    regions = VoiceActivityDetector(2).regions(audio)
+    chunks = plan_chunks(regions)
+
+    pool = get_pool(workers)
+    futures = []
+    for chunk in chunks:
+        offset, end = chunk[0][0], chunk[-1][1]
+        piece = audio[int(offset * samplerate):int(end * samplerate)]
+        futures.append(pool.submit(_transcribe_chunk, piece, offset, chunk, beam_size))
+    segments = merge_chunks([f.result() for f in futures])
+
+    wall = time.perf_counter() - started
+    rtf = wall / duration if duration else 0.0
+    logging.info(f"Parallel transcription: {duration:.1f}s audio, {len(chunks)} chunks, "
+                 f"{workers} workers, {wall:.1f}s wall, RTF {rtf:.3f}")
+    return {
+        "segments": segments,
+        "text": "".join(s["text"] for s in segments),
+        "audio_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 3),
+        "rtf": round(rtf, 4),
+        "chunks": len(chunks),
+        "workers": workers,
+    }
+
+
+if __name__ == "__main__":
+    from faster_whisper import decode_audio
+
+    parser = argparse.ArgumentParser(description="Chunked multi-process transcription")
+    parser.add_argument("audio", nargs="?", default="audio.mp3")
+    parser.add_argument("--workers", type=int, nargs="+", default=[PARALLEL_WORKERS],
+                        help="one or more worker counts to compare")
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio, sampling_rate=samplerate)
+    for n in args.workers:
+        _pool = None
+        # start the workers and load their models before timing
+        list(get_pool(n).map(_noop, range(n)))
+        result = transcribe_parallel(audio, workers=n)
+        print(f"workers={n:3d} chunks={result['chunks']:4d} wall={result['wall_seconds']:8.2f}s "
+              f"RTF={result['rtf']:.4f}")
+        _pool.shutdown()
@@ -1,76 +1,32 @@
 import sounddevice as sd
-import numpy as np
 import queue
 import threading
 from faster_whisper import WhisperModel
-import webrtcvad
-import re
-import language_tool_python
+from vad import VoiceActivityDetector
+import itertools
+from ring_buffer import RingBuffer
+from text_filters import TextFilter, GrammarRefiner
 
 # ---------------- SETTINGS ----------------
 samplerate = 16000
 block_duration = 2.5       # longer block to reduce repeated tokens
 chunk_duration = 1.0       # bigger chunk for better context
+chunk_overlap = 0.25       # context shared by consecutive chunks
+buffer_duration = 30.0     # ring buffer capacity
 channels = 1               # mono
 frame_per_block = int(samplerate * block_duration)
 frame_per_chunk = int(samplerate * chunk_duration)
+frame_per_stride = frame_per_chunk - int(samplerate * chunk_overlap)
 
 audio_queue = queue.Queue()
-audio_buffer = []
+audio_buffer = RingBuffer(int(samplerate * buffer_duration))
 
 model = WhisperModel("medium.en", device="cuda", compute_type="float16")
-vad = webrtcvad.Vad(2)  # 0-3, higher = more aggressive
-
-tool = language_tool_python.LanguageTool('en')
+vad = VoiceActivityDetector(2, samplerate, hop_ms=15)  # 0-3, higher = more aggressive
 
 # ---------------- FILTERS ----------------
-banned_words = {"ass", "fuck", "shit"}
-IGNORE_PHRASES = [
-    "thank you",
-    "thanks for watching",
-    "thank you very much",
-    "i'm so sorry",
-    "oh",
-    "alright",
-    "i love you",
-    "happy birthday",
-    "so let's see",
-    "okay",
-    "i'm going to",
-    "next video",
-    "see you",
-]
-
-def should_ignore(text: str) -> bool:
-    text_lc = text.lower().strip()
-    for phrase in IGNORE_PHRASES:
-        if phrase in text_lc:
-            return True
-    return False
-
-# ---------------- VAD CHECK ----------------
-def is_speech(audio_chunk: np.ndarray) -> bool:
-    if audio_chunk.size == 0:
-        return False
-    
-    if audio_chunk.dtype != np.int16:
-        audio_chunk = np.clip(audio_chunk, -1.0, 1.0)
-        int16_audio = (audio_chunk * 32767).astype(np.int16)
-    else:
-        int16_audio = audio_chunk
-
-    frame_duration_ms = 30
-    frame_size = int(samplerate * frame_duration_ms / 1000)
-
-    # Slide window with small overlap
-    for i in range(0, len(int16_audio) - frame_size + 1, frame_size // 2):
-        frame = int16_audio[i:i + frame_size]
-        try:
-            if vad.is_speech(frame.tobytes(), samplerate):
-                return True
-        except Exception:
-            continue
-    return False
+# banned words and ignore phrases come from BANNED_WORDS_FILE / IGNORE_PHRASES_FILE if set
+text_filter = TextFilter()
 
 # ---------------- AUDIO CALLBACK ----------------
 def audio_callback(indata, frames, time, status):
@@ -86,30 +42,42 @@ def recorder():
             sd.sleep(100)
 
 # ---------------- TEXT REFINEMENT ----------------
-def refine_text_local(text: str) -> str:
-    matches = tool.check(text)
-    return language_tool_python.utils.correct(text, matches)
+# LanguageTool runs on its own thread; the raw line is printed at once and the
+# corrected one follows as an update when it differs
+refiner = GrammarRefiner()
+line_ids = itertools.count(1)
+
+def show_refined(line_id: int, prefix: str = ""):
+    def on_refined(raw_text: str, refined_text: str):
+        if refined_text != raw_text:
+            print(f"  (update {line_id}) {prefix}{refined_text}")
+    return on_refined
 
 # ---------------- TRANSCRIBER ----------------
+def owns_segment(window_start: int, segment, offset: float = 0.0) -> bool:
+    """With overlapping chunks, keep a segment only in the chunk whose own span holds its midpoint."""
+    half_overlap = chunk_overlap / 2
+    lo = half_overlap if window_start > 0 else 0.0
+    hi = chunk_duration - half_overlap
+    return lo <= offset + (segment.start + segment.end) / 2 < hi
+
 def transcriber():
-    global audio_buffer
     while True:
         block = audio_queue.get()
-        audio_buffer.append(block)
-        total_frames = sum(len(b) for b in audio_buffer)
-
-        if total_frames >= frame_per_chunk:
-            # concatenate chunk and flatten
-            audio_data = np.concatenate(audio_buffer)[:frame_per_chunk].flatten().astype(np.float32)
-            audio_buffer = []  # clear buffer
+        audio_buffer.write(block)
 
-            # Only process if VAD detects speech
-            if not is_speech(audio_data):
+        # every full chunk is processed, stepping by stride, so no audio is dropped
+        for window_start, audio_data in audio_buffer.windows(frame_per_chunk, frame_per_stride):
+            # Only process if VAD detects speech, trimmed to the speech it found
+            regions = vad.regions(audio_data, min_speech=0.1, min_silence=0.2, pad=0.1)
+            if not regions:
                 continue
+            offset = regions[0][0]
+            speech = audio_data[int(offset * samplerate):int(regions[-1][1] * samplerate)]
 
             # Whisper transcription
             segments, _ = model.transcribe(
-                audio_data,
+                speech,
                 language="en",
                 beam_size=5,                      # better accuracy for Indian English
                 condition_on_previous_text=True,  # maintain context 
@@ -120,18 +88,18 @@ def transcriber():
                 raw_text = segment.text.strip()
                 if not raw_text:
                     continue
-                # Skip banned words
-                if any(re.search(rf"\b{bw}\b", raw_text.lower()) for bw in banned_words):
+                if not owns_segment(window_start, segment, offset):
                     continue
-                # Skip ignored phrases
-                if should_ignore(raw_text):
+                # Skip banned words and ignored phrases
+                if text_filter.reject_reason(raw_text):
                     continue
                 # Skip low confidence segments
                 if hasattr(segment, "avg_log_prob") and segment.avg_log_prob < -0.3:
                     continue
 
-                refined_text = refine_text_local(raw_text)
-                print(refined_text)
+                line_id = next(line_ids)
+                print(f"({line_id}) {raw_text}")
+                refiner.submit(raw_text, show_refined(line_id))
 
 # ---------------- START THREADS ----------------
 threading.Thread(target=recorder, daemon=True).start()
@@ -0,0 +1,237 @@
+import os
+import uuid
+from pymongo import ReturnDocument, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from database import diarization_collection, segments_collection, get_async_db
+
+# ---------------- SETTINGS ----------------
+SEGMENT_BUCKET_SECONDS = float(os.getenv("SEGMENT_BUCKET_SECONDS", "60"))
+SEGMENT_PAGE_LIMIT = int(os.getenv("SEGMENT_PAGE_LIMIT", "500"))
+
+# Fields a diarization result is served with
+RESULT_PROJECTION = {"_id": 1, "tier": 1, "file": 1, "duration": 1, "speakers": 1, "transcription": 1}
+# Stored next to them for results whose segments live in diarization_segments
+CHUNKED_FIELDS = {"speaker_names": 1, "bucket_seconds": 1, "max_segment_seconds": 1}
+
+
+def _renamed(speaker: str) -> dict:
+    """Expression for `speaker` (a field path or variable) after `speakerMapping` renames."""
+    return {"$let": {
+        "vars": {"renamed": {"$filter": {
+            "input": {"$objectToArray": {"$ifNull": ["$speakerMapping", {}]}},
+            "cond": {"$eq": ["$$this.k", speaker]},
+        }}},
+        "in": {"$ifNull": [{"$arrayElemAt": ["$$renamed.v", 0]}, speaker]},
+    }}
+
+
+def result_pipeline(key: dict) -> list[dict]:
+    """
+    One indexed match, projected to the response fields, with `speakerMapping` (manual
+    speaker renames) applied by the server: to the speaker dictionary of chunked results,
+    or to every segment of results stored the older way, with the segments embedded.
+    """
+    return [
+        {"$match": key},
+        {"$limit": 1},
+        {"$project": {
+            **RESULT_PROJECTION,
+            **CHUNKED_FIELDS,
+            "speaker_names": {"$map": {"input": "$speaker_names", "as": "name", "in": _renamed("$$name")}},
+            "transcription": {"$map": {
+                "input": "$transcription",
+                "as": "segment",
+                "in": {
+                    "start": "$$segment.start",
+                    "end": "$$segment.end",
+                    "speaker": _renamed("$$segment.speaker"),
+                    "text": "$$segment.text",
+                },
+            }},
+        }},
+    ]
+
+
+# ---------------- COMPACT SEGMENTS ----------------
+def encode_segments(segments: list[dict], bucket_seconds: float = SEGMENT_BUCKET_SECONDS) -> tuple[list, list, float]:
+    """
+    (speaker names, chunks, longest segment). A segment goes to the bucket its start falls
+    in; a chunk holds one bucket as columns, with speakers as indexes into the names.
+    """
+    names: dict[str, int] = {}
+    chunks: dict[int, dict] = {}
+    longest = 0.0
+    for segment in segments:
+        bucket = int(segment["start"] // bucket_seconds)
+        chunk = chunks.get(bucket)
+        if chunk is None:
+            chunk = chunks[bucket] = {"bucket": bucket, "starts": [], "ends": [], "speaker_ids": [],
+                                      "texts": [], "t_end": segment["end"]}
+        chunk["starts"].append(segment["start"])
+        chunk["ends"].append(segment["end"])
+        chunk["speaker_ids"].append(names.setdefault(segment["speaker"], len(names)))
+        chunk["texts"].append(segment["text"])
+        chunk["t_end"] = max(chunk["t_end"], segment["end"])
+        longest = max(longest, segment["end"] - segment["start"])
+    return list(names), [chunks[b] for b in sorted(chunks)], longest
+
+
+def iter_chunk_segments(chunk: dict, speaker_names: list[str]):
+    for start, end, speaker_id, text in zip(chunk["starts"], chunk["ends"], chunk["speaker_ids"], chunk["texts"]):
+        yield {"start": start, "end": end, "speaker": speaker_names[speaker_id], "text": text}
+
+
+def segment_filter(start: float | None = None, end: float | None = None, speaker: str | None = None):
+    """Predicate for segments overlapping [start, end) and spoken by `speaker`."""
+    def keep(segment: dict) -> bool:
+        return ((start is None or segment["end"] > start)
+                and (end is None or segment["start"] < end)
+                and (speaker is None or segment["speaker"] == speaker))
+    return keep
+
+
+def chunk_query(doc: dict, start: float | None = None, end: float | None = None) -> dict:
+    """Index range over the result's buckets that can hold segments overlapping [start, end)."""
+    query = {"result_id": doc["_id"]}
+    bucket = {}
+    if start is not None:
+        # a segment reaches at most max_segment_seconds past the bucket of its start
+        bucket["$gte"] = int((start - doc["max_segment_seconds"]) // doc["bucket_seconds"])
+        query["t_end"] = {"$gt": start}
+    if end is not None:
+        bucket["$lte"] = int(end // doc["bucket_seconds"])
+    if bucket:
+        query["bucket"] = bucket
+    return query
+
+
+def _public(doc: dict) -> dict:
+    for field in CHUNKED_FIELDS:
+        doc.pop(field, None)
+    return doc
+
+
+class DiarizationRepository:
+    """
+    Reads and writes of diarization results. Request handlers use the async methods on the
+    pooled async client; pipeline threads and job workers use the sync ones. Segments are
+    stored apart from the result, in time buckets (see encode_segments), so documents stay
+    small and time-range reads touch only the buckets they need.
+    """
+
+    def __init__(self, collection=diarization_collection, segments=segments_collection, get_db=get_async_db):
+        self.collection = collection
+        self.segments = segments
+        self.get_db = get_db
+
+    @property
+    def async_collection(self):
+        return self.get_db()[self.collection.name]
+
+    @property
+    def async_segments(self):
+        return self.get_db()[self.segments.name]
+
+    def find(self, key: dict) -> dict | None:
+        doc = next(self.collection.aggregate(result_pipeline(key)), None)
+        if doc is not None and doc.get("transcription") is None:
+            chunks = self.segments.find({"result_id": doc["_id"]}).sort("bucket", ASCENDING)
+            doc["transcription"] = [seg for chunk in chunks for seg in iter_chunk_segments(chunk, doc["speaker_names"])]
+        return _public(doc) if doc is not None else None
+
+    async def find_async(self, key: dict) -> dict | None:
+        cursor = await self.async_collection.aggregate(result_pipeline(key))
+        docs = await cursor.to_list(length=1)
+        if not docs:
+            return None
+        doc = docs[0]
+        if doc.get("transcription") is None:
+            chunks = self.async_segments.find({"result_id": doc["_id"]}).sort("bucket", ASCENDING)
+            doc["transcription"] = [seg async for chunk in chunks
+                                    for seg in iter_chunk_segments(chunk, doc["speaker_names"])]
+        return _public(doc)
+
+    async def query_async(self, result_id: str, start: float | None = None, end: float | None = None,
+                          speaker: str | None = None, offset: int = 0, limit: int = 100) -> dict | None:
+        """
+        Page of the segments overlapping [start, end), optionally of one (renamed) speaker,
+        in time order. Only the buckets in range are read, through the (result_id, bucket)
+        index. `next_offset` is None on the last page.
+        """
+        cursor = await self.async_collection.aggregate(result_pipeline({"_id": result_id}))
+        docs = await cursor.to_list(length=1)
+        if not docs:
+            return None
+        doc = docs[0]
+        keep = segment_filter(start, end, speaker)
+        page, skipped = [], 0
+
+        def take(segment) -> bool:
+            """Adds a matching segment; True once the page and one look-ahead are full."""
+            nonlocal skipped
+            if not keep(segment):
+                return False
+            if skipped < offset:
+                skipped += 1
+                return False
+            page.append(segment)
+            return len(page) > limit
+
+        if doc.get("transcription") is not None:
+            # stored before chunking: the embedded array is filtered here
+            any(take(segment) for segment in doc["transcription"])
+        elif speaker is None or speaker in doc["speaker_names"]:
+            chunks = self.async_segments.find(chunk_query(doc, start, end)).sort("bucket", ASCENDING)
+            async for chunk in chunks:
+                if any(take(segment) for segment in iter_chunk_segments(chunk, doc["speaker_names"])):
+                    break
+            await chunks.close()
+        doc = _public(doc)
+        doc.pop("transcription", None)
+        return {
+            **doc,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if len(page) > limit else None,
+            "transcription": page[:limit],
+        }
+
+    def save(self, key: dict, fields: dict) -> dict:
+        """
+        Upsert: the first writer for `key` inserts `fields`, and gets the document back from
+        the same round trip. Anyone else reads the stored document, mapping applied.
+        Segments are written first, as time-bucket chunks under the new id, so a reader
+        never sees a result without them; a writer that loses the race removes its chunks.
+        """
+        new_id = str(uuid.uuid4())
+        fields = dict(fields)
+        segments = fields.pop("transcription")
+        speaker_names, chunks, longest = encode_segments(segments)
+        if chunks:
+            self.segments.insert_many([
+                {"_id": f"{new_id}:{chunk['bucket']:06d}", "result_id": new_id, **chunk} for chunk in chunks
+            ])
+        try:
+            doc = self.collection.find_one_and_update(
+                key,
+                {"$setOnInsert": {
+                    "_id": new_id,
+                    **fields,
+                    "speaker_names": speaker_names,
+                    "segment_count": len(segments),
+                    "bucket_seconds": SEGMENT_BUCKET_SECONDS,
+                    "max_segment_seconds": longest,
+                }},
+                projection=RESULT_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            doc = None
+        if doc is not None and doc["_id"] == new_id:
+            return {**doc, "transcription": segments}  # just inserted, so there is no speakerMapping yet
+        self.segments.delete_many({"result_id": new_id})
+        return self.find(key)
+
+
+diarization_repository = DiarizationRepository()
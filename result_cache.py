@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# ---------------- SETTINGS ----------------
+RESULT_CACHE_MEMORY_ITEMS = int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "512"))
+RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", "64"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_PERSIST = os.getenv("RESULT_CACHE_PERSIST", "mongo")     # mongo | none
+
+
+def cache_key(md5: str, options: dict) -> str:
+    """Content hash plus every option that can change the output; any change is a new key."""
+    canonical = json.dumps({"md5": md5, **options}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _size_of(value) -> int:
+    return len(json.dumps(value, default=str))
+
+
+# ---------------- PERSISTENT TIER ----------------
+class MongoResultStore:
+    """Results in a MongoDB collection; a TTL index on `created_at` expires old entries."""
+
+    def __init__(self, collection_name: str = "transcription_cache", ttl_seconds: int = RESULT_CACHE_TTL_SECONDS):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def collection(self):
+        from database import get_async_db
+        return get_async_db()[self.collection_name]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds,
+                                           name="created_at_ttl")
+
+    async def get(self, key: str):
+        doc = await self.collection.find_one({"_id": key}, {"value": 1})
+        return doc["value"] if doc else None
+
+    async def put(self, key: str, value, meta: dict | None = None):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "meta": meta or {}, "created_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+
+# ---------------- TIERED CACHE ----------------
+class ResultCache:
+    """
+    In-process LRU bounded by entry count and approximate size, in front of an optional
+    persistent store. Persistent hits are promoted to memory; a failing store is logged
+    and treated as a miss, so the cache never fails a request.
+    """
+
+    def __init__(self, store=None, max_items: int = RESULT_CACHE_MEMORY_ITEMS,
+                 max_mb: float = RESULT_CACHE_MEMORY_MB):
+        self.store = store
+        self.max_items = max_items
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._memory: OrderedDict[str, tuple] = OrderedDict()    # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    def _remember(self, key: str, value):
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (value, size)
+            self._bytes += size
+            while len(self._memory) > self.max_items or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+        if self.store is not None:
+            try:
+                value = await self.store.get(key)
+            except Exception as e:
+                self.store_errors += 1
+                logging.warning(f"Result cache store read failed: {e}")
+                value = None
+            if value is not None:
+                self.persistent_hits += 1
+                self._remember(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value, meta: dict | None = None):
+        self._remember(key, value)
+        if self.store is not None:
+            try:
+                await self.store.put(key, value, meta)
+            except Exception as e:
+                self.store_errors += 1
+                logging.warning(f"Result cache store write failed: {e}")
+
+    async def ensure_indexes(self):
+        if self.store is not None:
+            await self.store.ensure_indexes()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "memory_mb": round(self._bytes / 1024 / 1024, 3),
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.persistent_hits) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "store_errors": self.store_errors,
+        }
+
+
+transcription_cache = ResultCache(MongoResultStore() if RESULT_CACHE_PERSIST == "mongo" else None)
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated audio ring buffer for the live loops.
+
+    Samples are stored twice (at i and i + capacity), so any span of up to `capacity`
+    recent samples is one contiguous slice: windows are returned as views, never copied.
+    Positions are absolute sample indices since the stream started.
+
+    A view stays valid until `capacity` more samples have been written; copy it if it has
+    to outlive that.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=dtype)
+        self.written = 0      # total samples written
+        self.read_pos = 0     # start of the next window handed out by windows()
+        self.dropped = 0      # samples overwritten before windows() reached them
+
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples, dtype=self._buf.dtype).reshape(-1)
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        cap = self.capacity
+        pos = self.written % cap
+        first = min(n, cap - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        self._buf[pos + cap:pos + cap + first] = samples[:first]
+        rest = n - first
+        if rest:
+            self._buf[:rest] = samples[first:]
+            self._buf[cap:cap + rest] = samples[first:]
+        self.written += n
+
+        oldest = self.written - cap
+        if self.read_pos < oldest:
+            self.dropped += oldest - self.read_pos
+            self.read_pos = oldest
+
+    def view(self, start: int, length: int) -> np.ndarray:
+        """Zero-copy view of samples [start, start + length) in absolute positions."""
+        if length > self.capacity:
+            raise ValueError(f"length {length} exceeds capacity {self.capacity}")
+        if start < self.written - self.capacity or start + length > self.written:
+            raise IndexError(f"samples [{start}, {start + length}) are not in the buffer")
+        offset = start % self.capacity
+        return self._buf[offset:offset + length]
+
+    def latest(self, length: int) -> np.ndarray:
+        length = min(length, self.written, self.capacity)
+        return self.view(self.written - length, length)
+
+    def available(self) -> int:
+        """Samples written but not yet passed by windows()."""
+        return self.written - self.read_pos
+
+    def windows(self, window: int, stride: int | None = None):
+        """
+        Yield (start, view) for every complete window from the read position, advancing
+        by `stride` samples (default: `window`). stride < window gives overlapping
+        windows; nothing between windows is skipped as long as stride <= window.
+        """
+        stride = stride or window
+        while self.written - self.read_pos >= window:
+            start = self.read_pos
+            self.read_pos += stride
+            yield start, self.view(start, window)
+
+    def clear(self):
+        self.read_pos = self.written
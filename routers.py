@@ -1,13 +1,39 @@
-from fastapi import UploadFile, File, HTTPException, FastAPI
+from fastapi import UploadFile, File, HTTPException, FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+import json
+from contextlib import asynccontextmanager
 from typing import Dict
 import os
-from transcribe import transcribe_audio
-from main import get_speaker_diarization_json
+from transcribe import transcribe_audio, stream_transcription, batch_scheduler, decode_options
+from result_cache import transcription_cache, cache_key
+from main import get_speaker_diarization_json, find_cached_diarization
+from repository import diarization_repository, SEGMENT_PAGE_LIMIT
+from channels import get_channel_diarization_json, find_cached_channels
+from audio_io import channel_count
 import logging
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from utils import save_upload_file
+from model_registry import registry
+from inference_pool import inference_pool, PoolFull, QUEUE_FULL_STATUS
+from database import jobs_collection, ensure_diarization_indexes_async
+from jobs import JobQueue
+from live import live_scheduler, LIVE_MODE, LIVE_MODES
+import time
+from fastapi import Request
+from main import diarization_flight
+from checkpoints import checkpoint_store
+from warmup import warmup
+from metrics import metrics, configure_logging, trace_id_var, new_trace_id, HTTP_IN_FLIGHT, HTTP_SECONDS
+from tiers import DEFAULT_TIER, TIER_ORDER, get_tier, tier_names, transcribe_selector, diarize_selector
+from audio_io import duration as audio_duration
+
+configure_logging()
+
+# Stereo uploads: "auto" treats every two-channel file as one speaker per channel
+CHANNEL_SPLIT = os.getenv("CHANNEL_SPLIT", "auto")      # auto | always | never
 
 class Segment(BaseModel):
     start: float
@@ -18,12 +44,58 @@ class Segment(BaseModel):
 class DiarizationResponse(BaseModel):
     transcription: List[Segment]
     _id: str
+    tier: Optional[str] = None
+    file: str
+    duration: float
+    speakers: int
+
+class SegmentPage(BaseModel):
+    id: str
+    tier: Optional[str] = None
     file: str
     duration: float
     speakers: int
+    offset: int
+    limit: int
+    next_offset: Optional[int] = None
+    transcription: List[Segment]
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    tier: Optional[str] = None
+    progress: float
+    stage: Optional[str] = None
+    timings: Dict[str, float] = {}
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result_id: Optional[str] = None
+    error: Optional[str] = None
+
+def job_response(job: dict) -> JobResponse:
+    return JobResponse(id=job["_id"], **{k: v for k, v in job.items() if k in JobResponse.model_fields})
+
+job_queue = JobQueue(jobs_collection)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # models load in the background; /readyz stays 503 until they are warm
+    warmup.start()
+    registry.start_sweeper()
+    # indexes through the async client, so a slow MongoDB never blocks the event loop
+    await ensure_diarization_indexes_async()
+    await transcription_cache.ensure_indexes()
+    await job_queue.ensure_indexes_async()
+    await checkpoint_store.ensure_indexes_async()
+    yield
+    registry.stop_sweeper()
 
-app = FastAPI()
-UPLOAD_DIR = "uploaded_pdfs"
+app = FastAPI(lifespan=lifespan)
+
+# Job workers read uploads from here: put it on shared storage when they run on other hosts
+UPLOAD_DIR = os.path.abspath(os.getenv("UPLOAD_DIR", "uploaded_pdfs"))
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 origins = [
     "*",  # allow all origins, or list specific domains like "http://localhost:3000"
@@ -37,41 +109,335 @@ app.add_middleware(
     allow_headers=["*"],   # allow all headers
 )
 
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    # X-Request-ID from a proxy is kept, so its logs and ours share one trace id
+    trace_id = request.headers.get("x-request-id") or new_trace_id()
+    token = trace_id_var.set(trace_id)
+    HTTP_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = trace_id
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=status)
+        trace_id_var.reset(token)
+
+def collect_runtime():
+    """Queue depths and cache counters, read from the components' own stats at scrape time."""
+    pool = inference_pool.stats()
+    yield "inference_jobs", "gauge", "Inference pool jobs by state", [
+        ({"state": "running"}, pool["running"]), ({"state": "queued"}, pool["queued"])]
+    yield "inference_rejected_total", "counter", "Jobs rejected with a full queue", [({}, pool["rejected"])]
+    yield "batch_queue_depth", "gauge", "Windows waiting for a batch", [({}, batch_scheduler.stats()["waiting"])]
+    live = live_scheduler.stats()
+    yield "live_queue_depth", "gauge", "Live sessions waiting for a worker", [({}, live["waiting"])]
+    yield "live_sessions", "gauge", "Open live sessions", [({}, len(live["sessions"]))]
+    yield "diarizations_in_flight", "gauge", "Distinct diarization runs in progress", [
+        ({}, diarization_flight.in_flight())]
+    models = registry.stats()
+    yield "models_loaded", "gauge", "Models held by the registry", [({}, len(models["models"]))]
+    yield "models_memory_mb", "gauge", "Estimated memory of loaded models", [({}, models["memory_mb"])]
+    yield "model_lookups_total", "counter", "Model registry lookups", [
+        ({"result": "hit"}, models["hits"]), ({"result": "load"}, models["loads"])]
+    yield "model_evictions_total", "counter", "Models evicted from the registry", [({}, models["evictions"])]
+    cache = transcription_cache.stats()
+    yield "transcription_cache_lookups_total", "counter", "Transcription cache lookups", [
+        ({"result": "memory_hit"}, cache["memory_hits"]), ({"result": "persistent_hit"}, cache["persistent_hits"]),
+        ({"result": "miss"}, cache["misses"])]
+    yield "transcription_cache_hit_ratio", "gauge", "Share of transcription lookups served from cache", [
+        ({}, cache["hit_ratio"])]
+    yield "transcription_cache_evictions_total", "counter", "Memory tier evictions", [({}, cache["evictions"])]
+    yield "tier_auto_choices_total", "counter", "Tiers picked by ?tier=auto", [
+        ({"pipeline": selector.pipeline, "tier": name}, count)
+        for selector in (transcribe_selector, diarize_selector) for name, count in selector.chosen.items()]
+
+metrics.add_collector(collect_runtime)
+
+def queue_full(e: PoolFull) -> HTTPException:
+    return HTTPException(
+        status_code=QUEUE_FULL_STATUS,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 @app.get('/')
 async def root():
     return {"message": "Hello, World!"}
 
+@app.get('/healthz')
+async def healthz():
+    """Liveness: the process is up and its event loop answers."""
+    return {"status": "ok"}
+
+@app.get('/readyz')
+async def readyz():
+    """Readiness: every model in WARMUP_MODELS is loaded and has run once."""
+    status = warmup.status()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status)
+    return status
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get('/models')
+async def model_stats():
+    return registry.stats()
+
+@app.get('/inference')
+async def inference_stats():
+    return {**inference_pool.stats(), "batching": batch_scheduler.stats(),
+            "result_cache": transcription_cache.stats(),
+            "tiers": {"transcribe": transcribe_selector.stats(), "diarize": diarize_selector.stats()}}
+
+def check_tier(tier: str):
+    if tier != "auto" and tier not in TIER_ORDER:
+        raise HTTPException(status_code=400, detail=f"tier must be one of {TIER_ORDER + ['auto']}.")
+
+def queue_depth() -> int:
+    return inference_pool.running + inference_pool.queued
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+async def encode_segment_stream(segments, fmt: str):
+    try:
+        async for segment in segments:
+            if fmt == "sse":
+                yield f"event: segment\ndata: {json.dumps(segment)}\n\n"
+            else:
+                yield json.dumps(segment) + "\n"
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        logging.error(f"Error during streaming transcription: {e}")
+        error = json.dumps({"error": str(e)})
+        yield f"event: error\ndata: {error}\n\n" if fmt == "sse" else error + "\n"
+        return
+    if fmt == "sse":
+        yield "event: done\ndata: {}\n\n"
+
 @app.post('/upload-audio')
-async def upload_audio(file: UploadFile = File(...)) -> Dict[str, str]:
+async def upload_audio(file: UploadFile = File(...), stream: Optional[str] = None, parallel: bool = False,
+                       tier: str = DEFAULT_TIER):
+    """
+    One-shot {"transcription": text, "tier": name} by default; with ?stream=ndjson or ?stream=sse each
+    segment (start, end, text, avg_logprob) is sent as soon as it is decoded.
+    ?parallel=true transcribes silence-separated chunks of long files across CPU cores.
+    ?tier=fast|balanced|accurate picks model size and beam; ?tier=auto picks one from the
+    audio duration, the inference queue and LATENCY_TARGET_SECONDS.
+    """
     if not file.filename or not file.filename.endswith(".wav"):
         raise HTTPException(status_code=400, detail="Only WAV files are allowed.")
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    logging.info(f"Saving file to {file_path}")
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'.")
+    check_tier(tier)
     try:
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-        transcribed_text: str = await transcribe_audio(file_path)
+        # One-shot results are cached per content and decode options (tier included); a hit
+        # skips the upload copy. "auto" accepts a stored result of any tier, best first.
+        cached = None
+        async def is_known(md5):
+            nonlocal cached
+            if stream is not None:
+                return False
+            for name in tier_names(tier):
+                cached = await transcription_cache.get(cache_key(md5, decode_options(parallel, get_tier(name))))
+                if cached is not None:
+                    return True
+            return False
+        md5, file_path = await save_upload_file(file, UPLOAD_DIR, is_known=is_known)
+        if file_path is None:
+            logging.info(f"Cache hit for {file.filename} ({md5})")
+            return cached
+        logging.info(f"Saved {file.filename} to {file_path}")
+        settings = transcribe_selector.resolve(tier, audio_duration(file_path), queue_depth(),
+                                               inference_pool.max_workers)
+        if stream is not None:
+            segments = stream_transcription(file_path, settings)
+            return StreamingResponse(
+                encode_segment_stream(segments, stream),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        transcribed_text: str = await transcribe_audio(file_path, parallel, settings)
         logging.info(f"transcribed_text: {transcribed_text}")
+        options = decode_options(parallel, settings)
+        result = {"transcription": transcribed_text, "tier": settings["name"]}
+        await transcription_cache.put(cache_key(md5, options), result, meta={"md5": md5, **options})
+    except PoolFull as e:
+        raise queue_full(e)
     except Exception as e:
         logging.error(f"Error during file upload or transcription: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    return {"transcription": transcribed_text}
+    return result
 
 @app.post('/speaker-diarization', response_model=DiarizationResponse)
-async def diarize_audio(file: UploadFile = File(...)) -> DiarizationResponse:
+async def diarize_audio(file: UploadFile = File(...), tier: str = DEFAULT_TIER,
+                        split_channels: str = CHANNEL_SPLIT) -> DiarizationResponse:
+    """
+    ?split_channels=always|auto transcribes each channel of a stereo call recording on its
+    own and labels segments by channel (SPEAKER_00 left, SPEAKER_01 right), skipping
+    pyannote. With auto, channels that carry the same signal fall back to normal
+    diarization; always splits them regardless. Mono files always take the normal path.
+    """
     if not file.filename or not file.filename.endswith(".wav") and not file.filename.endswith(".mp3"):
         raise HTTPException(status_code=400, detail="Only WAV and MP3 files are allowed.")
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    logging.info(f"Saving file to {file_path}")
+    check_tier(tier)
+    if split_channels not in ("auto", "always", "never"):
+        raise HTTPException(status_code=400, detail="split_channels must be 'auto', 'always' or 'never'.")
     try:
-        # saved_path = f"uploaded_pdfs/{file.filename}"
-        md5 =  await save_upload_file(file, file_path)
-        # with open(saved_path, "wb") as f:
-        #     f.write(await file.read())
-        diarization_text: str = await get_speaker_diarization_json(file_path, md5)
+        # Known content short-circuits before any decode or model work
+        cached_doc = None
+        async def is_known(md5):
+            nonlocal cached_doc
+            if split_channels != "never":
+                cached_doc = await find_cached_channels(md5, tier)
+            if cached_doc is None and split_channels != "always":
+                cached_doc = await find_cached_diarization(md5, tier=tier)
+            return cached_doc is not None
+        md5, file_path = await save_upload_file(file, UPLOAD_DIR, is_known=is_known)
+        if file_path is None:
+            logging.info(f"Cache hit for {file.filename} ({md5})")
+            return cached_doc
+        logging.info(f"Saved {file.filename} to {file_path}")
+        if split_channels != "never" and channel_count(file_path) == 2:
+            diarization_text: str = await get_channel_diarization_json(
+                file_path, md5, tier, force=split_channels == "always")
+        else:
+            diarization_text: str = await get_speaker_diarization_json(file_path, md5, tier=tier)
         logging.info(f"diarization_text: {diarization_text}")
+    except PoolFull as e:
+        raise queue_full(e)
     except Exception as e:
         logging.error(f"Error during file upload or transcription: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     return diarization_text
 
+
+@app.get('/diarizations/{result_id}', response_model=SegmentPage)
+async def get_diarization_segments(result_id: str, start: Optional[float] = None, end: Optional[float] = None,
+                                   speaker: Optional[str] = None, offset: int = 0, limit: int = 100) -> SegmentPage:
+    """
+    Segments of a stored result overlapping [start, end) seconds, optionally of one speaker
+    (as renamed by speakerMapping), in time order. Page on with ?offset=next_offset.
+    """
+    if offset < 0 or not 0 < limit <= SEGMENT_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"offset must be >= 0 and limit in 1..{SEGMENT_PAGE_LIMIT}.")
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start.")
+    page = await diarization_repository.query_async(result_id, start, end, speaker, offset, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Diarization not found.")
+    return SegmentPage(id=page.pop("_id"), **page)
+
+
+@app.post('/diarization-jobs', response_model=JobResponse, status_code=202)
+async def submit_diarization_job(file: UploadFile = File(...), min_speakers: int = 2, max_speakers: int = 6,
+                                 tier: str = DEFAULT_TIER) -> JobResponse:
+    """?tier=auto is resolved when a worker starts the job, against the time left after queueing."""
+    if not file.filename or not file.filename.endswith(".wav") and not file.filename.endswith(".mp3"):
+        raise HTTPException(status_code=400, detail="Only WAV and MP3 files are allowed.")
+    check_tier(tier)
+    existing_doc = None
+    async def is_known(md5):
+        nonlocal existing_doc
+        existing_doc = await find_cached_diarization(md5, min_speakers, max_speakers, tier)
+        return existing_doc is not None
+    md5, file_path = await save_upload_file(file, UPLOAD_DIR, is_known=is_known)
+    job = await job_queue.submit_async(
+        file_path, md5,
+        params={"min_speakers": min_speakers, "max_speakers": max_speakers, "tier": tier},
+        result_id=existing_doc["_id"] if existing_doc else None,
+    )
+    return job_response(job)
+
+@app.get('/diarization-jobs/{job_id}', response_model=JobResponse)
+async def get_diarization_job(job_id: str) -> JobResponse:
+    job = await job_queue.get_async(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_response(job)
+
+class PartialSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+class PartialResponse(BaseModel):
+    job: JobResponse
+    windows_done: int = 0
+    windows_total: int = 0
+    transcription: List[PartialSegment] = []
+
+@app.get('/diarization-jobs/{job_id}/partial', response_model=PartialResponse)
+async def get_partial_diarization(job_id: str) -> PartialResponse:
+    """Transcript of the windows finished so far (no speakers until diarization has run)."""
+    job = await job_queue.get_async(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    # set by the worker once it has resolved the tier, so "auto" jobs find their own run
+    run = await checkpoint_store.get_run_async(job["run_id"]) if job.get("run_id") else None
+    if run is None:
+        return PartialResponse(job=job_response(job))
+    return PartialResponse(
+        job=job_response(job),
+        windows_done=run["windows_done"],
+        windows_total=run["windows_total"],
+        transcription=await checkpoint_store.partial_async(run["_id"]),
+    )
+
+@app.delete('/diarization-jobs/{job_id}', response_model=JobResponse)
+async def cancel_diarization_job(job_id: str) -> JobResponse:
+    job = await job_queue.cancel_async(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_response(job)
+
+@app.websocket('/ws/transcribe')
+async def ws_transcribe(websocket: WebSocket, format: str = "s16le", mode: str = LIVE_MODE):
+    """
+    Binary messages carry raw mono 16 kHz PCM (s16le by default, or ?format=f32le).
+    Text message {"type": "flush"} closes the current utterance; {"type": "end"} also
+    waits for pending results, sends the session stats and closes the socket.
+    Results are JSON {"type": "partial" | "final", "utterance", "source", "start", "end", "text", ...};
+    a final replaces the partials of the same utterance. ?mode=two-pass takes partials
+    from a streaming recognizer (Vosk) as audio arrives, and finals from Whisper.
+    """
+    if format not in ("s16le", "f32le"):
+        await websocket.close(code=1003, reason="format must be s16le or f32le")
+        return
+    if mode not in LIVE_MODES:
+        await websocket.close(code=1003, reason=f"mode must be one of {', '.join(LIVE_MODES)}")
+        return
+    await websocket.accept()
+    session = live_scheduler.open_session(websocket.send_json, format, mode)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                session.feed_bytes(message["bytes"])
+            elif message.get("text"):
+                command = json.loads(message["text"]).get("type")
+                if command in ("flush", "end"):
+                    session.flush()
+                if command == "end":
+                    await session.drain()
+                    await websocket.send_json({"type": "stats", **session.stats()})
+                    await websocket.close()
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_scheduler.close_session(session)
+
+@app.get('/live/sessions')
+async def live_sessions():
+    return live_scheduler.stats()
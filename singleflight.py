@@ -0,0 +1,31 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the work,
+    later callers await the same task instead of recomputing. The work runs as its own
+    task, so a disconnecting first caller does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks: dict = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.started += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight(), "started": self.started, "shared": self.shared}
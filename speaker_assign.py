@@ -0,0 +1,218 @@
+import numpy as np
+
+UNKNOWN_SPEAKER = "UNKNOWN"
+
+
+def turn_rows(diarization) -> list[tuple[float, float, str]]:
+    """Diarization turns as plain (start, end, speaker) tuples, e.g. to persist them."""
+    if hasattr(diarization, "itertracks"):
+        return [(float(turn.start), float(turn.end), str(label))
+                for turn, _, label in diarization.itertracks(yield_label=True)]
+    if hasattr(diarization, "columns"):
+        return [(float(start), float(end), str(speaker)) for start, end, speaker in
+                zip(diarization["start"], diarization["end"], diarization["speaker"])]
+    return [(float(start), float(end), str(speaker)) for start, end, speaker in diarization]
+
+
+class SpeakerIndex:
+    """
+    Interval index over diarization turns.
+
+    Each speaker's turns are merged into sorted, disjoint intervals with a prefix sum of
+    their lengths, so the time a speaker covers before any t takes one binary search, and
+    the overlap of [qs, qe) with that speaker is covered(qe) - covered(qs). That is
+    O((n + m) log m) for n queries over m turns, however long or nested the turns are.
+    """
+
+    def __init__(self, starts, ends, speakers):
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        self.labels, codes = np.unique(np.asarray(speakers, dtype=object).astype(str), return_inverse=True) \
+            if len(speakers) else (np.array([], dtype=str), np.array([], dtype=np.int64))
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.codes = codes.reshape(-1)[order]
+        self.coverage = [self._merge(self.starts[self.codes == code], self.ends[self.codes == code])
+                         for code in range(len(self.labels))]
+
+    @staticmethod
+    def _merge(starts, ends) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(starts, ends, covered before each) of the union of intervals sorted by start."""
+        if not len(starts):
+            return starts, ends, starts
+        reach = np.maximum.accumulate(ends)
+        # an interval opens a new run when it starts after everything before it has ended
+        opens = np.concatenate([[True], starts[1:] > reach[:-1]])
+        merged_starts = starts[opens]
+        merged_ends = np.maximum.reduceat(reach, np.flatnonzero(opens))
+        lengths = np.maximum(merged_ends - merged_starts, 0.0)
+        before = np.concatenate([[0.0], np.cumsum(lengths)[:-1]])
+        return merged_starts, merged_ends, before
+
+    @classmethod
+    def from_diarization(cls, diarization) -> "SpeakerIndex":
+        """Accepts a whisperx/pyannote DataFrame (start, end, speaker), a pyannote Annotation
+        or an iterable of (start, end, speaker) tuples."""
+        if hasattr(diarization, "columns"):
+            return cls(diarization["start"].to_numpy(), diarization["end"].to_numpy(),
+                       diarization["speaker"].to_numpy())
+        rows = turn_rows(diarization)
+        if not rows:
+            return cls([], [], [])
+        starts, ends, speakers = zip(*rows)
+        return cls(starts, ends, speakers)
+
+    @property
+    def n_speakers(self) -> int:
+        return len(self.labels)
+
+    def overlap_matrix(self, q_starts, q_ends) -> np.ndarray:
+        """(n_queries, n_speakers) seconds of overlap between each query and each speaker."""
+        q_starts = np.asarray(q_starts, dtype=np.float64)
+        q_ends = np.asarray(q_ends, dtype=np.float64)
+        n = len(q_starts)
+        out = np.zeros((n, self.n_speakers))
+        if n == 0 or self.n_speakers == 0:
+            return out
+        for code, (starts, ends, before) in enumerate(self.coverage):
+            if len(starts):
+                out[:, code] = np.maximum(_covered(starts, ends, before, q_ends)
+                                          - _covered(starts, ends, before, q_starts), 0.0)
+        return out
+
+    def nearest(self, q_starts, q_ends) -> np.ndarray:
+        """Speaker code of the turn closest to each query's midpoint (for queries with no overlap)."""
+        mid = (np.asarray(q_starts, dtype=np.float64) + np.asarray(q_ends, dtype=np.float64)) / 2
+        turn_mid = (self.starts + self.ends) / 2
+        order = np.argsort(turn_mid)
+        sorted_mid = turn_mid[order]
+        pos = np.clip(np.searchsorted(sorted_mid, mid), 1, len(sorted_mid) - 1) if len(sorted_mid) > 1 \
+            else np.zeros(len(mid), dtype=np.int64)
+        if len(sorted_mid) > 1:
+            left_closer = np.abs(mid - sorted_mid[pos - 1]) <= np.abs(sorted_mid[pos] - mid)
+            pos = np.where(left_closer, pos - 1, pos)
+        return self.codes[order[pos]]
+
+    def assign(self, q_starts, q_ends, fill_nearest: bool = False) -> np.ndarray:
+        """Speaker code with maximum overlap per query; -1 without overlap unless fill_nearest."""
+        matrix = self.overlap_matrix(q_starts, q_ends)
+        if matrix.shape[1] == 0:
+            return np.full(len(matrix), -1)
+        codes = matrix.argmax(axis=1)
+        none = matrix.max(axis=1) <= 0
+        if fill_nearest and none.any():
+            codes[none] = self.nearest(np.asarray(q_starts)[none], np.asarray(q_ends)[none])
+        else:
+            codes[none] = -1
+        return codes
+
+    def label(self, code: int) -> str:
+        return str(self.labels[code]) if code >= 0 else UNKNOWN_SPEAKER
+
+
+def _covered(starts, ends, before, t) -> np.ndarray:
+    """Time covered by the disjoint intervals up to each t."""
+    j = np.searchsorted(starts, t, side="right") - 1
+    inside = np.clip(t - starts[np.maximum(j, 0)], 0.0, (ends - starts)[np.maximum(j, 0)])
+    return np.where(j >= 0, before[np.maximum(j, 0)] + inside, 0.0)
+
+
+def assign_speakers(diarization, transcript: dict, split_on_change: bool = True,
+                    fill_nearest: bool = True, overlap_ratio: float = 0.5) -> dict:
+    """
+    Drop-in for whisperx.assign_word_speakers: every word and segment gets the speaker with
+    the largest overlap. With `split_on_change`, a segment whose words change speaker is split
+    at each change. Other speakers covering at least `overlap_ratio` of a segment are listed
+    in its "overlapping_speakers".
+    """
+    index = SpeakerIndex.from_diarization(diarization)
+    segments = transcript["segments"]
+
+    # all timed words of all segments in one query batch
+    word_refs, w_starts, w_ends = [], [], []
+    for si, segment in enumerate(segments):
+        for wi, word in enumerate(segment.get("words", [])):
+            if "start" in word and "end" in word:
+                word_refs.append((si, wi))
+                w_starts.append(word["start"])
+                w_ends.append(word["end"])
+    word_codes = index.assign(w_starts, w_ends, fill_nearest=fill_nearest)
+    for (si, wi), code in zip(word_refs, word_codes):
+        segments[si]["words"][wi]["speaker"] = index.label(code)
+
+    out_segments = []
+    for segment in segments:
+        pieces = _split_by_speaker(segment) if split_on_change else [segment]
+        out_segments.extend(pieces)
+
+    s_starts = [s["start"] for s in out_segments]
+    s_ends = [s["end"] for s in out_segments]
+    matrix = index.overlap_matrix(s_starts, s_ends)
+    seg_codes = index.assign(s_starts, s_ends, fill_nearest=fill_nearest)
+    for i, segment in enumerate(out_segments):
+        words = [w for w in segment.get("words", []) if "speaker" in w]
+        if words:
+            # majority of word time decides, so a split piece keeps its words' speaker
+            totals = {}
+            for w in words:
+                totals[w["speaker"]] = totals.get(w["speaker"], 0.0) + max(w["end"] - w["start"], 1e-3)
+            segment["speaker"] = max(totals, key=totals.get)
+        else:
+            segment["speaker"] = index.label(seg_codes[i])
+        duration = max(segment["end"] - segment["start"], 1e-9)
+        others = [
+            index.label(code) for code in np.flatnonzero(matrix[i] >= overlap_ratio * duration)
+            if index.label(code) != segment["speaker"]
+        ] if len(matrix) else []
+        if others:
+            segment["overlapping_speakers"] = others
+
+    return {**transcript, "segments": out_segments}
+
+
+def _split_by_speaker(segment: dict) -> list[dict]:
+    words = segment.get("words", [])
+    timed = [w for w in words if "speaker" in w]
+    if len({w["speaker"] for w in timed}) <= 1:
+        return [segment]
+    # untimed words (numbers, symbols) stay with the speaker before them; leading ones
+    # join the first speaker, so every piece starts with a timed word
+    pieces, current, speaker = [], [], timed[0]["speaker"]
+    for word in words:
+        word_speaker = word.get("speaker", speaker)
+        if current and word_speaker != speaker:
+            pieces.append(current)
+            current = []
+        current.append(word)
+        speaker = word_speaker
+    pieces.append(current)
+
+    out = []
+    for piece in pieces:
+        timed_piece = [w for w in piece if "start" in w]
+        out.append({
+            **{k: v for k, v in segment.items() if k not in ("words", "text", "start", "end")},
+            "start": timed_piece[0]["start"],
+            "end": timed_piece[-1]["end"],
+            "text": " ".join(w["word"] for w in piece),
+            "words": piece,
+        })
+    return out
+
+
+def relabel_in_order(segments: list[dict], prefix: str = "SPEAKER_") -> dict:
+    """Rename speakers to SPEAKER_00, SPEAKER_01, ... by first appearance; returns the mapping."""
+    mapping = {}
+    for segment in segments:
+        mapping.setdefault(segment["speaker"], f"{prefix}{len(mapping):02d}")
+    for segment in segments:
+        segment["speaker"] = mapping[segment["speaker"]]
+        for word in segment.get("words", []):
+            if "speaker" in word:
+                word["speaker"] = mapping.setdefault(word["speaker"], f"{prefix}{len(mapping):02d}")
+        if "overlapping_speakers" in segment:
+            segment["overlapping_speakers"] = [
+                mapping.setdefault(s, f"{prefix}{len(mapping):02d}") for s in segment["overlapping_speakers"]
+            ]
+    return mapping
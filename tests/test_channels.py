@@ -0,0 +1,51 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import channels
+import main
+from pipeline_benchmark import StubWhisper, MemoryRepository
+
+samplerate = 16000
+
+
+def speech(seconds: int = 20, seed: int = 0) -> np.ndarray:
+    """3 s noise bursts (speech to the VAD) separated by 1 s of silence."""
+    rng = np.random.default_rng(seed)
+    bursts = [np.concatenate([rng.standard_normal(3 * samplerate) * 0.3, np.zeros(samplerate)])
+              for _ in range(seconds // 4)]
+    return np.concatenate(bursts).astype(np.float32)
+
+
+@pytest.fixture(autouse=True)
+def stubs(monkeypatch):
+    monkeypatch.setattr(channels, "get_whisper_model", lambda *a, **k: StubWhisper(0.0))
+    monkeypatch.setattr(channels, "diarization_repository", MemoryRepository())
+
+
+def test_mono_file_is_never_split(tmp_path, monkeypatch):
+    path = str(tmp_path / "mono.wav")
+    soundfile.write(path, speech(), samplerate)
+
+    assert channels.diarize_channels(path, "mono", force=True) is None
+
+    monkeypatch.setattr(main, "diarize_file", lambda audio_file, md5, **kwargs: {"path": "mix"})
+    assert channels.diarize_channels_or_mix(path, "mono", force=True) == {"path": "mix"}
+
+
+def test_identical_channels_fall_back_unless_forced(tmp_path):
+    audio = speech()
+    path = str(tmp_path / "copied.wav")
+    soundfile.write(path, np.stack([audio, audio], axis=1), samplerate)
+
+    assert channels.diarize_channels(path, "copied") is None
+    doc = channels.diarize_channels(path, "copied", force=True)
+    assert {s["speaker"] for s in doc["transcription"]} == {"SPEAKER_00", "SPEAKER_01"}
+
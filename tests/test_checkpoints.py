@@ -0,0 +1,136 @@
+import functools
+import os
+import sys
+
+import mongomock
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import checkpoints
+import main
+from pipeline_benchmark import StubWhisperX, StubDiarizer, stub_align
+from repository import DiarizationRepository
+
+samplerate = 16000
+
+
+class WorkerDied(Exception):
+    pass
+
+
+def synthetic_speech(seconds: int = 180, seed: int = 1) -> np.ndarray:
+    """4 s noise bursts (speech to the VAD) separated by 1 s of silence."""
+    rng = np.random.default_rng(seed)
+    burst = [np.concatenate([rng.standard_normal(4 * samplerate) * 0.3, np.zeros(samplerate)])
+             for _ in range(seconds // 5)]
+    return np.concatenate(burst).astype(np.float32)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """main.diarize_file on stub models, with checkpoints and results in mongomock."""
+    db = mongomock.MongoClient().db
+    store = checkpoints.CheckpointStore(db.runs, db.windows)
+    store.ensure_indexes()
+    audio = synthetic_speech()
+    calls = {"align": 0}
+
+    def counting_align(*args, **kwargs):
+        calls["align"] += 1
+        return stub_align(*args, **kwargs)
+
+    monkeypatch.setattr(main, "get_whisperx_model", lambda *a, **k: StubWhisperX(0.0))
+    monkeypatch.setattr(main, "get_align_model", lambda *a, **k: (None, None))
+    monkeypatch.setattr(main, "get_diarize_pipeline", lambda *a, **k: StubDiarizer(0.0))
+    monkeypatch.setattr(main, "align", counting_align)
+    monkeypatch.setattr(main, "load_pcm", lambda audio_file, md5: audio)
+    monkeypatch.setattr(main, "checkpoint_store", store)
+    monkeypatch.setattr(main, "diarization_repository", DiarizationRepository(db.diarizations, db.segments, None))
+    # 20 s windows, so three minutes of audio has several to crash between
+    monkeypatch.setattr(main, "plan_windows", functools.partial(checkpoints.plan_windows, window_seconds=20))
+    return db, store, calls, monkeypatch
+
+
+def crash_on(monkeypatch, name: str, call: int):
+    original = getattr(main, name)
+    seen = {"n": 0}
+
+    def crashing(*args, **kwargs):
+        seen["n"] += 1
+        if seen["n"] == call:
+            raise WorkerDied(name)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(main, name, crashing)
+    return original
+
+
+def test_resume_after_crash_mid_file_matches_fresh_run(pipeline):
+    db, store, calls, monkeypatch = pipeline
+    fresh = main.diarize_file("call.wav", "fresh")
+    windows_total = calls["align"]
+    assert windows_total > 4
+
+    original = crash_on(monkeypatch, "align", 4)
+    with pytest.raises(WorkerDied):
+        main.diarize_file("call.wav", "crashed")
+    rid = checkpoints.run_id(main.result_key("crashed"))
+    run = db.runs.find_one({"_id": rid})
+    assert run["status"] == checkpoints.RUNNING
+    assert run["windows_done"] == 3
+    assert run["windows_total"] == windows_total
+    assert store.partial(rid)
+
+    monkeypatch.setattr(main, "align", original)
+    calls["align"] = 0
+    resumed = main.diarize_file("call.wav", "crashed")
+
+    # only the windows after the crash are transcribed again
+    assert calls["align"] == windows_total - 3
+    assert resumed["transcription"] == fresh["transcription"]
+    assert resumed["speakers"] == fresh["speakers"]
+    run = db.runs.find_one({"_id": rid})
+    assert run["status"] == checkpoints.DONE
+    assert run["resumes"] == 1
+    assert run["result_id"] == resumed["_id"]
+    assert db.windows.count_documents({"run_id": rid}) == 0
+
+
+def test_resume_after_crash_in_diarization_skips_transcription(pipeline):
+    db, store, calls, monkeypatch = pipeline
+    fresh = main.diarize_file("call.wav", "fresh")
+
+    original = crash_on(monkeypatch, "get_diarize_pipeline", 1)
+    with pytest.raises(WorkerDied):
+        main.diarize_file("call.wav", "crashed")
+
+    monkeypatch.setattr(main, "get_diarize_pipeline", original)
+    calls["align"] = 0
+    resumed = main.diarize_file("call.wav", "crashed")
+
+    assert calls["align"] == 0
+    assert resumed["transcription"] == fresh["transcription"]
+
+
+def test_changed_plan_starts_over(pipeline):
+    db, store, calls, monkeypatch = pipeline
+    key = main.result_key("md5")
+    rid, done, turns = store.start(key, [[0, 100], [100, 200]])
+    store.save_window(rid, 0, [{"start": 0.0, "end": 1.0, "text": "a"}], [])
+
+    assert store.start(key, [[0, 100], [100, 200]])[1] == {0: [{"start": 0.0, "end": 1.0, "text": "a"}]}
+    assert store.start(key, [[0, 200]]) == (rid, {}, None)
+    assert db.windows.count_documents({"run_id": rid}) == 0
+
+
+def test_plan_windows_cut_between_regions():
+    regions = [(0.0, 8.0), (9.0, 15.0), (16.0, 30.0), (31.0, 33.5)]
+    plan = checkpoints.plan_windows(regions, window_seconds=10, sample_rate=samplerate)
+
+    assert plan == [[0, 14 * samplerate], [14 * samplerate, 28 * samplerate],
+                    [28 * samplerate, 30 * samplerate + samplerate // 2]]
+    assert checkpoints.plan_windows(regions, window_seconds=10, sample_rate=samplerate) == plan
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from inference_pool import InferencePool
+
+
+def slow_segments(events: dict, seconds: float = 0.2):
+    """Blocking generator: every item takes `seconds`, like a decoded Whisper segment."""
+    try:
+        for i in range(5):
+            time.sleep(seconds)
+            yield i
+    finally:
+        events["closed_on"] = threading.current_thread().name
+
+
+def test_disconnect_mid_item_frees_the_slot():
+    pool = InferencePool("thread", max_workers=1, max_queue=0)
+    events = {}
+
+    async def scenario():
+        received = []
+
+        async def consume():
+            async for item in pool.stream(slow_segments, events):
+                received.append(item)
+
+        task = asyncio.ensure_future(consume())
+        while not received:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)        # the next item is being decoded on the worker thread
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return received
+
+    received = asyncio.run(scenario())
+    assert received == [0]
+    assert pool.stats()["running"] == 0
+    assert pool.stats()["queued"] == 0
+    assert events["closed_on"].startswith("inference")
+    pool.shutdown()
+
+
+def test_repeated_disconnects_do_not_exhaust_admission():
+    pool = InferencePool("thread", max_workers=1, max_queue=1)
+
+    async def scenario():
+        for _ in range(pool.max_workers + pool.max_queue + 2):
+            stream = pool.stream(slow_segments, {}, 0.05)
+            task = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await stream.aclose()
+        return [item async for item in pool.stream(slow_segments, {}, 0.0)]
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert pool.stats()["running"] == 0
+    assert pool.stats()["completed"] == 1
+    pool.shutdown()
@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+from datetime import timedelta
+
+import mongomock
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jobs
+from jobs import JobQueue, LeaseLost, JobCancelled, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(mongomock.MongoClient().db.jobs, lease_seconds=60, max_attempts=2)
+
+
+def expire(queue: JobQueue, job_id: str):
+    """What a crashed worker leaves behind: its lease runs out."""
+    queue.collection.update_one({"_id": job_id}, {"$set": {"lease_expires_at": jobs.utcnow() - timedelta(seconds=1)}})
+
+
+def test_claim_takes_oldest_job_once(queue):
+    first = queue.submit("/a.wav", "a")
+    queue.submit("/b.wav", "b")
+
+    job = queue.claim("w1")
+    assert job["_id"] == first["_id"]
+    assert job["status"] == RUNNING
+    assert job["lease_owner"] == "w1"
+    assert job["attempts"] == 1
+    assert queue.claim("w2")["md5"] == "b"
+    assert queue.claim("w3") is None
+
+
+def test_submit_with_result_is_done(queue):
+    job = queue.submit("/a.wav", "a", result_id="r1")
+    assert job["status"] == DONE
+    assert queue.claim("w1") is None
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    assert queue.claim("w2") is None
+
+    expire(queue, job["_id"])
+    reclaimed = queue.claim("w2")
+    assert reclaimed["lease_owner"] == "w2"
+    assert reclaimed["attempts"] == 2
+
+
+def test_requeue_expired(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    expire(queue, job["_id"])
+
+    assert queue.requeue_expired() == 1
+    job = queue.get(job["_id"])
+    assert job["status"] == QUEUED
+    assert job["lease_owner"] is None
+
+
+def test_heartbeat_after_losing_the_lease(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    queue.heartbeat(job["_id"], "w1", progress=0.5, stage="transcribe")
+    assert queue.get(job["_id"])["progress"] == 0.5
+
+    expire(queue, job["_id"])
+    queue.claim("w2")
+    with pytest.raises(LeaseLost):
+        queue.heartbeat(job["_id"], "w1")
+    assert not queue.complete(job["_id"], "w1", "r1")
+
+
+def test_crashing_on_every_attempt_fails_the_job(queue):
+    job = queue.submit("/a.wav", "a")
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker) is not None
+        expire(queue, job["_id"])
+    assert queue.claim("w3") is None
+
+    queue.requeue_expired()
+    job = queue.get(job["_id"])
+    assert job["status"] == FAILED
+    assert job["finished_at"] is not None
+
+
+def test_failure_retries_until_attempts_run_out(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    queue.fail(job["_id"], "w1", "boom")
+    assert queue.get(job["_id"])["status"] == QUEUED
+
+    queue.claim("w1")
+    queue.fail(job["_id"], "w1", "boom")
+    job = queue.get(job["_id"])
+    assert job["status"] == FAILED
+    assert job["error"] == "boom"
+
+
+def test_cancel_queued_job(queue):
+    job = queue.submit("/a.wav", "a")
+    assert queue.cancel(job["_id"])["status"] == CANCELLED
+    assert queue.claim("w1") is None
+
+
+def test_cancel_running_job_stops_at_heartbeat(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    assert queue.cancel(job["_id"])["status"] == RUNNING
+
+    with pytest.raises(JobCancelled):
+        queue.heartbeat(job["_id"], "w1")
+    queue.mark_cancelled(job["_id"], "w1")
+    assert queue.get(job["_id"])["status"] == CANCELLED
+
+
+def test_cancelled_job_whose_worker_died_ends_cancelled(queue):
+    job = queue.submit("/a.wav", "a")
+    queue.claim("w1")
+    queue.cancel(job["_id"])
+    expire(queue, job["_id"])
+
+    queue.requeue_expired()
+    job = queue.get(job["_id"])
+    assert job["status"] == CANCELLED
+    assert job["finished_at"] is not None
+    assert queue.claim("w2") is None
+
+
+def test_process_job_keeps_the_lease_during_a_long_stage(queue, monkeypatch):
+    import main
+    queue.lease_seconds = 0.3
+    job = queue.submit("/a.wav", "a")
+    job = queue.claim("w1")
+
+    def slow_diarize(audio_file, md5, progress=None, **params):
+        time.sleep(1.0)               # one stage, no progress calls, over three leases long
+        assert queue.claim("w2") is None
+        return {"_id": "r1"}
+
+    monkeypatch.setattr(main, "diarize_file", slow_diarize)
+    monkeypatch.setattr(jobs, "resolve_tier", lambda job: {})
+    jobs.process_job(queue, job, "w1")
+
+    job = queue.get(job["_id"])
+    assert job["status"] == DONE
+    assert job["result_id"] == "r1"
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from speaker_assign import SpeakerIndex
+
+
+def union_overlap(turns, speaker, start, end) -> float:
+    """Reference: time in [start, end) covered by any of the speaker's turns."""
+    merged = []
+    for s, e in sorted((s, e) for s, e, label in turns if label == speaker):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return sum(max(0.0, min(e, end) - max(s, start)) for s, e in merged)
+
+
+def test_overlap_matrix_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        m = int(rng.integers(1, 15))
+        starts = rng.uniform(0, 60, m)
+        turns = list(zip(starts, starts + rng.uniform(0, 20, m), rng.choice(["A", "B", "C"], m)))
+        index = SpeakerIndex.from_diarization(turns)
+        q_starts = rng.uniform(-5, 80, 40)
+        q_ends = q_starts + rng.uniform(0, 10, 40)
+        matrix = index.overlap_matrix(q_starts, q_ends)
+        for code, label in enumerate(index.labels):
+            expected = [union_overlap(turns, label, s, e) for s, e in zip(q_starts, q_ends)]
+            np.testing.assert_allclose(matrix[:, code], expected, atol=1e-9)
+
+
+def test_long_turn_does_not_widen_other_queries():
+    # one turn spanning the whole file next to many short ones
+    turns = [(0.0, 3600.0, "A")] + [(float(t), t + 2.0, "B") for t in range(0, 3600, 4)]
+    index = SpeakerIndex.from_diarization(turns)
+    words = np.arange(0.5, 3599.0, 1.0)
+    matrix = index.overlap_matrix(words, words + 0.4)
+
+    np.testing.assert_allclose(matrix[:, 0], 0.4)
+    assert set(np.round(matrix[:, 1], 6)) == {0.0, 0.4}
@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# ---------------- SETTINGS ----------------
+BANNED_WORDS_FILE = os.getenv("BANNED_WORDS_FILE")        # one entry per line, '#' starts a comment
+IGNORE_PHRASES_FILE = os.getenv("IGNORE_PHRASES_FILE")
+REFINE_LANGUAGE = os.getenv("REFINE_LANGUAGE", "en")
+REFINE_BATCH_SIZE = int(os.getenv("REFINE_BATCH_SIZE", "8"))
+REFINE_MAX_WAIT_MS = float(os.getenv("REFINE_MAX_WAIT_MS", "100"))
+REFINE_CACHE_SIZE = int(os.getenv("REFINE_CACHE_SIZE", "2048"))
+
+DEFAULT_BANNED_WORDS = ["ass", "fuck", "shit"]
+DEFAULT_IGNORE_PHRASES = [
+    "thank you", "thanks for watching", "thank you very much",
+    "i'm so sorry", "oh", "alright", "i love you",
+    "happy birthday", "so let's see", "okay", "i'm going to",
+    "next video", "see you",
+]
+
+
+def load_list(path: str | None, default: list[str]) -> list[str]:
+    if not path:
+        return list(default)
+    with open(path, encoding="utf-8") as f:
+        entries = [line.split("#", 1)[0].strip().lower() for line in f]
+    return [entry for entry in entries if entry]
+
+
+def _alternation(entries, word_bounded: bool) -> re.Pattern | None:
+    if not entries:
+        return None
+    # longest first, so a phrase wins over its own prefix
+    body = "|".join(re.escape(e) for e in sorted(set(entries), key=len, reverse=True))
+    return re.compile(rf"\b(?:{body})\b" if word_bounded else f"(?:{body})", re.IGNORECASE)
+
+
+# ---------------- FILTERS ----------------
+class TextFilter:
+    """
+    Banned words and ignore phrases compiled once into one alternation regex each, so a
+    segment is checked with two scans instead of one regex build per banned word and one
+    substring search per phrase. Banned words match whole words; ignore phrases match
+    anywhere in the text, as before.
+    """
+
+    def __init__(self, banned_words=None, ignore_phrases=None):
+        self.banned_words = load_list(BANNED_WORDS_FILE, DEFAULT_BANNED_WORDS) \
+            if banned_words is None else list(banned_words)
+        self.ignore_phrases = load_list(IGNORE_PHRASES_FILE, DEFAULT_IGNORE_PHRASES) \
+            if ignore_phrases is None else list(ignore_phrases)
+        self._banned = _alternation(self.banned_words, word_bounded=True)
+        self._ignored = _alternation(self.ignore_phrases, word_bounded=False)
+
+    def is_banned(self, text: str) -> bool:
+        return bool(self._banned and self._banned.search(text))
+
+    def should_ignore(self, text: str) -> bool:
+        return bool(self._ignored and self._ignored.search(text.strip()))
+
+    def reject_reason(self, text: str) -> str | None:
+        """'banned', 'ignored' or None when the text may be shown."""
+        if self.is_banned(text):
+            return "banned"
+        if self.should_ignore(text):
+            return "ignored"
+        return None
+
+
+# ---------------- GRAMMAR REFINEMENT ----------------
+class GrammarRefiner:
+    """
+    LanguageTool corrections off the transcription thread. Texts are queued and checked in
+    batches by one worker thread (one LanguageTool round trip per batch); results are kept
+    in an LRU cache, so repeated phrases come back immediately. `submit` never blocks.
+    """
+
+    _separator = "\n\n"
+
+    def __init__(self, language: str = REFINE_LANGUAGE, max_batch_size: int = REFINE_BATCH_SIZE,
+                 max_wait_ms: float = REFINE_MAX_WAIT_MS, cache_size: int = REFINE_CACHE_SIZE, tool=None):
+        self.language = language
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self.tool = tool
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="grammar-refiner", daemon=True)
+                self._thread.start()
+
+    def _cached(self, text: str) -> str | None:
+        with self._cache_lock:
+            refined = self._cache.get(text)
+            if refined is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+            return refined
+
+    def _store(self, text: str, refined: str):
+        with self._cache_lock:
+            self._cache[text] = refined
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def submit(self, text: str, callback=None) -> Future:
+        """Future with the refined text; `callback(text, refined)` runs once it is ready."""
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: f.exception() or callback(text, f.result()))
+        refined = self._cached(text)
+        if refined is not None:
+            future.set_result(refined)
+            return future
+        self._ensure_started()
+        self._queue.put((text, future, time.monotonic()))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # a text may have been refined by an earlier batch while it waited
+            refined, texts = {}, []
+            for text in dict.fromkeys(text for text, _, _ in batch):
+                cached = self._cached(text)
+                if cached is None:
+                    texts.append(text)
+                else:
+                    refined[text] = cached
+            if texts:
+                try:
+                    refined.update(zip(texts, self._refine(texts)))
+                    for text in texts:
+                        self._store(text, refined[text])
+                except Exception as e:
+                    logging.error(f"Grammar refinement of {len(texts)} texts failed: {e}")
+                    refined.update((text, text) for text in texts)   # show the raw text rather than nothing
+                self.batches += 1
+                self.misses += len(texts)
+            for text, future, _ in batch:
+                future.set_result(refined[text])
+
+    def _refine(self, texts: list[str]) -> list[str]:
+        import language_tool_python
+        if self.tool is None:
+            self.tool = language_tool_python.LanguageTool(self.language)
+        # one check for the whole batch; paragraphs keep the texts apart
+        joined = self._separator.join(texts)
+        corrected = language_tool_python.utils.correct(joined, self.tool.check(joined))
+        parts = corrected.split(self._separator)
+        if len(parts) == len(texts):
+            return parts
+        # a correction touched a separator: fall back to one check per text
+        return [language_tool_python.utils.correct(t, self.tool.check(t)) for t in texts]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "batches": self.batches,
+            "waiting": self._queue.qsize(),
+        }
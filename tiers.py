@@ -0,0 +1,115 @@
+import os
+import json
+import threading
+
+# ---------------- SETTINGS ----------------
+# fast < balanced < accurate. "balanced" is what the API ran before tiers existed.
+TIER_ORDER = ["fast", "balanced", "accurate"]
+DEFAULT_TIER = os.getenv("DEFAULT_TIER", "balanced")         # a tier name or "auto"
+LATENCY_TARGET_SECONDS = float(os.getenv("LATENCY_TARGET_SECONDS", "30"))
+TIER_OVERRIDES = os.getenv("QUALITY_TIERS")                  # JSON, e.g. {"fast": {"whisper_model": "tiny.en"}}
+rtf_smoothing = 0.2
+
+TIERS = {
+    "fast": {
+        "whisper_model": "base.en",      # faster-whisper, /upload-audio
+        "whisperx_model": "small",       # whisperx, /speaker-diarization and jobs
+        "compute_type": "int8",
+        "beam_size": 1,
+    },
+    "balanced": {
+        "whisper_model": "small.en",
+        "whisperx_model": "large-v2",
+        "compute_type": "int8",
+        "beam_size": 5,
+    },
+    "accurate": {
+        "whisper_model": "medium.en",
+        "whisperx_model": "large-v3",
+        "compute_type": "int8",
+        "beam_size": 5,
+    },
+}
+if TIER_OVERRIDES:
+    for _name, _fields in json.loads(TIER_OVERRIDES).items():
+        TIERS[_name].update(_fields)
+
+# Starting real-time factors (processing seconds per audio second, CPU int8); replaced
+# by measured values as requests complete.
+DEFAULT_RTF = {
+    "transcribe": {"fast": 0.04, "balanced": 0.12, "accurate": 0.35},
+    "diarize": {"fast": 0.25, "balanced": 0.9, "accurate": 1.0},
+}
+
+
+def get_tier(name: str) -> dict:
+    """The tier's settings with its name; raises ValueError for unknown names."""
+    if name not in TIERS:
+        raise ValueError(f"Unknown tier {name!r}; expected one of {TIER_ORDER + ['auto']}")
+    return {"name": name, **TIERS[name]}
+
+
+def tier_names(name: str) -> list[str]:
+    """Tiers whose results satisfy a request for `name`: itself, or for "auto" any tier, best first."""
+    if name == "auto":
+        return list(reversed(TIER_ORDER))
+    get_tier(name)
+    return [name]
+
+
+# ---------------- AUTOMATIC SELECTION ----------------
+class TierSelector:
+    """
+    Picks the most accurate tier whose estimated latency fits the target. The estimate is
+    the request's own processing time (duration x measured RTF) plus the work queued ahead
+    of it, spread over the workers; when even the fast tier misses the target it is used
+    anyway, so load lowers quality instead of rejecting requests.
+    """
+
+    def __init__(self, pipeline: str, latency_target: float = LATENCY_TARGET_SECONDS, rtf: dict | None = None):
+        self.pipeline = pipeline
+        self.latency_target = latency_target
+        self.rtf = dict(rtf or DEFAULT_RTF[pipeline])
+        self.chosen = {name: 0 for name in TIER_ORDER}
+        self._lock = threading.Lock()
+
+    def estimate(self, tier: str, audio_seconds: float, queue_depth: int = 0, workers: int = 1) -> float:
+        # jobs ahead are assumed to be about as long as this one
+        return audio_seconds * self.rtf[tier] * (1 + queue_depth / max(1, workers))
+
+    def choose(self, audio_seconds: float, queue_depth: int = 0, workers: int = 1,
+               latency_target: float | None = None) -> dict:
+        """`latency_target` overrides the configured one, e.g. with what is left after queueing."""
+        target = self.latency_target if latency_target is None else latency_target
+        name = TIER_ORDER[0]
+        for candidate in reversed(TIER_ORDER):
+            if self.estimate(candidate, audio_seconds, queue_depth, workers) <= target:
+                name = candidate
+                break
+        with self._lock:
+            self.chosen[name] += 1
+        return get_tier(name)
+
+    def resolve(self, name: str, audio_seconds: float, queue_depth: int = 0, workers: int = 1) -> dict:
+        if name == "auto":
+            return self.choose(audio_seconds, queue_depth, workers)
+        return get_tier(name)
+
+    def observe(self, tier: str, audio_seconds: float, seconds: float):
+        """Feed back a finished run so estimates follow the actual hardware and load."""
+        if audio_seconds <= 0:
+            return
+        with self._lock:
+            previous = self.rtf[tier]
+            self.rtf[tier] = (1 - rtf_smoothing) * previous + rtf_smoothing * (seconds / audio_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "latency_target": self.latency_target,
+            "rtf": {name: round(value, 4) for name, value in self.rtf.items()},
+            "chosen": dict(self.chosen),
+        }
+
+
+transcribe_selector = TierSelector("transcribe")
+diarize_selector = TierSelector("diarize")
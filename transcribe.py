@@ -1,14 +1,120 @@
-from faster_whisper import WhisperModel
+from audio_io import decode as decode_audio   # imports faster_whisper on first call
+from model_registry import get_whisper_model
+from inference_pool import inference_pool
+from vad import VoiceActivityDetector, clip_timestamps
+from parallel_transcribe import transcribe_parallel
+from batching import BatchScheduler
+from metrics import STAGE_SECONDS, AUDIO_SECONDS
+from tiers import get_tier, transcribe_selector
+import os
+import time
 
-model_size = "small.en"
+# Defaults come from the "balanced" tier; requests may pick another one (see tiers.py)
+default_tier = get_tier("balanced")
+model_size = default_tier["whisper_model"]
 
 # Run on CPU with INT8
-model = WhisperModel(model_size, device="cpu", compute_type="int8")
-
-async def transcribe_audio(file_path: str) -> str:
-    segments, info = model.transcribe(file_path, language="en", beam_size=5)
-    transcribed_text = ""
-    for segment in segments:
-        # transcribed_text += "[%.2fs -> %.2fs] %s\n" % (segment.start, segment.end, segment.text)
-        transcribed_text += segment.text
-    return transcribed_text
\ No newline at end of file
+device = "cpu"
+compute_type = default_tier["compute_type"]
+language = "en"
+beam_size = default_tier["beam_size"]
+vad_aggressiveness = 2
+
+speech_detector = VoiceActivityDetector(vad_aggressiveness)
+
+# Cross-request micro-batching: windows from concurrent requests share encoder/decoder
+# batches. Needs INFERENCE_WORKERS >= BATCH_MAX_SIZE for batches to fill up.
+USE_BATCHING = os.getenv("TRANSCRIBE_BATCHING", "0") == "1"
+batch_scheduler = BatchScheduler(
+    lambda: get_whisper_model(model_size, device=device, compute_type=compute_type)
+)
+
+def iter_segments(file_path: str, tier: dict | None = None, observe: bool = False):
+    """
+    Yield each segment as soon as faster-whisper decodes it. With `observe`, a run that
+    finishes feeds its inference time to the tier selector; streamed runs leave it off, as
+    they may stop early when the client disconnects.
+    """
+    tier = tier or default_tier
+    model = get_whisper_model(tier["whisper_model"], device=device, compute_type=tier["compute_type"])
+    with STAGE_SECONDS.time(pipeline="transcribe", stage="decode"):
+        audio = decode_audio(file_path)
+    AUDIO_SECONDS.inc(len(audio) / 16000, pipeline="transcribe")
+    # Decode only the speech regions; segment times stay on the file's timeline
+    with STAGE_SECONDS.time(pipeline="transcribe", stage="vad"):
+        regions = speech_detector.regions(audio)
+    if not regions:
+        return
+    # only the time spent producing segments counts, not the time the consumer holds them
+    seconds, finished = 0.0, False
+    started = time.perf_counter()
+    try:
+        if USE_BATCHING and tier["whisper_model"] == model_size:
+            # one segment per (up to) 30 s window, without timestamp tokens
+            segments = batch_scheduler.transcribe(audio, regions)
+        else:
+            decoded, info = model.transcribe(
+                audio, language=language, beam_size=tier["beam_size"], clip_timestamps=clip_timestamps(regions)
+            )
+            segments = ({
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+            } for segment in decoded)
+        for segment in segments:
+            seconds += time.perf_counter() - started
+            yield segment
+            started = time.perf_counter()
+        seconds += time.perf_counter() - started
+        finished = True
+    finally:
+        STAGE_SECONDS.observe(seconds, pipeline="transcribe", stage="transcribe")
+        if observe and finished:
+            transcribe_selector.observe(tier["name"], len(audio) / 16000, seconds)
+
+def decode_options(parallel: bool = False, tier: dict | None = None) -> dict:
+    """Everything besides the audio that shapes the transcript; part of the result cache key."""
+    tier = tier or default_tier
+    batched = USE_BATCHING and tier["whisper_model"] == model_size
+    options = {
+        "tier": tier["name"],
+        "model": tier["whisper_model"],
+        "compute_type": tier["compute_type"],
+        "language": language,
+        "beam_size": tier["beam_size"],
+        "sampling_rate": 16000,
+        "vad": {
+            "aggressiveness": vad_aggressiveness,
+            "energy_db": speech_detector.energy_db,
+            "zcr_limit": speech_detector.zcr_limit,
+            "frame_size": speech_detector.frame_size,
+        },
+        "mode": "batched" if batched else "sequential",
+    }
+    if parallel:
+        from parallel_transcribe import PARALLEL_MODEL, PARALLEL_COMPUTE_TYPE, target_chunk_duration
+        options.update(model=PARALLEL_MODEL, compute_type=PARALLEL_COMPUTE_TYPE,
+                       mode="parallel", chunk_seconds=target_chunk_duration)
+    return options
+
+def transcribe_file(file_path: str, parallel: bool = False, tier: dict | None = None) -> str:
+    tier = tier or default_tier
+    if parallel:
+        # Long files: silence-cut chunks transcribed across CPU cores. The workers load
+        # PARALLEL_MODEL once per process, so only the tier's beam size applies here.
+        with STAGE_SECONDS.time(pipeline="transcribe", stage="decode"):
+            audio = decode_audio(file_path)
+        AUDIO_SECONDS.inc(len(audio) / 16000, pipeline="transcribe")
+        with STAGE_SECONDS.time(pipeline="transcribe", stage="parallel"):
+            result = transcribe_parallel(audio, beam_size=tier["beam_size"])
+        return result["text"]
+    # transcribed_text += "[%.2fs -> %.2fs] %s\n" % (segment.start, segment.end, segment.text)
+    return "".join(segment["text"] for segment in iter_segments(file_path, tier, observe=True))
+
+async def transcribe_audio(file_path: str, parallel: bool = False, tier: dict | None = None) -> str:
+    return await inference_pool.run(transcribe_file, file_path, parallel, tier)
+
+def stream_transcription(file_path: str, tier: dict | None = None):
+    """Async iterator of segment dicts; raises PoolFull right away when the queue is full."""
+    return inference_pool.stream(iter_segments, file_path, tier)
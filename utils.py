@@ -1,18 +1,44 @@
 from fastapi import UploadFile
-import shutil
+import asyncio
 import hashlib
+import inspect
+import os
+import tempfile
 
-async def save_upload_file(upload_file: UploadFile, destination: str):
-    # Save the uploaded file
-    with open(destination, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
-    
-    # Create a new MD5 object for this file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def save_upload_file(upload_file: UploadFile, upload_dir: str, is_known=None):
+    """
+    Stream the upload to disk in chunks while computing its MD5 in the same pass, then
+    store it content-addressed as <upload_dir>/<md5><ext>. Returns (md5, path).
+
+    If `is_known(md5)` (sync or async) is true the result for this content already exists: the temp copy
+    is dropped and path is None. Identical content is only ever kept once on disk.
+    """
     hash_md5 = hashlib.md5()
-    
-    # Compute MD5 of the saved file
-    with open(destination, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    
-    return hash_md5.hexdigest()
+    ext = os.path.splitext(upload_file.filename or "")[1].lower()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                hash_md5.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        md5 = hash_md5.hexdigest()
+
+        known = is_known(md5) if is_known is not None else False
+        if inspect.isawaitable(known):
+            known = await known
+        if known:
+            os.remove(tmp_path)
+            return md5, None
+
+        destination = os.path.join(upload_dir, md5 + ext)
+        if os.path.exists(destination):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, destination)
+        return md5, destination
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
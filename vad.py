@@ -0,0 +1,165 @@
+import numpy as np
+import webrtcvad
+
+# ---------------- SETTINGS ----------------
+samplerate = 16000
+frame_duration_ms = 30        # webrtcvad accepts 10, 20 or 30 ms frames
+energy_threshold_db = -45.0   # frames quieter than this (dBFS RMS) are silence
+max_zcr = 0.35                # quiet frames crossing zero more often than this are hiss
+window_seconds = 30.0         # Whisper's encoder window
+
+
+def frame_view(audio: np.ndarray, frame_size: int, hop: int) -> np.ndarray:
+    """(n_frames, frame_size) strided view over `audio`; no samples are copied."""
+    if len(audio) < frame_size:
+        return np.empty((0, frame_size), dtype=audio.dtype)
+    return np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::hop]
+
+
+def to_int16(audio: np.ndarray) -> np.ndarray:
+    if audio.dtype == np.int16:
+        return audio
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+class VoiceActivityDetector:
+    """
+    webrtcvad behind a vectorized NumPy prefilter. Frame energy and zero-crossing rate are
+    computed for all frames at once; only frames that are not obviously silent are handed
+    to webrtcvad, one C call each.
+    """
+
+    def __init__(self, aggressiveness: int = 2, sample_rate: int = samplerate,
+                 frame_ms: int = frame_duration_ms, hop_ms: int | None = None,
+                 energy_db: float = energy_threshold_db, zcr_limit: float = max_zcr):
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.hop = int(sample_rate * (hop_ms or frame_ms) / 1000)
+        self.energy_db = energy_db
+        self.zcr_limit = zcr_limit
+
+    def prefilter(self, frames: np.ndarray) -> np.ndarray:
+        """Boolean mask of frames that might contain speech."""
+        scale = 32768.0 if frames.dtype == np.int16 else 1.0
+        x = frames.astype(np.float32) / scale if scale != 1.0 else frames
+        rms = np.sqrt(np.mean(np.square(x, dtype=np.float32), axis=1) + 1e-12)
+        energy_db = 20 * np.log10(rms)
+        signs = np.signbit(x)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / x.shape[1]
+        loud = energy_db > self.energy_db
+        hiss = (zcr > self.zcr_limit) & (energy_db < self.energy_db + 15)
+        return loud & ~hiss
+
+    def frame_mask(self, audio: np.ndarray, stop_at_first: bool = False) -> np.ndarray:
+        """Per-frame speech decision for the whole signal."""
+        audio = np.asarray(audio).reshape(-1)
+        frames = frame_view(audio, self.frame_size, self.hop)
+        mask = np.zeros(len(frames), dtype=bool)
+        candidates = np.flatnonzero(self.prefilter(frames))
+        if candidates.size == 0:
+            return mask
+        # int16 conversion only for the frames webrtcvad actually sees
+        pcm = to_int16(frames[candidates])
+        for idx, frame in zip(candidates, pcm):
+            if self.vad.is_speech(frame.tobytes(), self.sample_rate):
+                mask[idx] = True
+                if stop_at_first:
+                    break
+        return mask
+
+    def is_speech(self, audio: np.ndarray) -> bool:
+        audio = np.asarray(audio).reshape(-1)
+        if audio.size == 0:
+            return False
+        return bool(self.frame_mask(audio, stop_at_first=True).any())
+
+    def regions(self, audio: np.ndarray, min_speech: float = 0.25, min_silence: float = 0.3,
+                pad: float = 0.2) -> list[tuple[float, float]]:
+        """
+        Speech regions as (start, end) seconds: runs of speech frames, gaps shorter than
+        `min_silence` bridged, runs shorter than `min_speech` dropped, `pad` added on each side.
+        """
+        audio = np.asarray(audio).reshape(-1)
+        mask = self.frame_mask(audio)
+        if not mask.any():
+            return []
+        edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) * self.hop / self.sample_rate
+        ends = (np.flatnonzero(edges == -1) - 1) * self.hop / self.sample_rate \
+            + self.frame_size / self.sample_rate
+
+        # bridge short silences
+        first = np.flatnonzero(np.concatenate(([True], starts[1:] - ends[:-1] >= min_silence)))
+        last = np.concatenate((first[1:] - 1, [len(ends) - 1]))
+        starts, ends = starts[first], ends[last]
+
+        long_enough = ends - starts >= min_speech
+        starts, ends = starts[long_enough], ends[long_enough]
+
+        duration = len(audio) / self.sample_rate
+        starts = np.maximum(starts - pad, 0.0)
+        ends = np.minimum(ends + pad, duration)
+        return merge_regions(list(zip(starts.tolist(), ends.tolist())))
+
+
+def merge_regions(regions: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    merged = []
+    for start, end in regions:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class TimeMap:
+    """Maps times in audio made of concatenated speech regions back to the original timeline."""
+
+    def __init__(self, regions: list[tuple[float, float]]):
+        lengths = np.array([end - start for start, end in regions], dtype=np.float64)
+        self.original_starts = np.array([start for start, _ in regions], dtype=np.float64)
+        self.compact_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) if len(regions) else lengths
+
+    def to_original(self, t):
+        if not len(self.compact_starts):
+            return t
+        t_arr = np.asarray(t, dtype=np.float64)
+        idx = np.clip(np.searchsorted(self.compact_starts, t_arr, side="right") - 1, 0, None)
+        out = self.original_starts[idx] + (t_arr - self.compact_starts[idx])
+        return out.item() if out.ndim == 0 else out
+
+
+def collect_speech(audio: np.ndarray, regions: list[tuple[float, float]],
+                   sample_rate: int = samplerate) -> tuple[np.ndarray, TimeMap]:
+    """Concatenate the speech regions into one array (one copy) plus the map back to file time."""
+    pieces = [audio[int(start * sample_rate):int(end * sample_rate)] for start, end in regions]
+    compact = np.concatenate(pieces) if pieces else audio[:0]
+    return compact, TimeMap(regions)
+
+
+def pack_windows(regions: list[tuple[float, float]], duration: float,
+                 max_len: float = window_seconds) -> list[tuple[float, float]]:
+    """Merge consecutive speech regions into windows of at most `max_len` seconds."""
+    windows = []
+    for start, end in regions:
+        # regions longer than a window are cut into window-sized pieces
+        while end - start > max_len:
+            windows.append((start, start + max_len))
+            start += max_len
+        if windows and end - windows[-1][0] <= max_len:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, min(end, duration)))
+    return windows
+
+
+def clip_timestamps(regions: list[tuple[float, float]]) -> list[float]:
+    """
+    faster-whisper `clip_timestamps` argument that restricts decoding to the regions. Every
+    clip is padded to a 30 s encoder window, so consecutive regions are packed into clips of
+    up to 30 s (the short silences between them decoded along) instead of one clip each.
+    """
+    if not regions:
+        return []
+    return [t for window in pack_windows(regions, regions[-1][1]) for t in window]
@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+
+# ---------------- SETTINGS ----------------
+# Models loaded and run once on startup, before /readyz reports ready.
+# Any of: transcribe, live, live-partial, batching, diarize. Empty = ready immediately.
+# Two-pass live mode also warms the streaming recognizer by default
+DEFAULT_WARMUP = "transcribe,live,live-partial" if os.getenv("LIVE_MODE") == "two-pass" else "transcribe,live"
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", DEFAULT_WARMUP).split(",") if m.strip()]
+samplerate = 16000
+
+
+def _dummy_audio(seconds: float = 1.0) -> np.ndarray:
+    # quiet noise rather than zeros, so the decoder does real work
+    return (np.random.default_rng(0).standard_normal(int(samplerate * seconds)) * 0.01).astype(np.float32)
+
+
+def warm_transcribe():
+    import transcribe
+    from model_registry import get_whisper_model
+    model = get_whisper_model(transcribe.model_size, device=transcribe.device, compute_type=transcribe.compute_type)
+    segments, _ = model.transcribe(_dummy_audio(), language=transcribe.language, beam_size=1)
+    list(segments)
+
+
+def warm_live():
+    from live import transcribe_job
+    transcribe_job({"kind": "partial", "audio": _dummy_audio(), "start": 0.0})
+
+
+def warm_live_partial():
+    from live import LIVE_PARTIAL_BACKEND
+    from asr_backends import get_backend
+    stream = get_backend(LIVE_PARTIAL_BACKEND).stream()
+    stream.accept(_dummy_audio())
+    stream.finish()
+
+
+def warm_batching():
+    from transcribe import batch_scheduler
+    list(batch_scheduler.transcribe(_dummy_audio(), [(0.0, 1.0)]))
+
+
+def warm_diarize():
+    import main
+    from model_registry import get_whisperx_model, get_align_model, get_diarize_pipeline
+    from tiers import get_tier
+    audio = _dummy_audio(2.0)
+    settings = get_tier(main.DEFAULT_DIARIZATION_TIER)
+    get_whisperx_model(settings["whisperx_model"], device="cpu", compute_type=settings["compute_type"],
+                       language="en", beam_size=settings["beam_size"]).transcribe(audio)
+    get_align_model(language="en", device="cpu")
+    get_diarize_pipeline(device="cpu", hf_token=main.hf_token)(audio)
+
+
+WARMERS = {
+    "transcribe": warm_transcribe,
+    "live": warm_live,
+    "live-partial": warm_live_partial,
+    "batching": warm_batching,
+    "diarize": warm_diarize,
+}
+
+
+class Warmup:
+    """
+    Loads the configured models on a background thread and runs one dummy inference on
+    each, so the first real request neither pays the load nor hits cold caches.
+    """
+
+    def __init__(self, names=WARMUP_MODELS):
+        unknown = [n for n in names if n not in WARMERS]
+        if unknown:
+            raise ValueError(f"Unknown WARMUP_MODELS entries: {unknown}; expected {list(WARMERS)}")
+        self.names = list(names)
+        self.state = {name: {"status": "pending"} for name in self.names}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name in self.names:
+            self.state[name] = {"status": "loading"}
+            started = time.perf_counter()
+            try:
+                WARMERS[name]()
+            except Exception as e:
+                logging.exception(f"Warmup of {name} failed")
+                self.state[name] = {"status": "failed", "error": str(e)}
+                continue
+            seconds = time.perf_counter() - started
+            self.state[name] = {"status": "ready", "seconds": round(seconds, 3)}
+            logging.info(f"Warmed up {name} in {seconds:.2f}s")
+
+    def ready(self) -> bool:
+        return all(s["status"] == "ready" for s in self.state.values())
+
+    def status(self) -> dict:
+        return {"ready": self.ready(), "models": dict(self.state)}
+
+
+warmup = Warmup()
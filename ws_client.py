@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+import websockets
+from faster_whisper import decode_audio
+
+# Replays an audio file over /ws/transcribe as 16 kHz s16le frames and prints the results.
+# e.g. python ws_client.py audio.mp3 --sessions 4 --speed 2
+parser = argparse.ArgumentParser()
+parser.add_argument("audio", nargs="?", default="audio.mp3")
+parser.add_argument("--url", default="ws://localhost:8000/ws/transcribe")
+parser.add_argument("--sessions", type=int, default=1, help="concurrent streams")
+parser.add_argument("--frame-ms", type=int, default=100)
+parser.add_argument("--speed", type=float, default=1.0, help="1.0 = real time, 0 = as fast as possible")
+samplerate = 16000
+
+
+async def stream(url, pcm, frame_ms, speed, name):
+    frame = int(samplerate * frame_ms / 1000)
+    async with websockets.connect(url, max_size=None) as ws:
+        async def sender():
+            started = time.monotonic()
+            for i in range(0, len(pcm), frame):
+                await ws.send(pcm[i:i + frame].tobytes())
+                if speed:
+                    # pace against the wall clock so slow sends do not accumulate drift
+                    delay = started + (i + frame) / samplerate / speed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            await ws.send(json.dumps({"type": "end"}))
+
+        send_task = asyncio.create_task(sender())
+        async for message in ws:
+            result = json.loads(message)
+            if result["type"] == "stats":
+                print(f"[{name}] stats {json.dumps(result)}")
+                break
+            print(f"[{name}] {result['type']:7s} {result['start']:7.2f}-{result['end']:7.2f} "
+                  f"({result['latency_ms']:.0f} ms) {result['text']}")
+        await send_task
+
+
+async def main():
+    args = parser.parse_args()
+    audio = decode_audio(args.audio, sampling_rate=samplerate)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    await asyncio.gather(*[
+        stream(args.url, pcm, args.frame_ms, args.speed, f"s{i}") for i in range(args.sessions)
+    ])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())